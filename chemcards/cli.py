@@ -1,5 +1,27 @@
 import click
 
+
+class LazyChoice(click.Choice):
+    """A :class:`click.Choice` whose choices are loaded on first use, so listing them
+    does not import their (heavy) module when another command runs.
+    """
+
+    def __init__(self, load, case_sensitive: bool = True):
+        self._load = load
+        self._choices = None
+        self.case_sensitive = case_sensitive
+
+    @property
+    def choices(self):
+        if self._choices is None:
+            self._choices = tuple(self._load())
+        return self._choices
+
+
+def export_generators():
+    from chemcards.flashcards.export import GENERATORS
+    return GENERATORS
+
 # Define the main command group
 @click.group("chemcards")
 def cli():
@@ -13,9 +35,11 @@ def start():
     main_window.start()
 
 @cli.command("download-database")
-def download_database():
+@click.option("--max-phase", "max_phase", type=click.IntRange(0, 4), default=4, show_default=True, help="ChEMBL development phase to download (4 = approved).")
+@click.option("--all-phases", "all_phases", is_flag=True, default=False, help="Download molecules of every development phase.")
+def download_database(max_phase, all_phases):
     from chemcards.database.services.chembl import main as chembl_main
-    chembl_main()
+    chembl_main(None if all_phases else max_phase)
 
 @cli.command("generate-catalog")
 @click.option("--no-functional-groups", "functional_groups", is_flag=True, default=False, help="Exclude functional groups.")
@@ -45,3 +69,64 @@ def generate_catalog_cmd(functional_groups, fda_approved, separate, out_pdf, out
                 click.echo("No catalog generated.")
     except Exception as e:
         click.echo(f"Error generating catalog: {e}")
+
+@cli.command("search")
+@click.argument("query")
+@click.option("--limit", type=click.IntRange(min=0), default=20, show_default=True, help="Maximum number of hits to show.")
+@click.option("--offset", type=click.IntRange(min=0), default=0, show_default=True, help="Number of hits to skip.")
+@click.option("--timeout", type=click.FloatRange(min=0), default=10.0, show_default=True, help="Give up after this many seconds.")
+@click.option("--processes", type=click.IntRange(min=0), default=1, show_default=True, help="Worker processes (0 = every core).")
+@click.option("--smiles", "syntax", flag_value="smiles", help="Read QUERY as SMILES rather than SMARTS.")
+@click.option("--smarts", "syntax", flag_value="smarts", default=True, hidden=True)
+def search_cmd(query, limit, offset, timeout, processes, syntax):
+    """Find the molecules containing a SMARTS (or, with --smiles, SMILES) substructure.
+
+    The matching runs in worker processes, which are stopped at the timeout.
+    """
+    from chemcards.database.substructure import SearchTimeout, search
+    try:
+        for hit in search(query, limit=limit, offset=offset, timeout=timeout, processes=processes or None, syntax=syntax):
+            atoms = ",".join(str(atom) for atom in hit.atoms)
+            click.echo(f"{hit.molecule.name}\t{hit.molecule.smiles}\t{atoms}")
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="QUERY")
+    except SearchTimeout:
+        raise click.ClickException(f"Search timed out after {timeout:g} s")
+
+@cli.command("export")
+@click.argument("out", type=click.Path(dir_okay=False))
+@click.option("--generator", "generator_name", type=LazyChoice(export_generators), default="molecule-to-target", show_default=True, help="Question generator.")
+@click.option("--count", type=click.IntRange(min=1), default=None, help="Number of questions to stream (default: one per card of the whole deck).")
+@click.option("--seed", type=int, default=None, help="Seed, for a reproducible deck.")
+@click.option("--deck-name", "deck_name", default=None, help="Anki deck name (default: the generator's name).")
+@click.option("--atc", multiple=True, help="Only molecules with an ATC code starting with this prefix (repeatable).")
+@click.option("--target-contains", "target_contains", default=None, help="Only molecules whose target name contains this text.")
+@click.option("--max-lipinski-violations", "max_violations", type=click.IntRange(0, 4), default=None, help="Only molecules breaking at most this many of Lipinski's rules.")
+@click.option("--image-size", "image_size", type=click.IntRange(min=50), default=300, show_default=True, help="Image width and height in pixels.")
+@click.option("--processes", type=click.IntRange(min=0), default=1, show_default=True, help="Image rendering processes (0 = every core).")
+def export_cmd(out, generator_name, count, seed, deck_name, atc, target_contains, max_violations, image_size, processes):
+    """Export flashcards to an Anki package (.apkg) or CSV with images (.zip)."""
+    from pathlib import Path
+    from chemcards.database.core import MoleculeDB
+    from chemcards.flashcards.export import GENERATORS, WRITERS, export
+    from chemcards.flashcards.filters import ATCFilter, LipinskiFilter, TargetContainsFilter
+    if Path(out).suffix.lower() not in WRITERS:
+        raise click.BadParameter(f"Cannot export to {Path(out).name}: use {' or '.join(WRITERS)}", param_hint="OUT")
+    filters = []
+    if atc:
+        filters.append(ATCFilter(*atc))
+    if target_contains:
+        filters.append(TargetContainsFilter(target_contains))
+    if max_violations is not None:
+        filters.append(LipinskiFilter(max_violations))
+    generator = GENERATORS[generator_name](MoleculeDB.load(), filters, seed=seed)
+    if count is None:
+        try:
+            generator.card_keys()
+        except NotImplementedError:
+            raise click.BadParameter(f"{generator_name} has no fixed set of cards: give a number of questions", param_hint="--count")
+        questions = generator.deck()
+    else:
+        questions = generator.stream(count)
+    stats = export(questions, out, deck_name or generator.name, processes=processes or None, image_size=image_size)
+    click.echo(f"Exported {stats.notes} cards and {stats.images} images to {out} in {stats.seconds:.1f} s")
@@ -0,0 +1,7 @@
+def __getattr__(name):
+    # Imported lazily: loading the database modules pulls in RDKit
+    if name == "search":
+        from chemcards.database.substructure import search
+
+        return search
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,231 @@
+"""Persistent cache of functional group annotations.
+
+Results are stored per molecule (keyed by a hash of its SMILES) as bit rows over
+pattern positions, and every functional group SMARTS (keyed by a hash of its text)
+is assigned a fixed position. Each molecule also records which positions have been
+matched, so only missing (molecule, group) pairs are ever computed: a new group in
+``functional_groups.yaml`` is matched against the existing molecules only, and new
+molecules are matched against every group. When nothing is missing, annotating is
+just a read of the cache.
+"""
+import atexit
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+import numpy as np
+import rdkit
+
+from chemcards.database.matching import Annotations, annotate, group_smarts
+from chemcards.database.molcache import smiles_key
+from chemcards.database.resources import ANNOTATION_CACHE
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS patterns (key BLOB PRIMARY KEY, position INTEGER NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS molecules (
+    key BLOB PRIMARY KEY,
+    parsed INTEGER NOT NULL,
+    known BLOB NOT NULL,
+    present BLOB NOT NULL
+);
+"""
+
+
+def smarts_key(smarts: str) -> bytes:
+    return hashlib.blake2b(smarts.encode("utf-8"), digest_size=16).digest()
+
+
+def _unpack(blob: bytes, width: int) -> np.ndarray:
+    bits = np.unpackbits(np.frombuffer(blob, dtype=np.uint8), bitorder="little").astype(bool)
+    if len(bits) < width:
+        bits = np.concatenate([bits, np.zeros(width - len(bits), dtype=bool)])
+    return bits[:width]
+
+
+def _pack(bits: np.ndarray) -> bytes:
+    return np.packbits(bits, bitorder="little").tobytes()
+
+
+class AnnotationCache:
+    def __init__(self, path: Path | None = ANNOTATION_CACHE):
+        self.path = Path(path) if path is not None else None
+        self.stamp = rdkit.__version__
+        self.matched = 0  # (molecule, group) pairs matched rather than read from the cache
+        self._lock = threading.RLock()
+        self._connection: sqlite3.Connection | None = None
+        self._disk_failed = False
+
+    def annotate(
+        self, smiles: Sequence[str], groups: Iterable, processes: int | None = 1
+    ) -> Annotations:
+        """Like :func:`chemcards.database.matching.annotate`, matching only what is not cached.
+
+        The ``matched`` and ``pruned`` counts of the result cover the substructure
+        tests of this call: pairs read from the cache count as neither.
+        """
+        groups = list(groups)
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                self.matched += len(smiles) * len(groups)
+                return annotate(smiles, groups, processes)
+
+            positions = self._positions(connection, groups)
+            width = max(positions, default=-1) + 1
+            unique = list(dict.fromkeys(smiles))
+            keys = [smiles_key(value) for value in unique]
+            stored = self._read(connection, keys)
+
+            known = np.zeros((len(unique), len(groups)), dtype=bool)
+            present = np.zeros((len(unique), len(groups)), dtype=bool)
+            parsed = np.ones(len(unique), dtype=bool)
+            for i, key in enumerate(keys):
+                row = stored.get(key)
+                if row is None:
+                    continue
+                parsed[i] = row[0]
+                # Nothing to match in a molecule that cannot be parsed
+                known[i] = True if not row[0] else _unpack(row[1], width)[positions]
+                present[i] = _unpack(row[2], width)[positions]
+
+            # Batch molecules missing the same groups, e.g. all new molecules x all groups
+            matched = pruned = 0
+            todo = defaultdict(list)
+            for i in np.flatnonzero(~known.all(axis=1)).tolist():
+                todo[tuple(np.flatnonzero(~known[i]).tolist())].append(i)
+            for group_ids, rows in todo.items():
+                result = annotate(
+                    [unique[i] for i in rows], [groups[g] for g in group_ids], processes
+                )
+                self.matched += len(rows) * len(group_ids)
+                matched += result.matched
+                pruned += result.pruned
+                cells = np.ix_(rows, group_ids)
+                present[cells] = np.unpackbits(result.bits, axis=1, count=len(group_ids))
+                known[cells] = True
+                parsed[rows] = result.parsed
+
+            updated = sorted({i for rows in todo.values() for i in rows})
+            if updated:
+                self._write(connection, keys, stored, updated, positions, width, parsed, present)
+
+        index = {value: i for i, value in enumerate(unique)}
+        order = np.fromiter((index[value] for value in smiles), dtype=np.intp, count=len(smiles))
+        return Annotations(np.packbits(present[order], axis=1), parsed[order], matched, pruned)
+
+    def clear(self) -> None:
+        with self._lock:
+            connection = self._connect()
+            if connection is not None:
+                self._clear(connection)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self.path is None or self._disk_failed:
+            return None
+        if self._connection is None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                connection = sqlite3.connect(self.path, check_same_thread=False)
+                connection.execute("PRAGMA journal_mode = WAL")
+                with connection:
+                    connection.executescript(SCHEMA)
+                row = connection.execute(
+                    "SELECT value FROM metadata WHERE key = 'stamp'"
+                ).fetchone()
+                if row is None or row[0] != self.stamp:
+                    self._clear(connection)
+            except (OSError, sqlite3.Error) as e:
+                logger.debug("Annotation cache disabled, cannot open %s: %s", self.path, e)
+                self._disk_failed = True
+                return None
+            self._connection = connection
+        return self._connection
+
+    def _clear(self, connection: sqlite3.Connection) -> None:
+        with connection:
+            connection.execute("DELETE FROM molecules")
+            connection.execute("DELETE FROM patterns")
+            connection.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES ('stamp', ?)", (self.stamp,)
+            )
+
+    def _positions(self, connection: sqlite3.Connection, groups: list) -> list[int]:
+        """The bit position of every group's SMARTS, assigning new ones as needed."""
+        keys = [smarts_key(group_smarts(group)) for group in groups]
+        positions = dict(connection.execute("SELECT key, position FROM patterns"))
+        if any(key not in positions for key in keys):
+            with connection:
+                # Another process may have assigned positions since the read: take the
+                # write lock and read them again before assigning the next ones
+                connection.execute("BEGIN IMMEDIATE")
+                positions = dict(connection.execute("SELECT key, position FROM patterns"))
+                new = [key for key in dict.fromkeys(keys) if key not in positions]
+                start = max(positions.values(), default=-1) + 1
+                assigned = {key: start + i for i, key in enumerate(new)}
+                connection.executemany(
+                    "INSERT INTO patterns (key, position) VALUES (?, ?)", assigned.items()
+                )
+            positions.update(assigned)
+        return [positions[key] for key in keys]
+
+    @staticmethod
+    def _read(connection: sqlite3.Connection, keys: list[bytes]) -> dict[bytes, tuple]:
+        stored = {}
+        # Stay below SQLite's limit on bound parameters
+        for start in range(0, len(keys), 900):
+            batch = keys[start : start + 900]
+            placeholders = ", ".join("?" for _ in batch)
+            for key, *row in connection.execute(
+                f"SELECT key, parsed, known, present FROM molecules WHERE key IN ({placeholders})",
+                batch,
+            ):
+                stored[key] = row
+        return stored
+
+    @staticmethod
+    def _write(connection, keys, stored, rows, positions, width, parsed, present) -> None:
+        values = []
+        for i in rows:
+            row = stored.get(keys[i])
+            # Keep the bits stored for groups this call does not ask for
+            row_width = max(width, 8 * len(row[1])) if row else width
+            known_bits = _unpack(row[1], row_width) if row else np.zeros(width, dtype=bool)
+            present_bits = _unpack(row[2], row_width) if row else np.zeros(width, dtype=bool)
+            known_bits[positions] = True
+            present_bits[positions] = present[i]
+            values.append((keys[i], int(parsed[i]), _pack(known_bits), _pack(present_bits)))
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO molecules (key, parsed, known, present) "
+                    "VALUES (?, ?, ?, ?)",
+                    values,
+                )
+        except sqlite3.Error as e:
+            logger.debug("Could not write annotation cache: %s", e)
+
+
+_default_cache: AnnotationCache | None = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> AnnotationCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = AnnotationCache(ANNOTATION_CACHE)
+            atexit.register(_default_cache.close)
+        return _default_cache
@@ -0,0 +1,289 @@
+"""Compact, memory-mapped binary format for :class:`MoleculeTable`.
+
+Layout (little endian, every section 8-byte aligned)::
+
+    header           magic, format version, flags, row/string/ATC counts, last_updated,
+                     source stamp (size + mtime of the JSON it was built from)
+    section offsets  one uint64 offset per section, in SECTIONS order
+    string_offsets   int64[n_strings + 1]
+    string_data      utf-8 bytes of the string table
+    <field> columns  int32[n_rows] per field in STRING_FIELDS order
+    atc_offsets      int64[n_rows + 1]
+    atc_codes        int32[n_atc]
+    unknown          uint8[len(STRING_FIELDS), ceil(n_rows / 8)]
+    identity_hashes  uint64[n_rows], sorted hashes of the structural identities; empty
+                     unless the HAS_IDENTITIES flag is set
+
+Files are opened with ``mmap`` and every column is a zero-copy ``numpy`` view, so
+opening costs the same regardless of database size and processes on one host share
+the same page-cache pages.
+
+Structural identities cost an RDKit standardization and InChI per molecule, so a
+sidecar built on load leaves them out; the one written with a new snapshot (whose
+deduplication computed them anyway) includes them. Descriptors are not stored
+here either: :mod:`chemcards.database.descriptors` computes them on first use.
+"""
+import hashlib
+import mmap
+import os
+import struct
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from chemcards.database.files import atomic_write
+from chemcards.database.table import (
+    CODE_DTYPE,
+    OFFSET_DTYPE,
+    STRING_FIELDS,
+    UNKNOWN,
+    MoleculeTable,
+    StringPool,
+)
+
+MAGIC = b"CCDB"
+FORMAT_VERSION = 6
+SUFFIX = ".ccdb"
+
+HAS_IDENTITIES = 1
+
+# magic, version, flags, n_rows, n_strings, n_atc, source_size, source_mtime_ns, last_updated
+HEADER = struct.Struct("<4sIIQQQQq32s")
+SECTIONS = (
+    "string_offsets",
+    "string_data",
+    *STRING_FIELDS,
+    "atc_offsets",
+    "atc_codes",
+    "unknown",
+    "identity_hashes",
+)
+SECTION_OFFSETS = struct.Struct(f"<{len(SECTIONS)}Q")
+ALIGNMENT = 8
+
+
+class BinaryFormatError(ValueError):
+    pass
+
+
+class MappedTable(NamedTuple):
+    table: MoleculeTable
+    last_updated: str | None
+    identity_hashes: np.ndarray | None  # None when written without identities
+
+    def contains(self, identities: Iterable[str]) -> np.ndarray:
+        """Vectorized membership test of structural ``identities`` against the mapped rows."""
+        if self.identity_hashes is None:
+            raise ValueError("the binary database was written without structural identities")
+        hashes = key_hashes(identities)
+        positions = np.searchsorted(self.identity_hashes, hashes)
+        found = positions < len(self.identity_hashes)
+        found[found] = self.identity_hashes[positions[found]] == hashes[found]
+        return found
+
+
+def key_hashes(keys: Iterable[str]) -> np.ndarray:
+    return np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+            for key in keys
+        ),
+        dtype=np.uint64,
+    )
+
+
+def binary_path(json_path: Path) -> Path:
+    """Location of the binary sidecar for a JSON database."""
+    return Path(json_path).with_suffix(SUFFIX)
+
+
+def source_stamp(path: Path) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class MappedStringPool(StringPool):
+    """A :class:`StringPool` whose strings live in a mapped file.
+
+    Strings are decoded on access; the reverse ``str -> code`` lookup is only
+    built the first time it is needed (e.g. when merging databases).
+    """
+
+    def __init__(self, offsets: np.ndarray, data: memoryview):
+        self._offsets = offsets
+        self._data = data
+        self._mapped = len(offsets) - 1
+        self._decoded: dict[int, str] = {}
+        self._strings: list[str] = []  # strings interned after mapping
+        self._lazy_codes: dict[str, int] | None = None
+
+    @property
+    def _codes(self) -> dict[str, int]:
+        if self._lazy_codes is None:
+            self._lazy_codes = {value: code for code, value in enumerate(self)}
+        return self._lazy_codes
+
+    def intern(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self)
+            self._codes[value] = code
+            self._strings.append(value)
+        return code
+
+    def intern_many(self, values: list[str]) -> list[int]:
+        return [self.intern(value) for value in values]
+
+    def __getitem__(self, code: int) -> str:
+        if code >= self._mapped:
+            return self._strings[code - self._mapped]
+        value = self._decoded.get(code)
+        if value is None:
+            start, stop = self._offsets[code], self._offsets[code + 1]
+            value = str(self._data[start:stop], "utf-8")
+            self._decoded[code] = value
+        return value
+
+    def decode(self, codes: np.ndarray) -> list[str]:
+        getitem = self.__getitem__
+        return [getitem(code) for code in codes.tolist()]
+
+    def __len__(self) -> int:
+        return self._mapped + len(self._strings)
+
+    def __iter__(self) -> Iterator[str]:
+        for code in range(len(self)):
+            yield self[code]
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _encode_strings(strings: Iterable[str]) -> tuple[np.ndarray, bytes]:
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=OFFSET_DTYPE)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def write_table(
+    table: MoleculeTable,
+    path: Path,
+    last_updated: str | None = None,
+    source: Path | None = None,
+    identities: list[str] | None = None,
+) -> Path:
+    """Write ``table`` atomically (temp file + rename) so mapped readers are never torn.
+
+    ``identities`` are the rows' structural identities; the file has none when they
+    are not given.
+    """
+    path = Path(path)
+    string_offsets, string_data = _encode_strings(table.pool)
+    sections = {
+        "string_offsets": string_offsets.tobytes(),
+        "string_data": string_data,
+        **{field: table.codes(field).astype(CODE_DTYPE).tobytes() for field in STRING_FIELDS},
+        "atc_offsets": table.atc_offsets.astype(OFFSET_DTYPE).tobytes(),
+        "atc_codes": table.atc_codes.astype(CODE_DTYPE).tobytes(),
+        "unknown": np.ascontiguousarray(table.unknown, dtype=np.uint8).tobytes(),
+        "identity_hashes": b"" if identities is None else np.sort(key_hashes(identities)).tobytes(),
+    }
+
+    offsets = []
+    position = _align(HEADER.size + SECTION_OFFSETS.size)
+    for name in SECTIONS:
+        offsets.append(position)
+        position = _align(position + len(sections[name]))
+
+    source_size, source_mtime = source_stamp(source) if source is not None else (0, 0)
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        0 if identities is None else HAS_IDENTITIES,
+        len(table),
+        len(table.pool),
+        len(table.atc_codes),
+        source_size,
+        source_mtime,
+        (last_updated or "").encode("utf-8"),
+    )
+
+    with atomic_write(path) as f:
+        f.write(header)
+        f.write(SECTION_OFFSETS.pack(*offsets))
+        for name, offset in zip(SECTIONS, offsets):
+            f.seek(offset)
+            f.write(sections[name])
+        f.truncate(position)
+    return path
+
+
+def read_table(path: Path, source: Path | None = None) -> MappedTable | None:
+    """Map a binary database.
+
+    Returns ``None`` when the file is missing, has a different format version, or
+    was built from a different version of ``source``.
+    """
+    path = Path(path)
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        # ValueError: cannot mmap an empty file
+        return None
+
+    if len(buffer) < HEADER.size + SECTION_OFFSETS.size:
+        raise BinaryFormatError(f"{path} is truncated")
+    magic, version, flags, n_rows, n_strings, n_atc, size, mtime, last_updated = (
+        HEADER.unpack_from(buffer)
+    )
+    if magic != MAGIC:
+        raise BinaryFormatError(f"{path} is not a ChemCards binary database")
+    if version != FORMAT_VERSION:
+        return None
+    if source is not None and (size, mtime) != source_stamp(source):
+        return None
+
+    offsets = dict(zip(SECTIONS, SECTION_OFFSETS.unpack_from(buffer, HEADER.size)))
+
+    def check(name, size):
+        # A truncated or corrupt file must not reach np.frombuffer
+        if offsets[name] + size > len(buffer):
+            raise BinaryFormatError(f"{path} is truncated: section {name} is out of bounds")
+
+    def array(name, dtype, count):
+        check(name, np.dtype(dtype).itemsize * count)
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=offsets[name])
+
+    string_offsets = array("string_offsets", OFFSET_DTYPE, n_strings + 1)
+    data_start = offsets["string_data"]
+    data_size = int(string_offsets[-1])
+    if data_size < 0:
+        raise BinaryFormatError(f"{path} has a malformed string table")
+    check("string_data", data_size)
+    data = memoryview(buffer)[data_start : data_start + data_size]
+    pool = MappedStringPool(string_offsets, data)
+    if n_strings == 0 or pool[0] != UNKNOWN:
+        raise BinaryFormatError(f"{path} has a malformed string table")
+
+    n_bytes = -(-n_rows // 8)
+    table = MoleculeTable(
+        pool=pool,
+        columns={field: array(field, CODE_DTYPE, n_rows) for field in STRING_FIELDS},
+        atc_offsets=array("atc_offsets", OFFSET_DTYPE, n_rows + 1),
+        atc_codes=array("atc_codes", CODE_DTYPE, n_atc),
+        unknown=array("unknown", np.uint8, len(STRING_FIELDS) * n_bytes).reshape(
+            len(STRING_FIELDS), n_bytes
+        ),
+    )
+    return MappedTable(
+        table=table,
+        last_updated=last_updated.rstrip(b"\0").decode("utf-8") or None,
+        identity_hashes=(
+            array("identity_hashes", np.uint64, n_rows) if flags & HAS_IDENTITIES else None
+        ),
+    )
@@ -1,8 +1,18 @@
 from chemcards.database.core import MoleculeEntry, MoleculeDB
 from pydantic import BaseModel, Field
 from chemcards.database.resources import FUNCTIONAL_GROUPS_DATABASE
+from chemcards.database.annotation_cache import AnnotationCache
+from chemcards.database.annotation_cache import default_cache as default_annotation_cache
+from chemcards.database.matching import (
+    FunctionalGroupHierarchy,
+    FunctionalGroupMatcher,
+    annotate,
+    compile_smarts,
+)
+from chemcards.database.molcache import get_mol
 import yaml
-from collections import defaultdict
+from collections.abc import Mapping, Sequence
+import numpy as np
 from rdkit import Chem
 
 
@@ -10,14 +20,20 @@ class FunctionalGroup(BaseModel):
     name: str
     category: str = Field(None)
     smarts: str
+    # Groups contained in every molecule that contains this one
+    parents: tuple[str, ...] = ()
 
     class Config:
         frozen = True
 
     def match(self, molecule: MoleculeEntry) -> bool:
-        patt = Chem.MolFromSmarts(self.smarts)
-        rmol = molecule.to_rdkit()
-        return rmol.HasSubstructMatch(patt)
+        rmol = get_mol(molecule.smiles, copy=False)
+        return bool(self.match_atoms(rmol)) if rmol is not None else False
+
+    def match_atoms(self, mol: Chem.Mol) -> tuple[int, ...]:
+        """Atoms of ``mol`` matching this group (the first match), or ``()``."""
+        pattern = compile_smarts(self.smarts)
+        return mol.GetSubstructMatch(pattern) if pattern is not None else ()
 
     def to_rdkit(self) -> Chem.Mol:
         return Chem.MolFromSmarts(self.smarts)
@@ -32,36 +48,163 @@ FUNCTIONAL_GROUPS = [
     FunctionalGroup(**fg)
     for fg in yaml.safe_load(FUNCTIONAL_GROUPS_DATABASE.read_text())
 ]
+FUNCTIONAL_GROUP_MATCHER = FunctionalGroupMatcher(FUNCTIONAL_GROUPS)
+
+
+class _GroupMoleculesView(Mapping):
+    """Read-only ``FunctionalGroup -> [AnnotatedMoleculeEntry]`` view over the bit matrix.
+
+    Lists are only materialized for the groups that are looked up.
+    """
+
+    def __init__(self, database: "FunctionalGroupDatabase", present: bool):
+        self._database = database
+        self._present = present
+
+    def _rows(self, index: int) -> np.ndarray:
+        if self._present:
+            return self._database.molecules_with(index)
+        return self._database.molecules_without(index)
+
+    def __getitem__(self, fg: FunctionalGroup) -> list[AnnotatedMoleculeEntry]:
+        index = self._database.group_index(fg)
+        rows = self._rows(index) if index is not None else ()
+        if not len(rows):
+            raise KeyError(fg)
+        return [self._database.annotated(row) for row in rows.tolist()]
 
+    def __iter__(self):
+        # Like the defaultdict this replaces: only groups with at least one molecule
+        database = self._database
+        for index, fg in enumerate(database.groups):
+            if len(self._rows(index)):
+                yield fg
 
-class FunctionalGroupDatabase(BaseModel):
-    functional_groups: dict[FunctionalGroup, list[MoleculeEntry]]
-    anti_functional_groups: dict[FunctionalGroup, list[MoleculeEntry]]
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class FunctionalGroupDatabase:
+    """Which functional groups each molecule of a database contains.
+
+    Stored as a packed molecules x groups bit matrix (``bits``) and its transpose
+    (``columns``), so "molecules with group X", "groups absent from molecule Y" and
+    multi-group intersections are bitwise operations over a few bytes per row.
+    ``functional_groups`` / ``anti_functional_groups`` remain available as lazy
+    ``FunctionalGroup -> [AnnotatedMoleculeEntry]`` mappings.
+    """
+
+    def __init__(
+        self,
+        molecule_db: MoleculeDB,
+        bits: np.ndarray,
+        parsed: np.ndarray,
+        groups: Sequence[FunctionalGroup] = FUNCTIONAL_GROUPS,
+    ):
+        self.molecule_db = molecule_db
+        self.groups = list(groups)
+        self.hierarchy = FunctionalGroupHierarchy(self.groups)
+        self.bits = bits
+        self.parsed = parsed
+        n_molecules = len(parsed)
+        present = np.unpackbits(bits, axis=1, count=len(self.groups)).astype(bool)
+        self.columns = np.packbits(present.T, axis=1)
+        self._parsed_bits = np.packbits(parsed)
+        self._n_molecules = n_molecules
+        self._positions = {fg: i for i, fg in enumerate(self.groups)}
+        self._annotated: dict[int, AnnotatedMoleculeEntry] = {}
 
     @classmethod
-    def from_moleculedb(cls, db: MoleculeDB) -> "FunctionalGroupDatabase":
-        fgs = defaultdict(list)
-        afgs = defaultdict(list)
-        for molecule in db.molecules:
-            molecule_fgs = []
-            molecule_afgs = []
-
-            for fg in FUNCTIONAL_GROUPS:
-                if fg.match(molecule):
-                    molecule_fgs.append(fg)
-                else:
-                    molecule_afgs.append(fg)
-            annotated_molecule = AnnotatedMoleculeEntry(
-                **molecule.dict(),
-                functional_groups=molecule_fgs,
-                anti_functional_groups=molecule_afgs,
+    def from_moleculedb(
+        cls,
+        db: MoleculeDB,
+        processes: int | None = 1,
+        groups: Sequence[FunctionalGroup] = FUNCTIONAL_GROUPS,
+        cache: AnnotationCache | bool = True,
+    ) -> "FunctionalGroupDatabase":
+        """Annotate every molecule of ``db``.
+
+        With ``processes`` > 1 (``None`` for every core) chunks of molecules are
+        matched in worker processes. Results are read from and added to the
+        persistent annotation ``cache`` (the default one if ``True``) so only
+        molecule/group pairs not seen before are matched.
+        """
+        smiles = db.table.column("smiles")
+        if cache is True:
+            cache = default_annotation_cache()
+        if cache:
+            annotations = cache.annotate(smiles, groups, processes)
+        else:
+            annotations = annotate(smiles, groups, processes)
+        return cls(db, annotations.bits, annotations.parsed, groups)
+
+    def __len__(self) -> int:
+        return self._n_molecules
+
+    def group_index(self, fg: FunctionalGroup | str | int) -> int | None:
+        if isinstance(fg, int):
+            return fg
+        if isinstance(fg, str):
+            return next((i for i, group in enumerate(self.groups) if group.name == fg), None)
+        return self._positions.get(fg)
+
+    def _indices(self, groups) -> list[int]:
+        indices = [self.group_index(fg) for fg in groups]
+        if None in indices:
+            raise KeyError(groups[indices.index(None)])
+        return indices
+
+    def _rows(self, packed: np.ndarray) -> np.ndarray:
+        return np.flatnonzero(np.unpackbits(packed, count=self._n_molecules))
+
+    def molecules_with(self, *groups) -> np.ndarray:
+        """Rows of the molecules containing *all* of ``groups``."""
+        if not groups:
+            return self._rows(self._parsed_bits)
+        return self._rows(np.bitwise_and.reduce(self.columns[self._indices(groups)], axis=0))
+
+    def molecules_with_any(self, *groups) -> np.ndarray:
+        """Rows of the molecules containing at least one of ``groups``."""
+        if not groups:
+            return np.zeros(0, dtype=np.intp)
+        return self._rows(np.bitwise_or.reduce(self.columns[self._indices(groups)], axis=0))
+
+    def molecules_without(self, *groups) -> np.ndarray:
+        """Rows of the (parsed) molecules containing none of ``groups``."""
+        if not groups:
+            return self._rows(self._parsed_bits)
+        present = np.bitwise_or.reduce(self.columns[self._indices(groups)], axis=0)
+        return self._rows(self._parsed_bits & ~present)
+
+    def groups_of(self, row: int) -> list[FunctionalGroup]:
+        present = np.unpackbits(self.bits[row], count=len(self.groups))
+        return [self.groups[i] for i in np.flatnonzero(present).tolist()]
+
+    def groups_absent_from(self, row: int) -> list[FunctionalGroup]:
+        if not self.parsed[row]:
+            return []
+        present = np.unpackbits(self.bits[row], count=len(self.groups))
+        return [self.groups[i] for i in np.flatnonzero(present == 0).tolist()]
+
+    def counts(self) -> dict[FunctionalGroup, int]:
+        """Number of molecules containing each group."""
+        totals = np.unpackbits(self.columns, axis=1, count=self._n_molecules).sum(axis=1)
+        return dict(zip(self.groups, totals.tolist()))
+
+    def annotated(self, row: int) -> AnnotatedMoleculeEntry:
+        molecule = self._annotated.get(row)
+        if molecule is None:
+            molecule = self._annotated[row] = AnnotatedMoleculeEntry(
+                **self.molecule_db.table.record(row),
+                functional_groups=self.groups_of(row),
+                anti_functional_groups=self.groups_absent_from(row),
             )
-            for fg in molecule_fgs:
-                fgs[fg].append(annotated_molecule)
-            for fg in molecule_afgs:
-                afgs[fg].append(annotated_molecule)
-
-        return FunctionalGroupDatabase(
-            functional_groups=fgs,
-            anti_functional_groups=afgs,
-        )
+        return molecule
+
+    @property
+    def functional_groups(self) -> Mapping[FunctionalGroup, list[AnnotatedMoleculeEntry]]:
+        return _GroupMoleculesView(self, present=True)
+
+    @property
+    def anti_functional_groups(self) -> Mapping[FunctionalGroup, list[AnnotatedMoleculeEntry]]:
+        return _GroupMoleculesView(self, present=False)
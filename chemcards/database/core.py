@@ -1,8 +1,20 @@
-from pydantic import BaseModel, Field
+from collections.abc import Iterable, Sequence
+from pydantic import BaseModel, Field, PrivateAttr, model_serializer, model_validator
 from chemcards.database.resources import MOLECULE_DATABASE
+from chemcards.database.indexes import MoleculeIndexes
+from chemcards.database.table import MoleculeTable, last_unique
+from chemcards.database import binary, identity, molcache
+from chemcards.database.files import atomic_write
+from chemcards.database.journal import MoleculeJournal
 import json
+import logging
+import os
+from pathlib import Path
+import numpy as np
 from abc import abstractmethod
-from rdkit.Chem import Mol, MolFromSmiles
+from rdkit.Chem import Mol
+
+logger = logging.getLogger(__name__)
 
 
 class MoleculeEntry(BaseModel):
@@ -17,32 +29,227 @@ class MoleculeEntry(BaseModel):
     atc_classifications: list[str] = Field(default_factory=list)
 
     def to_rdkit(self) -> Mol:
-        return MolFromSmiles(self.smiles)
+        return molcache.get_mol(self.smiles)
+
+
+class MoleculeList(Sequence):
+    """Read-only view over a :class:`MoleculeTable`.
+
+    Entries are materialized on demand, without re-validation, when indexed or iterated.
+    """
+
+    def __init__(self, table: MoleculeTable):
+        self.table = table
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MoleculeList(self.table.take(range(len(self.table))[index]))
+        return MoleculeEntry.model_construct(**self.table.record(index))
+
+    def __iter__(self):
+        for record in self.table.records():
+            yield MoleculeEntry.model_construct(**record)
+
+    def __repr__(self) -> str:
+        return f"MoleculeList(<{len(self)} molecules>)"
 
 
 class MoleculeDB(BaseModel):
-    molecules: list[MoleculeEntry]
     last_updated: str | None = None
+    _table: MoleculeTable = PrivateAttr(default_factory=MoleculeTable.empty)
+
+    def __init__(
+        self,
+        molecules: Iterable = (),
+        table: MoleculeTable | None = None,
+        **data,
+    ):
+        super().__init__(**data)
+        self._table = table if table is not None else MoleculeTable.from_records(molecules)
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def _validate_molecules(cls, data, handler):
+        # Build the columns directly from raw records rather than validating a model per molecule
+        if isinstance(data, dict) and "molecules" in data:
+            data = dict(data)
+            molecules = data.pop("molecules")
+            db = handler(data)
+            db._table = MoleculeTable.from_records(molecules)
+            return db
+        return handler(data)
+
+    @model_serializer(mode="wrap")
+    def _serialize_molecules(self, handler):
+        return {"molecules": list(self._table.records()), **handler(self)}
+
+    @property
+    def table(self) -> MoleculeTable:
+        return self._table
+
+    @property
+    def molecules(self) -> MoleculeList:
+        return MoleculeList(self._table)
+
+    @molecules.setter
+    def molecules(self, molecules: Iterable) -> None:
+        self._table = MoleculeTable.from_records(molecules)
+
+    @property
+    def indexes(self) -> MoleculeIndexes:
+        """Inverted indexes (target, mechanism, action type, ATC) of this snapshot."""
+        return MoleculeIndexes.of(self._table)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def take(self, rows) -> "MoleculeDB":
+        """A new database of the selected rows (integer ids or boolean mask)."""
+        return type(self)(table=self._table.take(rows), last_updated=self.last_updated)
 
     def update(self, other: "MoleculeDB") -> "MoleculeDB":
-        self_molecules = {molecule.name: molecule for molecule in self.molecules}
-        other_molecules = {molecule.name: molecule for molecule in other.molecules}
-        self_molecules.update(other_molecules)
+        """Merge ``other`` into this database; molecules in ``other`` win on equal structure."""
         return MoleculeDB(
-            molecules=list(self_molecules.values()),
+            table=deduplicate(self._table.concat(other.table)),
             last_updated=self.last_updated,
         )
 
+    def remove_duplicates(self) -> None:
+        """Keep one molecule (the last) per structure, e.g. merging salt forms and synonyms."""
+        self._table = deduplicate(self._table)
+
     @classmethod
-    def load(cls) -> "MoleculeDB":
-        if not MOLECULE_DATABASE.exists():
-            return MoleculeDB(molecules=[])
+    def load(cls, path: Path = MOLECULE_DATABASE) -> "MoleculeDB":
+        if path.exists():
+            mapped = cls._read_binary(path)
+            if mapped is not None:
+                db = cls(table=mapped.table, last_updated=mapped.last_updated)
+            else:
+                db = cls._load_json(path)
         else:
-            with open(MOLECULE_DATABASE, "r") as f:
-                return cls.model_validate_json(f.read())
-
-    def save(self) -> bool:
-        existing_db = MoleculeDB.load()
-        newdb = self.update(existing_db)
-        with open(MOLECULE_DATABASE, "w") as f:
-            f.write(newdb.model_dump_json())
+            db = MoleculeDB(molecules=[])
+        return db._replay(MoleculeJournal(path))
+
+    def save(self, path: Path = MOLECULE_DATABASE) -> bool:
+        """Add molecules not already in the database at ``path``.
+
+        Existing molecules (by structure, see :mod:`chemcards.database.identity`) are
+        kept as they are. Only the new molecules are written, as one transaction
+        appended to the change journal, so the cost of a save follows the size of the
+        change rather than of the database. Nothing is written when there is no new
+        molecule and ``last_updated`` is unchanged.
+
+        Returns whether any molecule was added.
+        """
+        journal = MoleculeJournal(path)
+        if not path.exists() and not journal.exists():
+            self._write_snapshot(path)
+            return len(self._table) > 0
+
+        identities = identity.identities(self._table, path)
+        rows = last_unique(identities)
+        identities = [identities[row] for row in rows.tolist()]
+        journaled = set(identity.identities(MoleculeTable.from_records(journal.molecules())))
+        known = self._snapshot_contains(path, identities)
+        known |= np.fromiter(
+            (key in journaled for key in identities), dtype=bool, count=len(identities)
+        )
+        added = rows[~known]
+        if not len(added) and self.last_updated == self._stored_last_updated(path, journal):
+            return False
+        journal.append(list(self._table.take(added).records()), self.last_updated)
+        identity.save_index(path)
+        molcache.database_changed(path)
+
+        if journal.needs_compaction():
+            MoleculeDB.compact(path)
+        return len(added) > 0
+
+    @classmethod
+    def _stored_last_updated(cls, path: Path, journal: MoleculeJournal) -> str | None:
+        transactions = list(journal.transactions())
+        if transactions:
+            return transactions[-1]["last_updated"]
+        if not path.exists():
+            return None
+        mapped = cls._read_binary(path)
+        return mapped.last_updated if mapped is not None else cls._load_json(path).last_updated
+
+    @classmethod
+    def compact(cls, path: Path = MOLECULE_DATABASE) -> None:
+        """Fold the change journal into a new snapshot and remove it."""
+        cls.load(path)._write_snapshot(path)
+
+    def _write_snapshot(self, path: Path) -> None:
+        identities = identity.identities(self._table, path)
+        rows = last_unique(identities)
+        db = type(self)(table=self._table.take(rows), last_updated=self.last_updated)
+        with atomic_write(path, "w") as f:
+            f.write(db.model_dump_json())
+        db._write_binary(path, [identities[row] for row in rows.tolist()])
+        identity.save_index(path, db.table.column("smiles"))
+        MoleculeJournal(path).clear()
+        molcache.database_changed(path)
+
+    def _replay(self, journal: MoleculeJournal) -> "MoleculeDB":
+        molecules, last_updated = [], self.last_updated
+        for transaction in journal.transactions():
+            molecules.extend(transaction["molecules"])
+            last_updated = transaction["last_updated"]
+        if not molecules and last_updated == self.last_updated:
+            return self
+        # Journaled molecules are upserts on top of the snapshot
+        merged = self._table.concat(MoleculeTable.from_records(molecules))
+        return type(self)(table=deduplicate(merged, journal.snapshot), last_updated=last_updated)
+
+    @classmethod
+    def _load_json(cls, path: Path) -> "MoleculeDB":
+        with open(path, "r") as f:
+            db = cls.model_validate_json(f.read())
+        # Identities are left to the first save that needs them
+        db._write_binary(path)
+        return db
+
+    @staticmethod
+    def _read_binary(path: Path) -> binary.MappedTable | None:
+        # The memory-mapped binary sidecar, if it was built from this JSON file
+        try:
+            return binary.read_table(binary.binary_path(path), source=path)
+        except binary.BinaryFormatError as e:
+            logger.warning("Ignoring unreadable binary molecule database: %s", e)
+            return None
+
+    @classmethod
+    def _snapshot_contains(cls, path: Path, identities: list[str]) -> np.ndarray:
+        if not path.exists():
+            return np.zeros(len(identities), dtype=bool)
+        mapped = cls._read_binary(path)
+        if mapped is None:
+            snapshot = cls._load_json(path)
+            mapped = cls._read_binary(path)
+            if mapped is None:
+                return np.isin(identities, identity.identities(snapshot.table, path))
+        if mapped.identity_hashes is None:
+            return np.isin(identities, identity.identities(mapped.table, path))
+        return mapped.contains(identities)
+
+    def _write_binary(self, path: Path, identities: list[str] | None = None) -> None:
+        target = binary.binary_path(path)
+        if not os.access(target.parent, os.W_OK):
+            # Check before encoding anything: the build would be thrown away
+            return
+        try:
+            binary.write_table(
+                self._table, target, self.last_updated, source=path, identities=identities
+            )
+        except OSError as e:
+            # e.g. an installed, read-only package directory; JSON remains the source of truth
+            logger.debug("Could not write binary molecule database: %s", e)
+
+
+def deduplicate(table: MoleculeTable, database: Path | None = None) -> MoleculeTable:
+    """The last row per structural identity, in first-seen order."""
+    return table.take(last_unique(identity.identities(table, database)))
@@ -0,0 +1,118 @@
+"""Physicochemical descriptors of every molecule, stored as ``float32`` columns.
+
+Descriptors are computed on first use, for the molecule as stored (salts included),
+and kept as a ``float32[n_molecules, len(DESCRIPTORS)]`` array on the
+:class:`MoleculeTable`. The array is persisted in the cache directory, keyed by the
+SMILES and RDKit version, so loading a database never parses its molecules and
+later processes map it instead of computing it again. Range filters, and the
+Lipinski and Veber rules derived from the columns, are then vectorized comparisons
+that never touch RDKit.
+
+Molecules whose SMILES cannot be parsed get ``NaN`` descriptors, so they fail every
+range comparison.
+"""
+import threading
+from collections.abc import Callable, Sequence
+from pathlib import Path
+
+import numpy as np
+import rdkit
+from rdkit import Chem
+from rdkit.Chem import Crippen, Descriptors, rdMolDescriptors
+
+from chemcards.database.files import cached_array
+from chemcards.database.molcache import get_mol
+from chemcards.database.resources import CACHE_DIR
+from chemcards.database.table import MoleculeTable
+
+DTYPE = np.float32
+PREFIX = "descriptors_"
+
+DESCRIPTORS: dict[str, Callable[[Chem.Mol], float]] = {
+    "heavy_atoms": Chem.Mol.GetNumHeavyAtoms,
+    "molecular_weight": Descriptors.MolWt,
+    "clogp": Crippen.MolLogP,
+    "tpsa": rdMolDescriptors.CalcTPSA,
+    "hbd": rdMolDescriptors.CalcNumHBD,
+    "hba": rdMolDescriptors.CalcNumHBA,
+    "rotatable_bonds": rdMolDescriptors.CalcNumRotatableBonds,
+    "rings": rdMolDescriptors.CalcNumRings,
+}
+NAMES = tuple(DESCRIPTORS)
+
+_lock = threading.Lock()
+
+
+def descriptors(mol: Chem.Mol) -> list[float]:
+    """Every descriptor of ``mol``, in ``NAMES`` order."""
+    return [function(mol) for function in DESCRIPTORS.values()]
+
+
+def compute(smiles: Sequence[str]) -> np.ndarray:
+    """Descriptors of ``smiles``; molecules that cannot be parsed get ``NaN``."""
+    array = np.full((len(smiles), len(NAMES)), np.nan, dtype=DTYPE)
+    for row, value in enumerate(smiles):
+        mol = get_mol(value, copy=False)
+        if mol is not None:
+            array[row] = descriptors(mol)
+    return array
+
+
+def of(table: MoleculeTable, cache_dir: Path | None = CACHE_DIR) -> np.ndarray:
+    """The descriptors of ``table``, attached to it on first use and persisted in ``cache_dir``."""
+    with _lock:
+        if table.descriptors is None:
+            smiles = table.column("smiles")
+            table.descriptors = cached_array(
+                cache_dir,
+                PREFIX,
+                [rdkit.__version__, *NAMES, *smiles],
+                lambda: compute(smiles),
+                (len(smiles), len(NAMES)),
+                DTYPE,
+            )
+        return table.descriptors
+
+
+def column(table: MoleculeTable, name: str) -> np.ndarray:
+    """One descriptor of every molecule of ``table``."""
+    try:
+        index = NAMES.index(name)
+    except ValueError:
+        raise KeyError(f"Unknown descriptor {name!r}; expected one of {', '.join(NAMES)}")
+    return of(table)[:, index]
+
+
+def in_range(
+    table: MoleculeTable,
+    name: str,
+    minimum: float | None = None,
+    maximum: float | None = None,
+) -> np.ndarray:
+    """Mask of the molecules whose descriptor ``name`` is within ``[minimum, maximum]``."""
+    values = column(table, name)
+    mask = ~np.isnan(values)
+    if minimum is not None:
+        mask &= values >= minimum
+    if maximum is not None:
+        mask &= values <= maximum
+    return mask
+
+
+def lipinski_violations(table: MoleculeTable) -> np.ndarray:
+    """Number of Lipinski rule-of-five limits each molecule exceeds (MW > 500,
+    cLogP > 5, more than 5 H-bond donors or 10 acceptors); -1 if it has no structure.
+    """
+    violations = (
+        (column(table, "molecular_weight") > 500).astype(np.int8)
+        + (column(table, "clogp") > 5)
+        + (column(table, "hbd") > 5)
+        + (column(table, "hba") > 10)
+    )
+    violations[np.isnan(column(table, "heavy_atoms"))] = -1
+    return violations
+
+
+def veber(table: MoleculeTable) -> np.ndarray:
+    """Mask of the molecules meeting Veber's rules (at most 10 rotatable bonds, TPSA <= 140)."""
+    return in_range(table, "rotatable_bonds", maximum=10) & in_range(table, "tpsa", maximum=140)
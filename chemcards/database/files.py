@@ -0,0 +1,85 @@
+import hashlib
+import logging
+import os
+import tempfile
+from collections.abc import Callable, Iterable
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from chemcards.database.journal import journal_path
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def atomic_write(path: Path, mode: str = "wb", **kwargs):
+    """Write to a temporary file next to ``path`` and rename it into place on success.
+
+    Readers (including ones that have the old file mapped) see either the old or the
+    new contents, never a partially written file.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def database_stamp(path: Path) -> str:
+    """Changes whenever the database at ``path`` (snapshot or change journal) changes."""
+    parts = []
+    for file in (Path(path), journal_path(path)):
+        try:
+            stat = os.stat(file)
+            parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+        except FileNotFoundError:
+            parts.append("-")
+    return "/".join(parts)
+
+
+def cached_array(
+    cache_dir: Path | None,
+    prefix: str,
+    keys: Iterable[str],
+    compute: Callable[[], np.ndarray],
+    shape: tuple[int, ...],
+    dtype: np.dtype,
+) -> np.ndarray:
+    """``compute()``, saved as ``<prefix><hash of keys>.npy`` and memory-mapped next time.
+
+    Files with the same prefix but other keys are stale versions and are removed
+    when a new one is written. With ``cache_dir=None`` nothing is stored.
+    """
+    if cache_dir is None:
+        return compute()
+    digest = hashlib.blake2b(digest_size=16)
+    for key in keys:
+        digest.update(key.encode("utf-8") + b"\n")
+    path = Path(cache_dir) / f"{prefix}{digest.hexdigest()}.npy"
+    try:
+        array = np.load(path, mmap_mode="r")
+        if array.shape == tuple(shape) and array.dtype == dtype:
+            return array
+    except (OSError, ValueError):
+        pass
+    array = compute()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(path) as f:
+            np.save(f, array)
+        for stale in path.parent.glob(f"{prefix}*.npy"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+    except OSError as e:
+        logger.debug("Could not write %s: %s", path, e)
+    return array
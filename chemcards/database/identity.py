@@ -0,0 +1,208 @@
+"""Structural identity of molecules, used to deduplicate and merge databases.
+
+Each SMILES is reduced to its parent structure (known salt and solvent fragments
+removed, charges neutralized) and keyed by:
+
+- ``canonical_smiles`` of the parent,
+- ``inchikey`` of the parent, the identity molecules are deduplicated on, and
+- ``skeleton``, the first InChIKey block (connectivity only), which is shared by
+  stereoisomers,
+- ``scaffold``, the Bemis-Murcko scaffold (ring systems and the linkers between
+  them) of the parent, and ``framework``, the same scaffold with every atom made
+  carbon and every bond single. Both are ``""`` for molecules without rings.
+
+Only fragments on RDKit's known salt/solvent list are stripped. Keeping the largest
+fragment instead would give e.g. lithium citrate and piperazine citrate the same
+parent. Molecules whose SMILES cannot be parsed fall back to being identified by name.
+
+The keys depend only on the SMILES (and the RDKit version), so they are computed once
+and persisted in a ``<database>.structures.json`` index next to the database.
+"""
+import json
+import logging
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+import rdkit
+from rdkit import Chem
+from rdkit.Chem.MolStandardize import rdMolStandardize
+from rdkit.Chem.Scaffolds import MurckoScaffold
+
+from chemcards.database.files import atomic_write
+from chemcards.database.molcache import get_mol
+from chemcards.database.resources import MOLECULE_DATABASE
+from chemcards.database.table import MoleculeTable
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".structures.json"
+
+
+class StructureKeys(NamedTuple):
+    canonical_smiles: str
+    inchikey: str
+    skeleton: str
+    scaffold: str
+    framework: str
+
+
+def index_path(database: Path) -> Path:
+    return Path(database).with_suffix(SUFFIX)
+
+
+_standardizers = threading.local()
+
+
+def parent(mol: Chem.Mol) -> Chem.Mol:
+    """``mol`` without known salt/solvent fragments and with charges neutralized."""
+    if not hasattr(_standardizers, "remover"):
+        _standardizers.remover = rdMolStandardize.FragmentRemover()
+        _standardizers.uncharger = rdMolStandardize.Uncharger()
+    mol = _standardizers.uncharger.uncharge(_standardizers.remover.remove(mol))
+    # The standardizers leave ring information unset
+    Chem.GetSymmSSSR(mol)
+    return mol
+
+
+def scaffolds(mol: Chem.Mol) -> tuple[str, str]:
+    """The Murcko scaffold and generic framework SMILES of ``mol``."""
+    scaffold = MurckoScaffold.GetScaffoldForMol(mol)
+    if not scaffold.GetNumAtoms():
+        return "", ""
+    # Exocyclic double-bonded atoms kept in the scaffold become substituents once
+    # made generic; stripping them again gives the cyclic skeleton
+    framework = MurckoScaffold.GetScaffoldForMol(MurckoScaffold.MakeScaffoldGeneric(scaffold))
+    return Chem.MolToSmiles(scaffold), Chem.MolToSmiles(framework)
+
+
+def structure_keys(smiles: str) -> StructureKeys | None:
+    mol = get_mol(smiles, copy=False)
+    if mol is None:
+        return None
+    mol = parent(mol)
+    inchikey = Chem.MolToInchiKey(mol)
+    if not inchikey:
+        return None
+    return StructureKeys(Chem.MolToSmiles(mol), inchikey, inchikey.split("-")[0], *scaffolds(mol))
+
+
+class StructureIndex:
+    """``SMILES -> StructureKeys`` lookup, filled lazily and persisted per database."""
+
+    def __init__(self):
+        self._keys: dict[str, StructureKeys | None] = {}
+        self._loaded: set[Path] = set()
+        self._saved: dict[Path, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, smiles: str) -> bool:
+        return smiles in self._keys
+
+    def keys(self, smiles: str) -> StructureKeys | None:
+        """The structure keys of ``smiles``, or ``None`` if it cannot be parsed."""
+        try:
+            return self._keys[smiles]
+        except KeyError:
+            keys = structure_keys(smiles)
+            with self._lock:
+                self._keys[smiles] = keys
+            return keys
+
+    def identities(self, table: MoleculeTable) -> list[str]:
+        """One identity per row: the parent InChIKey, or the name if there is no structure."""
+        identities = []
+        for smiles, name in zip(table.column("smiles"), table.column("name")):
+            keys = self.keys(smiles)
+            identities.append(keys.inchikey if keys is not None else f"name:{name}")
+        return identities
+
+    def load(self, database: Path) -> None:
+        """Merge the index persisted next to ``database``, if any."""
+        path = index_path(database)
+        with self._lock:
+            if path in self._loaded:
+                return
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                return
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring unreadable structure index %s: %s", path, e)
+                return
+            self._loaded.add(path)
+            # InChI and canonical SMILES can change between RDKit releases
+            if data.get("rdkit") != rdkit.__version__:
+                return
+            for smiles, keys in data["structures"].items():
+                # Entries from before a key was added are recomputed when needed
+                if keys is None or len(keys) == len(StructureKeys._fields):
+                    self._keys.setdefault(smiles, StructureKeys(*keys) if keys else None)
+            self._saved[path] = len(self._keys)
+
+    def save(self, database: Path, smiles: Iterable[str] | None = None) -> None:
+        """Persist the index next to ``database``.
+
+        With ``smiles`` only those entries are written (dropping ones for molecules no
+        longer in the database); otherwise everything, if keys were added since the
+        last save.
+        """
+        path = index_path(database)
+        with self._lock:
+            if smiles is not None:
+                structures = {value: self.keys(value) for value in dict.fromkeys(smiles)}
+            elif self._saved.get(path) == len(self._keys) and path.exists():
+                return
+            else:
+                structures = self._keys
+            data = {"rdkit": rdkit.__version__, "structures": structures}
+            try:
+                with atomic_write(path, "w") as f:
+                    json.dump(data, f)
+            except OSError as e:
+                logger.debug("Could not write structure index: %s", e)
+                return
+            self._loaded.add(path)
+            self._saved[path] = len(self._keys)
+
+
+_default_index: StructureIndex | None = None
+_default_lock = threading.Lock()
+
+
+def default_index() -> StructureIndex:
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = StructureIndex()
+            _default_index.load(MOLECULE_DATABASE)
+        return _default_index
+
+
+def identities(table: MoleculeTable, database: Path | None = None) -> list[str]:
+    """Structural identities of the rows of ``table`` (see :meth:`StructureIndex.identities`)."""
+    index = default_index()
+    if database is not None:
+        index.load(database)
+    return index.identities(table)
+
+
+def save_index(database: Path, smiles: Iterable[str] | None = None) -> None:
+    default_index().save(database, smiles)
+
+
+def group_by(table: MoleculeTable, key: str = "skeleton") -> dict[str, list[int]]:
+    """Rows of ``table`` grouped by one of the :class:`StructureKeys` fields."""
+    index = default_index()
+    groups: dict[str, list[int]] = {}
+    for row, smiles in enumerate(table.column("smiles")):
+        keys = index.keys(smiles)
+        if keys is not None:
+            groups.setdefault(getattr(keys, key), []).append(row)
+    return groups
+
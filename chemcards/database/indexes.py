@@ -0,0 +1,220 @@
+"""Lazy inverted indexes over a :class:`MoleculeTable`.
+
+Each index maps a field value to the (sorted) row ids holding it, so selecting or
+grouping molecules by target, mechanism, action type or ATC code is a dictionary
+lookup instead of a scan. Indexes are built on first use and cached per table; a
+table never changes once built, so a cached index stays valid for as long as the
+table (i.e. the database snapshot) is alive.
+"""
+import threading
+import weakref
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+
+from chemcards.database.table import MoleculeTable, StringPool
+
+# Length of an ATC code at each of its five levels, e.g. L, L01, L01E, L01EA, L01EA01
+ATC_LEVELS = (1, 3, 4, 5, 7)
+
+
+def atc_level(code: str) -> int | None:
+    """The ATC level (1-5) of ``code``, or ``None`` if its length matches no level."""
+    try:
+        return ATC_LEVELS.index(len(code)) + 1
+    except ValueError:
+        return None
+
+
+class InvertedIndex:
+    """``value -> row ids`` over one column of codes into a :class:`StringPool`."""
+
+    def __init__(self, pool: StringPool, keys: np.ndarray, rows: np.ndarray):
+        # Group rows by key with one stable sort; each group's rows stay in table order
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        self.pool = pool
+        self.rows_by_key = rows[order]
+        self.keys, self.starts, self.counts = np.unique(
+            keys, return_index=True, return_counts=True
+        )
+        self._positions = {key: i for i, key in enumerate(self.keys.tolist())}
+
+    @classmethod
+    def from_codes(cls, pool: StringPool, codes: np.ndarray) -> "InvertedIndex":
+        return cls(pool, codes, np.arange(len(codes), dtype=np.intp))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, value: str) -> bool:
+        return self._position(value) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.pool.decode(self.keys))
+
+    def _position(self, value: str) -> int | None:
+        code = self.pool.code(value)
+        return None if code is None else self._positions.get(code)
+
+    def _group(self, position: int) -> np.ndarray:
+        start = self.starts[position]
+        return self.rows_by_key[start : start + self.counts[position]]
+
+    def rows(self, value: str) -> np.ndarray:
+        """Row ids whose value is ``value``, in table order."""
+        position = self._position(value)
+        if position is None:
+            return np.zeros(0, dtype=np.intp)
+        return self._group(position)
+
+    def rows_any(self, values: Iterable[str]) -> np.ndarray:
+        """Sorted, unique row ids matching any of ``values``."""
+        groups = [self.rows(value) for value in values]
+        if not groups:
+            return np.zeros(0, dtype=np.intp)
+        return np.unique(np.concatenate(groups))
+
+    def counts_by_value(self) -> dict[str, int]:
+        """Number of rows per value, e.g. for statistics pages."""
+        return dict(zip(self.pool.decode(self.keys), self.counts.tolist()))
+
+    def groups(self) -> Iterator[tuple[str, np.ndarray]]:
+        for position, value in enumerate(self.pool.decode(self.keys)):
+            yield value, self._group(position)
+
+
+class ATCIndex(InvertedIndex):
+    """Row ids per ATC code at every level: ``"L"``, ``"L01"``, ... ``"L01EA01"``.
+
+    A molecule appears once under a code even if several of its classifications
+    share that prefix.
+    """
+
+    def __init__(self, table: MoleculeTable):
+        atc_codes = table.atc_codes
+        atc_rows = np.repeat(np.arange(len(table), dtype=np.intp), np.diff(table.atc_offsets))
+        # Each distinct ATC string contributes one prefix per level it reaches
+        pool = StringPool()
+        unique_codes, inverse = np.unique(atc_codes, return_inverse=True)
+        levels = []
+        for length in ATC_LEVELS:
+            prefixes = np.fromiter(
+                (
+                    pool.intern(code[:length]) if len(code) >= length else -1
+                    for code in table.pool.decode(unique_codes)
+                ),
+                dtype=np.int64,
+                count=len(unique_codes),
+            )
+            levels.append(prefixes[inverse])
+        keys = np.concatenate(levels) if levels else np.zeros(0, dtype=np.int64)
+        rows = np.tile(atc_rows, len(ATC_LEVELS))
+        valid = keys >= 0
+        # Drop repeated (prefix, row) pairs
+        stride = len(table) + 1
+        pairs = np.unique(keys[valid] * stride + rows[valid])
+        super().__init__(pool, pairs // stride, (pairs % stride).astype(np.intp))
+
+    def level(self, level: int) -> list[str]:
+        """All codes present at ATC ``level`` (1-5)."""
+        length = ATC_LEVELS[level - 1]
+        return [value for value in self if len(value) == length]
+
+
+class ScaffoldIndex(InvertedIndex):
+    """Row ids per Murcko scaffold (or generic framework) of the molecules' parents.
+
+    Molecules without rings, or whose SMILES cannot be parsed, have no scaffold.
+    The keys come from the persisted structure index, so only molecules new to the
+    database are decomposed when it changes.
+    """
+
+    def __init__(self, table: MoleculeTable, key: str = "scaffold", structures=None):
+        # Imported here: the structure keys need RDKit, the other indexes do not
+        from chemcards.database import identity
+
+        index = structures if structures is not None else identity.default_index()
+        pool = StringPool()
+        self.row_keys = np.full(len(table), -1, dtype=np.int64)
+        for row, smiles in enumerate(table.column("smiles")):
+            keys = index.keys(smiles)
+            value = getattr(keys, key) if keys is not None else ""
+            if value:
+                self.row_keys[row] = pool.intern(value)
+        rows = np.flatnonzero(self.row_keys >= 0)
+        super().__init__(pool, self.row_keys[rows], rows)
+
+    def of_row(self, row: int) -> str | None:
+        """The scaffold of molecule ``row``, if it has one."""
+        code = int(self.row_keys[row])
+        return self.pool[code] if code >= 0 else None
+
+    def family(self, row: int) -> np.ndarray:
+        """Rows sharing the scaffold of molecule ``row`` (including itself)."""
+        value = self.of_row(row)
+        return self.rows(value) if value is not None else np.zeros(0, dtype=np.intp)
+
+
+class MoleculeIndexes:
+    """The lazily built indexes of one table; get them with :meth:`of`."""
+
+    _cache: "weakref.WeakKeyDictionary[MoleculeTable, MoleculeIndexes]" = (
+        weakref.WeakKeyDictionary()
+    )
+    _cache_lock = threading.Lock()
+
+    def __init__(self, table: MoleculeTable):
+        self._table = weakref.ref(table)
+        self._indexes: dict[str, InvertedIndex] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def of(cls, table: MoleculeTable) -> "MoleculeIndexes":
+        with cls._cache_lock:
+            indexes = cls._cache.get(table)
+            if indexes is None:
+                indexes = cls._cache[table] = cls(table)
+            return indexes
+
+    def built(self, name: str) -> bool:
+        return name in self._indexes
+
+    def field(self, field: str) -> InvertedIndex:
+        """The index of a string column, e.g. ``"target"``."""
+        return self._get(
+            field, lambda table: InvertedIndex.from_codes(table.pool, table.codes(field))
+        )
+
+    @property
+    def target(self) -> InvertedIndex:
+        return self.field("target")
+
+    @property
+    def mechanism_of_action(self) -> InvertedIndex:
+        return self.field("mechanism_of_action")
+
+    @property
+    def action_type(self) -> InvertedIndex:
+        return self.field("action_type")
+
+    @property
+    def atc(self) -> ATCIndex:
+        return self._get("atc_classifications", ATCIndex)
+
+    @property
+    def scaffold(self) -> ScaffoldIndex:
+        return self._get("scaffold", ScaffoldIndex)
+
+    @property
+    def framework(self) -> ScaffoldIndex:
+        return self._get("framework", lambda table: ScaffoldIndex(table, "framework"))
+
+    def _get(self, name, build):
+        index = self._indexes.get(name)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = self._indexes[name] = build(self._table())
+        return index
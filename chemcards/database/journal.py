@@ -0,0 +1,101 @@
+"""Append-only change journal for the JSON molecule database.
+
+Each :meth:`MoleculeDB.save` appends one line to ``<database>.journal``::
+
+    {"last_updated": "2026-01-01", "molecules": [{...}, ...]}
+
+A line is one save: it is written with a single ``write`` and ``fsync``, and a torn
+final line (a crash mid-append) is ignored on replay, so a save is either fully
+applied or not at all. Molecules are keyed by structure and replayed as upserts on
+top of the snapshot. Once the journal grows past a fraction of the snapshot, it is
+compacted: the merged database is written to a new snapshot which is atomically
+renamed over the old one, and the journal is removed.
+"""
+import json
+import logging
+import os
+from collections.abc import Iterator
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".journal"
+# Compact once the journal is this large relative to the snapshot ...
+COMPACTION_RATIO = 0.25
+# ... but never bother for journals smaller than this
+COMPACTION_MIN_BYTES = 64 * 1024
+
+
+def journal_path(snapshot: Path) -> Path:
+    return Path(snapshot).with_suffix(SUFFIX)
+
+
+class MoleculeJournal:
+    def __init__(self, snapshot: Path):
+        self.snapshot = Path(snapshot)
+        self.path = journal_path(snapshot)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    @property
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def transactions(self) -> Iterator[dict]:
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    logger.warning("Ignoring incomplete transaction at the end of %s", self.path)
+                    break
+                yield json.loads(line)
+
+    def molecules(self) -> list[dict]:
+        return [
+            molecule
+            for transaction in self.transactions()
+            for molecule in transaction["molecules"]
+        ]
+
+    def append(self, molecules: list[dict], last_updated: str | None) -> None:
+        line = json.dumps({"last_updated": last_updated, "molecules": molecules})
+        with open(self.path, "ab") as f:
+            self._truncate_incomplete(f)
+            f.write(line.encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _truncate_incomplete(f) -> None:
+        """Drop a torn final line left by an interrupted append."""
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        with open(f.name, "rb") as reader:
+            reader.seek(size - 1)
+            if reader.read(1) == b"\n":
+                return
+            reader.seek(0)
+            end = reader.read().rfind(b"\n") + 1
+        f.truncate(end)
+
+    def needs_compaction(self) -> bool:
+        size = self.size
+        if size < COMPACTION_MIN_BYTES:
+            return False
+        try:
+            snapshot_size = self.snapshot.stat().st_size
+        except FileNotFoundError:
+            return True
+        return size > COMPACTION_RATIO * snapshot_size
+
+    def clear(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,311 @@
+"""Precompiled multi-pattern SMARTS matching for functional groups.
+
+Every SMARTS is compiled once per process (:func:`compile_smarts`) and a
+:class:`FunctionalGroupMatcher` tests all of its patterns against one parsed
+molecule in a single call, optionally returning the matched atoms. The same
+engine backs :mod:`chemcards.database.cheminformatics`, the catalog script and
+the GUI highlighter. :func:`annotate` runs a matcher over a whole list of
+molecules, in worker processes if asked to.
+
+Groups may declare ``parents``: groups that every molecule containing them also
+contains (e.g. every ethyl group contains a methyl group). A matcher tests parents
+first and skips every descendant of a parent that did not match, counting the
+skipped tests in ``pruned``. Declaring a parent is a promise the matcher relies
+on, so only declare subsumptions that hold for every molecule.
+"""
+import functools
+import logging
+import os
+from collections.abc import Iterable, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple
+
+import numpy as np
+from rdkit import Chem
+
+logger = logging.getLogger(__name__)
+
+# Enough atom mappings to highlight every occurrence in a drug-sized molecule
+MAX_MATCHES = 1000
+
+
+@functools.lru_cache(maxsize=None)
+def compile_smarts(smarts: str) -> Chem.Mol | None:
+    """The query molecule for ``smarts``, shared by all callers; do not modify it."""
+    pattern = Chem.MolFromSmarts(smarts)
+    if pattern is None:
+        logger.warning("Invalid functional group SMARTS: %s", smarts)
+    return pattern
+
+
+def match_bonds(mol: Chem.Mol, pattern: Chem.Mol, atoms: Sequence[int]) -> tuple[int, ...]:
+    """Indices of the bonds of ``mol`` matched by ``pattern`` mapped onto ``atoms``."""
+    bonds = []
+    for bond in pattern.GetBonds():
+        match_bond = mol.GetBondBetweenAtoms(
+            atoms[bond.GetBeginAtomIdx()], atoms[bond.GetEndAtomIdx()]
+        )
+        if match_bond is not None:
+            bonds.append(match_bond.GetIdx())
+    return tuple(bonds)
+
+
+def group_smarts(group) -> str:
+    """The SMARTS of a ``FunctionalGroup``-like object or of a mapping with a ``"smarts"`` key."""
+    return group["smarts"] if isinstance(group, Mapping) else group.smarts
+
+
+def _group_field(group, field: str, default=None):
+    if isinstance(group, Mapping):
+        return group.get(field, default)
+    return getattr(group, field, default)
+
+
+class FunctionalGroupHierarchy:
+    """The subsumption DAG of a list of groups, from the names in their ``parents``.
+
+    Parents that are not in the list are ignored. ``order`` lists the group indices
+    with every parent before its children.
+    """
+
+    def __init__(self, groups: Iterable):
+        groups = list(groups)
+        positions = {_group_field(group, "name"): i for i, group in enumerate(groups)}
+        self.parents: list[tuple[int, ...]] = [
+            tuple(
+                positions[name]
+                for name in _group_field(group, "parents", ()) or ()
+                if name in positions
+            )
+            for group in groups
+        ]
+        self.children: list[tuple[int, ...]] = [() for _ in groups]
+        for child, parents in enumerate(self.parents):
+            for parent in parents:
+                self.children[parent] += (child,)
+        self.order = self._topological_order(groups)
+
+    def _topological_order(self, groups: list) -> list[int]:
+        order = []
+        state = [0] * len(self.parents)  # 0: unvisited, 1: visiting, 2: done
+
+        def visit(i):
+            if state[i] == 1:
+                raise ValueError(f"Cycle in functional group parents at {groups[i]!r}")
+            if state[i] == 0:
+                state[i] = 1
+                for parent in self.parents[i]:
+                    visit(parent)
+                state[i] = 2
+                order.append(i)
+
+        for i in range(len(self.parents)):
+            visit(i)
+        return order
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def _closure(self, i: int, edges: list[tuple[int, ...]]) -> list[int]:
+        seen = {}
+        stack = list(edges[i])
+        while stack:
+            j = stack.pop()
+            if j not in seen:
+                seen[j] = None
+                stack.extend(edges[j])
+        return sorted(seen)
+
+    def ancestors(self, i: int) -> list[int]:
+        return self._closure(i, self.parents)
+
+    def descendants(self, i: int) -> list[int]:
+        return self._closure(i, self.children)
+
+
+class FunctionalGroupMatch(NamedTuple):
+    index: int
+    group: Any
+    atoms: tuple[tuple[int, ...], ...]
+
+
+class FunctionalGroupMatcher:
+    """Matches a fixed list of functional groups against parsed molecules.
+
+    ``groups`` are anything with a SMARTS, either as a ``smarts`` attribute (e.g.
+    :class:`FunctionalGroup`) or a ``"smarts"`` key, and optionally ``parents``.
+    Groups with an invalid SMARTS never match. ``matched`` and ``pruned`` count the
+    substructure tests run and skipped thanks to the hierarchy.
+    """
+
+    def __init__(self, groups: Iterable, hierarchy: FunctionalGroupHierarchy | None = None):
+        self.groups = list(groups)
+        self.hierarchy = hierarchy or FunctionalGroupHierarchy(self.groups)
+        self.patterns = [compile_smarts(group_smarts(group)) for group in self.groups]
+        self._valid = [i for i in self.hierarchy.order if self.patterns[i] is not None]
+        self._rank = {i: rank for rank, i in enumerate(self.hierarchy.order)}
+        self.matched = 0
+        self.pruned = 0
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def _candidates(self, indices: Iterable[int] | None) -> list[int]:
+        if indices is None:
+            return self._valid
+        rank = self._rank
+        return sorted((i for i in indices if self.patterns[i] is not None), key=rank.__getitem__)
+
+    def _test(self, mol: Chem.Mol, indices: Iterable[int] | None, test) -> dict[int, Any]:
+        """Run ``test(mol, pattern)`` for the candidates, parents first; truthy results by index.
+
+        A group is skipped when one of its parents was tested and did not match.
+        Parents outside ``indices`` are not tested, so they never prune.
+        """
+        parents = self.hierarchy.parents
+        absent = set()
+        results = {}
+        for i in self._candidates(indices):
+            if any(parent in absent for parent in parents[i]):
+                absent.add(i)
+                self.pruned += 1
+                continue
+            self.matched += 1
+            result = test(mol, self.patterns[i])
+            if result:
+                results[i] = result
+            else:
+                absent.add(i)
+        return results
+
+    def matching(self, mol: Chem.Mol, indices: Iterable[int] | None = None) -> list[int]:
+        """Indices of the groups present in ``mol`` (optionally only among ``indices``)."""
+        return sorted(self._test(mol, indices, Chem.Mol.HasSubstructMatch))
+
+    def match(
+        self,
+        mol: Chem.Mol,
+        indices: Iterable[int] | None = None,
+        max_matches: int = MAX_MATCHES,
+    ) -> list[FunctionalGroupMatch]:
+        """Every group present in ``mol`` with all of its (unique) atom mappings."""
+        found = self._test(
+            mol,
+            indices,
+            lambda mol, pattern: mol.GetSubstructMatches(pattern, maxMatches=max_matches),
+        )
+        return [FunctionalGroupMatch(i, self.groups[i], found[i]) for i in sorted(found)]
+
+
+# Molecules per task sent to a worker process
+CHUNK_SIZE = 2048
+
+_worker_matcher: FunctionalGroupMatcher | None = None
+
+
+class Annotations(NamedTuple):
+    """Functional groups present per molecule.
+
+    ``bits`` is a packed bit matrix (``np.packbits`` along axis 1) with one row per
+    molecule and one bit per group; ``parsed`` is ``False`` for molecules whose
+    SMILES could not be parsed (their row is all zeros). ``matched`` and ``pruned``
+    count the substructure tests run and skipped by the hierarchy.
+    """
+
+    bits: np.ndarray
+    parsed: np.ndarray
+    matched: int = 0
+    pruned: int = 0
+
+    def groups(self, row: int) -> np.ndarray:
+        """Indices of the groups present in molecule ``row``."""
+        return np.flatnonzero(np.unpackbits(self.bits[row]))
+
+
+def _group_specs(groups: Sequence) -> list[dict]:
+    """Picklable stand-ins for ``groups``, named by position."""
+    hierarchy = FunctionalGroupHierarchy(groups)
+    return [
+        {"name": i, "smarts": group_smarts(group), "parents": parents}
+        for i, (group, parents) in enumerate(zip(groups, hierarchy.parents))
+    ]
+
+
+def _init_worker(specs: Sequence[dict]) -> None:
+    global _worker_matcher
+    _worker_matcher = FunctionalGroupMatcher(specs)
+
+
+def _annotate_chunk(
+    task: tuple[int, Sequence[str]], matcher: FunctionalGroupMatcher | None = None
+) -> tuple[int, np.ndarray, np.ndarray, int, int]:
+    """Match one chunk.
+
+    Returns its first row id, packed group bits, parsed flags and the number of
+    tests matched and pruned.
+    """
+    start, smiles = task
+    matcher = matcher or _worker_matcher
+    matched, pruned = matcher.matched, matcher.pruned
+    present = np.zeros((len(smiles), len(matcher)), dtype=bool)
+    parsed = np.zeros(len(smiles), dtype=bool)
+    for row, value in enumerate(smiles):
+        mol = Chem.MolFromSmiles(value)
+        if mol is None:
+            continue
+        parsed[row] = True
+        present[row, matcher.matching(mol)] = True
+    return (
+        start,
+        np.packbits(present, axis=1),
+        parsed,
+        matcher.matched - matched,
+        matcher.pruned - pruned,
+    )
+
+
+def annotate(
+    smiles: Sequence[str],
+    groups: Iterable,
+    processes: int | None = 1,
+    chunk_size: int = CHUNK_SIZE,
+) -> Annotations:
+    """Match every group against every molecule, optionally in worker processes.
+
+    ``processes=None`` uses every core. Molecules are split into chunks of
+    ``chunk_size``; workers return only a packed bit row per molecule and each
+    chunk is written back at its row offset, so the result does not depend on the
+    number of workers or the order chunks finish in.
+    """
+    specs = _group_specs(list(groups))
+    n_bytes = -(-len(specs) // 8)
+    bits = np.zeros((len(smiles), n_bytes), dtype=np.uint8)
+    parsed = np.zeros(len(smiles), dtype=bool)
+    tasks = [
+        (start, list(smiles[start : start + chunk_size]))
+        for start in range(0, len(smiles), chunk_size)
+    ]
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(tasks) <= 1:
+        matcher = FunctionalGroupMatcher(specs)
+        results = (_annotate_chunk(task, matcher) for task in tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=min(processes, len(tasks)),
+            initializer=_init_worker,
+            initargs=(specs,),
+        )
+        results = executor.map(_annotate_chunk, tasks)
+    matched = pruned = 0
+    try:
+        for start, chunk_bits, chunk_parsed, chunk_matched, chunk_pruned in results:
+            bits[start : start + len(chunk_parsed)] = chunk_bits
+            parsed[start : start + len(chunk_parsed)] = chunk_parsed
+            matched += chunk_matched
+            pruned += chunk_pruned
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    logger.debug("Annotated %d molecules: %d matches, %d pruned", len(smiles), matched, pruned)
+    return Annotations(bits, parsed, matched, pruned)
@@ -0,0 +1,213 @@
+"""Shared cache of parsed RDKit molecules keyed by a hash of their SMILES.
+
+Two layers:
+
+- an in-process LRU of ``Chem.Mol`` objects, and
+- an on-disk SQLite table of ``Mol.ToBinary()`` blobs shared between processes and
+  runs, which is cleared whenever the molecule database (or RDKit) changes.
+
+Use :func:`get_mol` for the process-wide default cache.
+"""
+import atexit
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import rdkit
+from pydantic import BaseModel
+from rdkit import Chem
+
+from chemcards.database.files import database_stamp
+from chemcards.database.resources import MOL_CACHE, MOLECULE_DATABASE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAXSIZE = 4096
+# Pending disk writes are committed in batches of this size
+WRITE_BATCH = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS molecules (key BLOB PRIMARY KEY, mol BLOB NOT NULL);
+"""
+
+
+def smiles_key(smiles: str) -> bytes:
+    return hashlib.blake2b(smiles.encode("utf-8"), digest_size=16).digest()
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / total if total else 0.0
+
+
+class MolCache:
+    def __init__(
+        self,
+        path: Path | None = MOL_CACHE,
+        maxsize: int = DEFAULT_MAXSIZE,
+        stamp: str | None = None,
+    ):
+        self.path = Path(path) if path is not None else None
+        self.maxsize = maxsize
+        self.stamp = f"{rdkit.__version__}|{stamp}"
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lru: OrderedDict[bytes, Chem.Mol | None] = OrderedDict()
+        self._lock = threading.RLock()
+        self._connection: sqlite3.Connection | None = None
+        self._disk_failed = False
+        self._pending: list[tuple[bytes, bytes]] = []
+
+    def get(self, smiles: str, copy: bool = True) -> Chem.Mol | None:
+        """The parsed molecule for ``smiles``, or ``None`` if it cannot be parsed.
+
+        With ``copy=False`` the shared cached instance is returned; callers must not
+        modify it.
+        """
+        key = smiles_key(smiles)
+        with self._lock:
+            if key in self._lru:
+                self.hits += 1
+                self._lru.move_to_end(key)
+                mol = self._lru[key]
+            else:
+                mol = self._read(key)
+                if mol is not None:
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+                    mol = Chem.MolFromSmiles(smiles)
+                    if mol is not None:
+                        self._write(key, mol)
+                self._lru[key] = mol
+                if len(self._lru) > self.maxsize:
+                    self._lru.popitem(last=False)
+        if mol is None or not copy:
+            return mol
+        return Chem.Mol(mol)
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self.hits, disk_hits=self.disk_hits, misses=self.misses, size=len(self._lru)
+        )
+
+    def reset_stats(self) -> None:
+        self.hits = self.disk_hits = self.misses = 0
+
+    def invalidate(self, stamp: str | None = None) -> None:
+        """Drop every cached molecule (both layers), optionally moving to a new ``stamp``."""
+        with self._lock:
+            self._lru.clear()
+            self._pending.clear()
+            if stamp is not None:
+                self.stamp = f"{rdkit.__version__}|{stamp}"
+            connection = self._connect()
+            if connection is not None:
+                self._clear_disk(connection)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            connection = self._connect()
+            if connection is None:
+                self._pending.clear()
+                return
+            try:
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO molecules (key, mol) VALUES (?, ?)", self._pending
+                    )
+            except sqlite3.Error as e:
+                logger.debug("Could not write molecule cache: %s", e)
+            self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self.path is None or self._disk_failed:
+            return None
+        if self._connection is None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                connection = sqlite3.connect(self.path, check_same_thread=False)
+                connection.execute("PRAGMA journal_mode = WAL")
+                connection.execute("PRAGMA synchronous = OFF")
+                with connection:
+                    connection.executescript(SCHEMA)
+                row = connection.execute(
+                    "SELECT value FROM metadata WHERE key = 'stamp'"
+                ).fetchone()
+                if row is None or row[0] != self.stamp:
+                    self._clear_disk(connection)
+            except (OSError, sqlite3.Error) as e:
+                logger.debug("Molecule cache disabled, cannot open %s: %s", self.path, e)
+                self._disk_failed = True
+                return None
+            self._connection = connection
+        return self._connection
+
+    def _clear_disk(self, connection: sqlite3.Connection) -> None:
+        with connection:
+            connection.execute("DELETE FROM molecules")
+            connection.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES ('stamp', ?)", (self.stamp,)
+            )
+
+    def _read(self, key: bytes) -> Chem.Mol | None:
+        connection = self._connect()
+        if connection is None:
+            return None
+        try:
+            row = connection.execute("SELECT mol FROM molecules WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.debug("Could not read molecule cache: %s", e)
+            return None
+        return Chem.Mol(row[0]) if row else None
+
+    def _write(self, key: bytes, mol: Chem.Mol) -> None:
+        if self.path is None or self._disk_failed:
+            return
+        self._pending.append((key, mol.ToBinary()))
+        if len(self._pending) >= WRITE_BATCH:
+            self.flush()
+
+
+_default_cache: MolCache | None = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> MolCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = MolCache(MOL_CACHE, stamp=database_stamp(MOLECULE_DATABASE))
+            atexit.register(_default_cache.close)
+        return _default_cache
+
+
+def get_mol(smiles: str, copy: bool = True) -> Chem.Mol | None:
+    return default_cache().get(smiles, copy=copy)
+
+
+def database_changed(path: Path) -> None:
+    """Invalidate the default cache after the default molecule database was rewritten."""
+    if _default_cache is not None and Path(path) == Path(MOLECULE_DATABASE):
+        _default_cache.invalidate(database_stamp(path))
@@ -8,5 +8,10 @@ CHEMBL_MECHANISM_DOWNLOAD = DATABASE / "chembl_mechanism_approved_drugs.json"
 CHEMBL_TARGET_DOWNLOAD = DATABASE / "chembl_target_approved_drugs.json"
 MOLECULE_DATABASE = DATABASE / "molecule_database.json"
 TEMP_DIR = DATABASE / "temp"
+CACHE_DIR = DATABASE / "cache"
+MOL_CACHE = CACHE_DIR / "molecules.sqlite"
+ANNOTATION_CACHE = CACHE_DIR / "annotations.sqlite"
+REVIEW_DATABASE = DATABASE / "reviews.sqlite"
+SYNONYM_DATABASE = DATABASE / "synonyms.sqlite"
 FUNCTIONAL_GROUPS_DATABASE = DATABASE / "functional_groups.yaml"
 FUNCTIONAL_GROUP_CATEGORIES_DATABASE = DATABASE / "functional_group_categories.yaml"
@@ -0,0 +1,123 @@
+"""Screen-then-verify substructure search with RDKit pattern fingerprints.
+
+Every molecule of a table gets a pattern fingerprint, stored as a packed
+``uint64[n_molecules, FP_SIZE // 64]`` array. A query can only match a molecule
+whose fingerprint contains all of the query's bits, so one vectorized AND over the
+array rules out most molecules before the (expensive) ``HasSubstructMatch`` is run
+on the rest. The screen never rejects a true match, so results are exact.
+
+Fingerprints take longer to compute than a single pass of matching, so they are
+computed once per database and kept as a ``.npy`` file in the cache directory,
+named after a hash of the database's SMILES.
+"""
+import functools
+import logging
+import threading
+import weakref
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+import rdkit
+from rdkit import Chem, DataStructs
+
+from chemcards.database.files import cached_array
+from chemcards.database.matching import compile_smarts
+from chemcards.database.molcache import get_mol
+from chemcards.database.resources import CACHE_DIR
+from chemcards.database.table import MoleculeTable
+
+logger = logging.getLogger(__name__)
+
+FP_SIZE = 2048
+WORDS = FP_SIZE // 64
+PREFIX = "pattern_fp_"
+
+
+def pattern_fingerprint(mol: Chem.Mol) -> np.ndarray:
+    """The pattern fingerprint of a molecule or query as ``uint64[WORDS]``."""
+    bits = np.zeros(FP_SIZE, dtype=np.uint8)
+    DataStructs.ConvertToNumpyArray(Chem.PatternFingerprint(mol, fpSize=FP_SIZE), bits)
+    return np.packbits(bits, bitorder="little").view(np.uint64)
+
+
+@functools.lru_cache(maxsize=None)
+def query_fingerprint(smarts: str) -> np.ndarray | None:
+    pattern = compile_smarts(smarts)
+    return pattern_fingerprint(pattern) if pattern is not None else None
+
+
+def fingerprints(smiles: Sequence[str]) -> np.ndarray:
+    """Pattern fingerprints of ``smiles``; molecules that cannot be parsed get no bits."""
+    array = np.zeros((len(smiles), WORDS), dtype=np.uint64)
+    for row, value in enumerate(smiles):
+        mol = get_mol(value, copy=False)
+        if mol is not None:
+            array[row] = pattern_fingerprint(mol)
+    return array
+
+
+class FingerprintScreen:
+    """Pattern fingerprints of the molecules of one table."""
+
+    _cache: "weakref.WeakKeyDictionary[MoleculeTable, FingerprintScreen]" = (
+        weakref.WeakKeyDictionary()
+    )
+    _cache_lock = threading.Lock()
+
+    def __init__(self, smiles: Sequence[str], fingerprints: np.ndarray):
+        self.smiles = smiles
+        self.fingerprints = fingerprints
+        self.screened = 0  # molecules ruled out by the screen
+        self.verified = 0  # molecules that needed a full substructure match
+
+    @classmethod
+    def from_smiles(cls, smiles: Sequence[str]) -> "FingerprintScreen":
+        return cls(smiles, fingerprints(smiles))
+
+    @classmethod
+    def of(cls, table: MoleculeTable, cache_dir: Path | None = CACHE_DIR) -> "FingerprintScreen":
+        """The screen of ``table``, built once per table and persisted in ``cache_dir``."""
+        with cls._cache_lock:
+            screen = cls._cache.get(table)
+            if screen is None:
+                smiles = table.column("smiles")
+                array = cached_array(
+                    cache_dir,
+                    PREFIX,
+                    [rdkit.__version__, str(FP_SIZE), *smiles],
+                    lambda: fingerprints(smiles),
+                    (len(smiles), WORDS),
+                    np.uint64,
+                )
+                screen = cls._cache[table] = cls(smiles, array)
+            return screen
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def candidates(self, query: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """Rows (optionally among ``rows``) whose fingerprint contains every bit of ``query``."""
+        fps = self.fingerprints if rows is None else self.fingerprints[rows]
+        passed = ((fps & query) == query).all(axis=1)
+        candidates = np.flatnonzero(passed) if rows is None else np.asarray(rows)[passed]
+        self.screened += len(fps) - len(candidates)
+        return candidates
+
+    def search(
+        self, smarts: str, rows: np.ndarray | None = None, limit: int | None = None
+    ) -> np.ndarray:
+        """Rows whose molecule contains ``smarts``, in order, up to ``limit`` of them."""
+        pattern = compile_smarts(smarts)
+        if pattern is None:
+            return np.zeros(0, dtype=np.intp)
+        hits = []
+        for row in self.candidates(query_fingerprint(smarts), rows).tolist():
+            self.verified += 1
+            mol = get_mol(self.smiles[row], copy=False)
+            if mol is not None and mol.HasSubstructMatch(pattern):
+                hits.append(row)
+                if limit is not None and len(hits) >= limit:
+                    break
+        return np.asarray(hits, dtype=np.intp)
+
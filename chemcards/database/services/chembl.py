@@ -1,62 +1,48 @@
-import json
 import logging
+from collections.abc import Iterable, Iterator
+from pathlib import Path
 from chemcards.database.resources import (
     CHEMBL_DOWNLOAD,
     CHEMBL_MECHANISM_DOWNLOAD,
     CHEMBL_TARGET_DOWNLOAD,
 )
 from chemcards.database.core import MoleculeEntry, MoleculeDB
+from chemcards.database.services.streaming import iter_json_array, write_json_array
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
 
-def download_drug_molecules():
-    from chembl_webresource_client.new_client import new_client
-    from tqdm import tqdm
+# ChEMBL's max_phase for approved drugs; pass ``max_phase=None`` to download every phase
+APPROVED = 4
 
-    # Get all approved drugs
-    approved_drugs = new_client.molecule.filter(
-        max_phase=4,
-        molecule_type="Small molecule",
-    )
-    approved_drugs = [drug for drug in tqdm(approved_drugs)]
 
-    # Save Locally
-    with open(CHEMBL_DOWNLOAD, "w") as f:
-        json.dump(approved_drugs, f)
+def _download(resource, path: Path, max_phase: int | None) -> int:
+    from tqdm import tqdm
 
+    query = {"molecule_type": "Small molecule"}
+    if max_phase is not None:
+        query["max_phase"] = max_phase
+    # Written entry by entry as pages arrive, rather than collected into a list first
+    return write_json_array(path, tqdm(resource.filter(**query)))
 
-def download_drug_mechanisms():
-    from chembl_webresource_client.new_client import new_client
-    from tqdm import tqdm
 
-    # Get all approved drugs
-    approved_drugs = new_client.mechanism.filter(
-        max_phase=4,
-        molecule_type="Small molecule",
-    )
-    approved_drugs = [drug for drug in tqdm(approved_drugs)]
+def download_drug_molecules(max_phase: int | None = APPROVED) -> int:
+    from chembl_webresource_client.new_client import new_client
 
-    # Save Locally
-    with open(CHEMBL_MECHANISM_DOWNLOAD, "w") as f:
-        json.dump(approved_drugs, f)
+    return _download(new_client.molecule, CHEMBL_DOWNLOAD, max_phase)
 
 
-def download_drug_targets():
+def download_drug_mechanisms(max_phase: int | None = APPROVED) -> int:
     from chembl_webresource_client.new_client import new_client
-    from tqdm import tqdm
 
-    # Get all approved drugs
-    approved_drugs = new_client.target.filter(
-        max_phase=4,
-        molecule_type="Small molecule",
-    )
-    approved_drugs = [drug for drug in tqdm(approved_drugs)]
+    return _download(new_client.mechanism, CHEMBL_MECHANISM_DOWNLOAD, max_phase)
+
+
+def download_drug_targets(max_phase: int | None = APPROVED) -> int:
+    from chembl_webresource_client.new_client import new_client
 
-    # Save Locally
-    with open(CHEMBL_TARGET_DOWNLOAD, "w") as f:
-        json.dump(approved_drugs, f)
+    return _download(new_client.target, CHEMBL_TARGET_DOWNLOAD, max_phase)
 
 
 class ChemblMoleculeEntry(MoleculeEntry):
@@ -161,97 +147,114 @@ class ChemblMechanismEntry(BaseModel):
         #     return
 
 
-class ChemblDB(MoleculeDB):
-
-    @classmethod
-    def from_download(cls) -> "ChemblDB":
-        with open(CHEMBL_DOWNLOAD, "r") as f:
-            molecule_list = json.load(f)
+def iter_download_molecules(path: Path = CHEMBL_DOWNLOAD) -> Iterator[ChemblMoleculeEntry]:
+    """Stream converted molecules from a ChEMBL molecule download, skipping unusable ones."""
+    converted = skipped = 0
+    for entry in iter_json_array(path):
+        molecule = ChemblMoleculeEntry.from_download(entry)
+        if molecule is None:
+            skipped += 1
+            continue
+        converted += 1
+        yield molecule
+    logger.info("ChemBL molecules: converted=%d skipped=%d", converted, skipped)
+
+
+def iter_download_mechanisms(
+    path: Path = CHEMBL_MECHANISM_DOWNLOAD,
+) -> Iterator[ChemblMechanismEntry]:
+    loaded = skipped = 0
+    for entry in iter_json_array(path):
+        mechanism = ChemblMechanismEntry.from_download(entry)
+        if mechanism is None:
+            skipped += 1
+            continue
+        loaded += 1
+        yield mechanism
+    logger.info("ChemBL mechanisms: loaded=%d skipped=%d", loaded, skipped)
+
+
+def iter_mechanism_molecules(
+    mechanisms: Iterable[ChemblMechanismEntry],
+) -> Iterator[ChemblMoleculeEntry]:
+    """Look up the molecule and target of each mechanism in ChEMBL."""
+    converted = skipped_molecule_lookups = skipped_build_failures = 0
+    for loaded_mechanism in mechanisms:
+        try:
+            mol_dict = loaded_mechanism.query_chembl_for_molecule()
+        except Exception as e:
+            logger.debug("Failed to query ChemBL for molecule %s: %s", loaded_mechanism.molecule_chembl_id, e)
+            skipped_molecule_lookups += 1
+            continue
+
+        molecule = ChemblMoleculeEntry.from_download(mol_dict)
+        if molecule is None:
+            # Could not construct a molecule from the queried data
+            skipped_molecule_lookups += 1
+            continue
+        try:
+            converted_molecule = ChemblMoleculeEntry(
+                name=molecule.name,
+                smiles=molecule.smiles,
+                target=loaded_mechanism.query_chembl_for_target(),
+                indication=molecule.indication,
+                molecule_chembl_id=loaded_mechanism.molecule_chembl_id,
+                target_chembl_id=loaded_mechanism.target_chembl_id,
+                mechanism_of_action=loaded_mechanism.mechanism_of_action,
+                action_type=loaded_mechanism.action_type,
+                atc_classifications=molecule.atc_classifications,
+            )
+        except Exception as e:
+            logger.debug("Failed to build converted molecule from mechanism entry: %s", e)
+            skipped_build_failures += 1
+            continue
+        converted += 1
+        yield converted_molecule
+
+    logger.info(
+        "ChemBL mechanism conversion: converted=%d skipped_lookup=%d skipped_build=%d",
+        converted,
+        skipped_molecule_lookups,
+        skipped_build_failures,
+    )
 
-        raw_converted = [ChemblMoleculeEntry.from_download(entry) for entry in molecule_list]
-        skipped = sum(1 for x in raw_converted if x is None)
-        converted_molecules = [mol for mol in raw_converted if mol is not None]
 
-        logger.info("ChemBL molecules: converted=%d skipped=%d", len(converted_molecules), skipped)
+class ChemblDB(MoleculeDB):
+    """A database built from ChEMBL downloads.
 
-        return cls(molecules=converted_molecules)
+    Downloads are parsed incrementally and each converted molecule is appended
+    straight into the columnar table, so memory follows the size of the resulting
+    database rather than of the download.
+    """
 
-    def remove_duplicates(self):
-        mol_dict = {mol.name: mol for mol in self.molecules}
-        self.molecules = list(mol_dict.values())
+    @classmethod
+    def from_download(cls, path: Path = CHEMBL_DOWNLOAD) -> "ChemblDB":
+        return cls(molecules=iter_download_molecules(path))
 
     @classmethod
-    def from_mechanism(cls) -> "ChemblDB":
+    def from_mechanism(cls, path: Path = CHEMBL_MECHANISM_DOWNLOAD) -> "ChemblDB":
         from tqdm import tqdm
 
-        with open(CHEMBL_MECHANISM_DOWNLOAD, "r") as f:
-            mechanism_list = json.load(f)
-        raw_mechanisms = [ChemblMechanismEntry.from_download(entry) for entry in mechanism_list]
-        skipped_mechanisms = sum(1 for x in raw_mechanisms if x is None)
-        filtered_mechanism_list = [m for m in raw_mechanisms if m is not None]
-
-        logger.info("ChemBL mechanisms: loaded=%d skipped=%d", len(filtered_mechanism_list), skipped_mechanisms)
-
-        converted_molecules = []
-        skipped_molecule_lookups = 0
-        skipped_build_failures = 0
-        for loaded_mechanism in tqdm(filtered_mechanism_list):
-            try:
-                mol_dict = loaded_mechanism.query_chembl_for_molecule()
-            except Exception as e:
-                logger.debug("Failed to query ChemBL for molecule %s: %s", loaded_mechanism.molecule_chembl_id, e)
-                skipped_molecule_lookups += 1
-                continue
-
-            molecule = ChemblMoleculeEntry.from_download(mol_dict)
-            if molecule is None:
-                # Could not construct a molecule from the queried data
-                skipped_molecule_lookups += 1
-                continue
-            try:
-                converted_molecules.append(
-                    ChemblMoleculeEntry(
-                        name=molecule.name,
-                        smiles=molecule.smiles,
-                        target=loaded_mechanism.query_chembl_for_target(),
-                        indication=molecule.indication,
-                        molecule_chembl_id=loaded_mechanism.molecule_chembl_id,
-                        target_chembl_id=loaded_mechanism.target_chembl_id,
-                        mechanism_of_action=loaded_mechanism.mechanism_of_action,
-                        action_type=loaded_mechanism.action_type,
-                        atc_classifications=molecule.atc_classifications,
-                    )
-                )
-            except Exception as e:
-                logger.debug("Failed to build converted molecule from mechanism entry: %s", e)
-                skipped_build_failures += 1
-                continue
-
-        logger.info(
-            "ChemBL mechanism conversion: converted=%d skipped_lookup=%d skipped_build=%d",
-            len(converted_molecules),
-            skipped_molecule_lookups,
-            skipped_build_failures,
-        )
-        return cls(molecules=converted_molecules)
-
-
-def main():
+        return cls(molecules=iter_mechanism_molecules(tqdm(iter_download_mechanisms(path))))
+
+
+def main(max_phase: int | None = APPROVED):
     from datetime import datetime, timezone
 
     if not CHEMBL_DOWNLOAD.exists():
         print("Downloading Chembl Molecule Data")
-        download_drug_molecules()
+        download_drug_molecules(max_phase)
 
     if not CHEMBL_MECHANISM_DOWNLOAD.exists():
         print("Downloading Chembl Mechanism Data")
-        download_drug_mechanisms()
+        download_drug_mechanisms(max_phase)
 
     mydb = ChemblDB.from_download()
     mydb = ChemblDB.from_mechanism()
     mydb.remove_duplicates()
     mydb.last_updated = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     mydb.save()
+    MoleculeDB.compact()
 
 
 if __name__ == "__main__":
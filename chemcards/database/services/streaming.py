@@ -0,0 +1,104 @@
+"""Incremental reading and writing of large JSON arrays (e.g. ChEMBL downloads).
+
+:func:`iter_json_array` yields the elements of a top-level array one at a time
+while holding roughly one chunk of the file in memory, and
+:func:`write_json_array` writes an iterable out without materializing it.
+"""
+import json
+import re
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import TextIO
+
+from chemcards.database.files import atomic_write
+
+CHUNK_SIZE = 1 << 16
+
+_NON_WHITESPACE = re.compile(r"\S")
+# Characters a JSON number can continue with, e.g. "12." or "1e" before the next chunk
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+class _ChunkReader:
+    def __init__(self, f: TextIO, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+
+    def _fill(self, size: int) -> bool:
+        chunk = self.f.read(size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """The next non-whitespace character, without consuming it."""
+        while True:
+            match = _NON_WHITESPACE.search(self.buffer, self.position)
+            if match is not None:
+                self.position = match.start()
+                return self.buffer[self.position]
+            self.position = len(self.buffer)
+            if not self._fill(self.chunk_size):
+                raise ValueError(f"Unexpected end of JSON array in {self.f.name}")
+
+    def next(self) -> str:
+        char = self.peek()
+        self.position += 1
+        return char
+
+    def decode(self, raw_decode) -> object:
+        self.peek()
+        while True:
+            try:
+                value, end = raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # The value continues past the buffer; read at least as much again
+                if not self._fill(max(self.chunk_size, len(self.buffer))):
+                    raise
+                continue
+            tail = _NUMBER_TAIL.match(self.buffer, end).end()
+            if tail == len(self.buffer) and self._fill(self.chunk_size):
+                # A number that may continue in the next chunk, e.g. "12." + "5"
+                continue
+            self.position = end
+            return value
+
+
+def iter_json_array(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """Yield the elements of the JSON array stored in ``path`` one at a time."""
+    raw_decode = json.JSONDecoder().raw_decode
+    with open(path, "r", encoding="utf-8") as f:
+        reader = _ChunkReader(f, chunk_size)
+        if reader.next() != "[":
+            raise ValueError(f"{path} does not contain a JSON array")
+        if reader.peek() == "]":
+            return
+        while True:
+            yield reader.decode(raw_decode)
+            delimiter = reader.next()
+            if delimiter == "]":
+                return
+            if delimiter != ",":
+                raise ValueError(f"Expected ',' or ']' in {path}, got {delimiter!r}")
+
+
+def write_json_array(path: Path, items: Iterable) -> int:
+    """Write ``items`` as a JSON array, one element at a time; returns the count.
+
+    The file is replaced atomically, so an interrupted download never leaves a
+    truncated array behind.
+    """
+    count = 0
+    with atomic_write(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for item in items:
+            if count:
+                f.write(",\n")
+            json.dump(item, f)
+            count += 1
+        f.write("]")
+    return count
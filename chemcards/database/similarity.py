@@ -0,0 +1,231 @@
+"""Nearest-neighbour lookup by Tanimoto similarity of Morgan fingerprints.
+
+Every molecule of a table gets a Morgan fingerprint (radius 2, 2048 bits) stored as
+a packed ``uint64[n_molecules, FP_SIZE // 64]`` array, persisted in the cache
+directory like the pattern fingerprints of :mod:`chemcards.database.screening`.
+Tanimoto similarities are computed with a vectorized AND and popcount over the
+whole array, in blocks of rows so temporaries stay small even for a million
+molecules, and only the top ``k`` of each query are kept.
+
+Batches of queries (e.g. all-vs-all) are split into blocks that run on a thread
+pool: NumPy releases the GIL in the bitwise and reduction loops that dominate the
+kernel, so threads use every core while sharing one copy of the fingerprints.
+"""
+import os
+import threading
+import weakref
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import rdkit
+from rdkit import Chem
+from rdkit.Chem import rdFingerprintGenerator
+
+from chemcards.database.files import cached_array
+from chemcards.database.molcache import get_mol
+from chemcards.database.resources import CACHE_DIR
+from chemcards.database.table import MoleculeTable
+
+RADIUS = 2
+FP_SIZE = 2048
+WORDS = FP_SIZE // 64
+PREFIX = "morgan_fp_"
+# Fingerprint pairs compared at once; bounds the size of the temporaries
+BLOCK_PAIRS = 1 << 15
+# Queries per task of a batch
+QUERY_BLOCK = 64
+
+_local = threading.local()
+
+
+def _generator():
+    generator = getattr(_local, "generator", None)
+    if generator is None:
+        generator = _local.generator = rdFingerprintGenerator.GetMorganGenerator(
+            radius=RADIUS, fpSize=FP_SIZE
+        )
+    return generator
+
+
+def morgan_fingerprint(mol: Chem.Mol) -> np.ndarray:
+    """The Morgan fingerprint of ``mol`` as ``uint64[WORDS]``."""
+    bits = _generator().GetFingerprintAsNumPy(mol)
+    return np.packbits(bits, bitorder="little").view(np.uint64)
+
+
+def fingerprints(smiles: Sequence[str]) -> np.ndarray:
+    """Morgan fingerprints of ``smiles``; molecules that cannot be parsed get no bits."""
+    array = np.zeros((len(smiles), WORDS), dtype=np.uint64)
+    for row, value in enumerate(smiles):
+        mol = get_mol(value, copy=False)
+        if mol is not None:
+            array[row] = morgan_fingerprint(mol)
+    return array
+
+
+# Bits set in every byte value, for NumPy < 2.0 which has no bitwise_count
+_BYTE_COUNTS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def _popcount(fingerprints: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(fingerprints).sum(axis=-1, dtype=np.int32)
+    fingerprints = np.ascontiguousarray(fingerprints)
+    as_bytes = fingerprints.view(np.uint8).reshape(*fingerprints.shape[:-1], -1)
+    return _BYTE_COUNTS[as_bytes].sum(axis=-1, dtype=np.int32)
+
+
+class Neighbours(NamedTuple):
+    """Rows of the nearest neighbours and their similarities, most similar first."""
+
+    rows: np.ndarray
+    scores: np.ndarray
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """The ``k`` best ``scores`` of every query (row of ``scores``) with their ``rows``."""
+    if scores.shape[1] > k:
+        kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1 : k]
+        # Of the scores tied with the k-th best, keep the first columns (lowest rows)
+        above = scores > kth
+        tied = scores == kth
+        needed = k - above.sum(axis=1, keepdims=True)
+        keep = above | (tied & (np.cumsum(tied, axis=1) <= needed))
+        best = np.nonzero(keep)[1].reshape(len(scores), k)
+        scores = np.take_along_axis(scores, best, axis=1)
+        rows = np.take_along_axis(rows, best, axis=1)
+    # Most similar first, ties by row
+    order = np.lexsort((rows, -scores), axis=1)
+    return np.take_along_axis(rows, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+class SimilarityIndex:
+    """Morgan fingerprints of the molecules of one table, searchable by Tanimoto similarity."""
+
+    _cache: "weakref.WeakKeyDictionary[MoleculeTable, SimilarityIndex]" = (
+        weakref.WeakKeyDictionary()
+    )
+    _cache_lock = threading.Lock()
+
+    def __init__(self, fingerprints: np.ndarray):
+        self.fingerprints = fingerprints
+        self.counts = _popcount(fingerprints)
+
+    @classmethod
+    def from_smiles(cls, smiles: Sequence[str]) -> "SimilarityIndex":
+        return cls(fingerprints(smiles))
+
+    @classmethod
+    def of(cls, table: MoleculeTable, cache_dir: Path | None = CACHE_DIR) -> "SimilarityIndex":
+        """The index of ``table``, built once per table and persisted in ``cache_dir``."""
+        with cls._cache_lock:
+            index = cls._cache.get(table)
+            if index is None:
+                smiles = table.column("smiles")
+                array = cached_array(
+                    cache_dir,
+                    PREFIX,
+                    [rdkit.__version__, f"{RADIUS}/{FP_SIZE}", *smiles],
+                    lambda: fingerprints(smiles),
+                    (len(smiles), WORDS),
+                    np.uint64,
+                )
+                index = cls._cache[table] = cls(array)
+            return index
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def tanimoto(self, query: np.ndarray) -> np.ndarray:
+        """Similarity of one fingerprint (``uint64[WORDS]``) to every molecule."""
+        return self._similarities(query[None], _popcount(query)[None], 0, len(self))[0]
+
+    def _similarities(self, queries, query_counts, start, stop) -> np.ndarray:
+        fps = self.fingerprints[start:stop]
+        common = _popcount(queries[:, None, :] & fps[None, :, :])
+        union = query_counts[:, None] + self.counts[start:stop][None, :] - common
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = np.where(union > 0, common / union, 0.0)
+        return scores.astype(np.float32)
+
+    def search(self, query: np.ndarray | Chem.Mol | str, k: int = 10) -> Neighbours:
+        """The ``k`` molecules most similar to ``query`` (a fingerprint, molecule or SMILES)."""
+        if isinstance(query, str):
+            mol = get_mol(query, copy=False)
+            if mol is None:
+                raise ValueError(f"Invalid SMILES: {query}")
+            query = mol
+        if isinstance(query, Chem.Mol):
+            query = morgan_fingerprint(query)
+        neighbours = self.search_many(query[None], k)
+        return Neighbours(neighbours.rows[0], neighbours.scores[0])
+
+    def search_many(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        threads: int | None = 1,
+        exclude_offset: int | None = None,
+    ) -> Neighbours:
+        """The ``k`` nearest neighbours of every query fingerprint (a row of ``queries``).
+
+        With ``exclude_offset``, query ``i`` is molecule ``exclude_offset + i`` of this
+        index and is not its own neighbour. ``threads=None`` uses every core.
+        """
+        queries = np.asarray(queries, dtype=np.uint64).reshape(-1, WORDS)
+        k = max(0, min(k, len(self) - (exclude_offset is not None)))
+        rows = np.zeros((len(queries), k), dtype=np.intp)
+        scores = np.zeros((len(queries), k), dtype=np.float32)
+        if not k or not len(queries):
+            return Neighbours(rows, scores)
+
+        query_block = min(len(queries), QUERY_BLOCK)
+        row_block = BLOCK_PAIRS // query_block
+        blocks = range(0, len(queries), query_block)
+
+        def run(start):
+            stop = min(start + query_block, len(queries))
+            offset = None if exclude_offset is None else exclude_offset + start
+            return start, self._search_block(queries[start:stop], k, row_block, offset)
+
+        threads = threads or os.cpu_count() or 1
+        if threads == 1 or len(blocks) == 1:
+            results = map(run, blocks)
+            executor = None
+        else:
+            executor = ThreadPoolExecutor(max_workers=min(threads, len(blocks)))
+            results = executor.map(run, blocks)
+        try:
+            for start, (block_rows, block_scores) in results:
+                rows[start : start + len(block_rows)] = block_rows
+                scores[start : start + len(block_rows)] = block_scores
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return Neighbours(rows, scores)
+
+    def _search_block(self, queries, k, row_block, exclude_offset):
+        query_counts = _popcount(queries)
+        best_rows = np.zeros((len(queries), 0), dtype=np.intp)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self), row_block):
+            stop = min(start + row_block, len(self))
+            scores = self._similarities(queries, query_counts, start, stop)
+            if exclude_offset is not None:
+                own = np.arange(exclude_offset, exclude_offset + len(queries))
+                inside = (own >= start) & (own < stop)
+                scores[np.flatnonzero(inside), own[inside] - start] = -1.0
+            rows = np.broadcast_to(np.arange(start, stop), scores.shape)
+            best_rows, best_scores = _top_k(
+                np.concatenate([best_scores, scores], axis=1),
+                np.concatenate([best_rows, rows], axis=1),
+                k,
+            )
+        return best_rows, best_scores
+
+    def all_neighbours(self, k: int = 10, threads: int | None = None) -> Neighbours:
+        """The ``k`` nearest neighbours of every molecule, excluding itself."""
+        return self.search_many(self.fingerprints, k, threads, exclude_offset=0)
@@ -0,0 +1,177 @@
+"""SQLite storage backend for :class:`MoleculeDB`.
+
+The ``molecules`` table is indexed on the fields decks are built from (target,
+target ChEMBL id, action type, mechanism) and ATC codes live in a normalized
+``atc_classifications`` table indexed by code, so any ATC level can be selected
+with an index range scan. Filters that implement ``to_sql()`` are compiled into a
+single ``SELECT``; any that don't are applied to the (already reduced) result.
+
+Decks, the GUI and the CLI do not use this store: they filter the memory-mapped
+table of :mod:`chemcards.database.binary` through its inverted indexes, which is
+cheaper than a query here, and :meth:`SQLiteMoleculeStore.query` materializes its
+result as a :class:`MoleculeDB` too. The store is for ad hoc SQL over the database
+and for tools that only need a filtered subset.
+"""
+import json
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path
+
+from chemcards.database.core import MoleculeDB
+from chemcards.database.files import database_stamp
+from chemcards.database.resources import MOLECULE_DATABASE
+from chemcards.database.table import STRING_FIELDS
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS molecules (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    smiles TEXT NOT NULL,
+    target TEXT NOT NULL,
+    indication TEXT NOT NULL,
+    mechanism_of_action TEXT NOT NULL,
+    action_type TEXT NOT NULL,
+    molecule_chembl_id TEXT NOT NULL,
+    target_chembl_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS atc_classifications (
+    molecule_id INTEGER NOT NULL REFERENCES molecules(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    PRIMARY KEY (molecule_id, position)
+);
+CREATE INDEX IF NOT EXISTS molecules_target ON molecules(target);
+CREATE INDEX IF NOT EXISTS molecules_target_chembl_id ON molecules(target_chembl_id);
+CREATE INDEX IF NOT EXISTS molecules_action_type ON molecules(action_type);
+CREATE INDEX IF NOT EXISTS molecules_mechanism_of_action ON molecules(mechanism_of_action);
+CREATE INDEX IF NOT EXISTS atc_classifications_code ON atc_classifications(code, molecule_id);
+"""
+
+COLUMNS = ", ".join(STRING_FIELDS)
+SELECT = f"""
+SELECT {COLUMNS}, (
+    SELECT json_group_array(code) FROM (
+        SELECT code FROM atc_classifications a WHERE a.molecule_id = m.id ORDER BY position
+    )
+) FROM molecules m
+"""
+
+
+def sqlite_path(json_path: Path) -> Path:
+    return Path(json_path).with_suffix(".sqlite")
+
+
+class SQLiteMoleculeStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        # Python's case folding for filters, SQLite's lower() only folds ASCII
+        self.connection.create_function("py_lower", 1, str.lower, deterministic=True)
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    @classmethod
+    def from_moleculedb(cls, db: MoleculeDB, path: Path) -> "SQLiteMoleculeStore":
+        store = cls(path)
+        store.write(db)
+        return store
+
+    @classmethod
+    def open(cls, json_path: Path = MOLECULE_DATABASE) -> "SQLiteMoleculeStore":
+        """Open the SQLite copy of a JSON database, (re)building it if it is stale.
+
+        The copy is stamped with the snapshot and its change journal, so molecules
+        added by :meth:`MoleculeDB.save` are picked up too.
+        """
+        store = cls(sqlite_path(json_path))
+        stamp = f"{SCHEMA_VERSION}:{database_stamp(json_path)}"
+        if store.metadata("source") != stamp:
+            store.write(MoleculeDB.load(json_path))
+            store.set_metadata("source", stamp)
+        return store
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def metadata(self, key: str) -> str | None:
+        row = self.connection.execute(
+            "SELECT value FROM metadata WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_metadata(self, key: str, value: str | None) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def write(self, db: MoleculeDB) -> None:
+        """Replace the stored molecules with ``db`` in a single transaction."""
+        records = list(db.table.records())
+        placeholders = ", ".join("?" for _ in STRING_FIELDS)
+        with self.connection:
+            self.connection.execute("DELETE FROM atc_classifications")
+            self.connection.execute("DELETE FROM molecules")
+            self.connection.executemany(
+                f"INSERT INTO molecules (id, {COLUMNS}) VALUES (?, {placeholders})",
+                (
+                    (row, *(record[field] for field in STRING_FIELDS))
+                    for row, record in enumerate(records)
+                ),
+            )
+            self.connection.executemany(
+                "INSERT INTO atc_classifications (molecule_id, position, code) VALUES (?, ?, ?)",
+                (
+                    (row, position, code)
+                    for row, record in enumerate(records)
+                    for position, code in enumerate(record["atc_classifications"])
+                ),
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES ('last_updated', ?)",
+                (db.last_updated,),
+            )
+
+    def load(self) -> MoleculeDB:
+        return self.query()
+
+    def compile(self, filters: Iterable) -> tuple[str, tuple, list]:
+        """Split ``filters`` into one SQL statement and the filters left for Python."""
+        clauses, params, remaining = [], [], []
+        for filter in filters:
+            compiled = filter.to_sql()
+            if compiled is None:
+                remaining.append(filter)
+                continue
+            clause, clause_params = compiled
+            clauses.append(f"({clause})")
+            params.extend(clause_params)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return f"{SELECT}{where} ORDER BY id", tuple(params), remaining
+
+    def query(self, filters: Iterable = ()) -> MoleculeDB:
+        """A :class:`MoleculeDB` of the molecules passing every filter."""
+        sql, params, remaining = self.compile(filters)
+        molecules = [
+            {
+                **dict(zip(STRING_FIELDS, row[:-1])),
+                "atc_classifications": json.loads(row[-1]),
+            }
+            for row in self.connection.execute(sql, params)
+        ]
+        db = MoleculeDB(molecules=molecules, last_updated=self.metadata("last_updated"))
+        for filter in remaining:
+            db = filter(db)
+        return db
+
+    def explain(self, filters: Iterable = ()) -> list[str]:
+        """SQLite's query plan for ``filters``, useful to check indexes are used."""
+        sql, params, _ = self.compile(filters)
+        return [row[-1] for row in self.connection.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
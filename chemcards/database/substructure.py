@@ -0,0 +1,180 @@
+"""Substructure search of a molecule database by SMARTS or SMILES.
+
+:func:`search` screens the database with the pattern fingerprints of
+:mod:`chemcards.database.screening`, runs the substructure match on the remaining
+molecules and yields every hit as soon as it is found, with the matched atoms and
+bonds to highlight.
+
+Queries are SMARTS unless ``syntax="smiles"`` is given: the two languages overlap
+("c1ccccc1", "CO", "[#6]~[#8]" are both), but not with the same meaning, so the
+syntax is never guessed.
+
+``timeout`` bounds the whole search. A single match can run for a very long time
+and cannot be interrupted in-process, so a search with a timeout always matches in
+a ``multiprocessing`` pool (of ``processes`` workers, at least one) that is
+terminated at the deadline. Without a timeout, small or single-process searches
+run in-process on the cached, already parsed molecules.
+"""
+import logging
+import multiprocessing
+import os
+import time
+from collections.abc import Iterator, Sequence
+from typing import NamedTuple
+
+from rdkit import Chem
+
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.database.matching import MAX_MATCHES, match_bonds
+from chemcards.database.molcache import get_mol
+from chemcards.database.screening import FingerprintScreen, pattern_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Candidate molecules per task sent to a worker process
+CHUNK_SIZE = 256
+
+
+class SearchTimeout(TimeoutError):
+    """The search did not finish in time; hits found before the deadline were yielded."""
+
+
+class SearchHit(NamedTuple):
+    row: int
+    molecule: MoleculeEntry
+    # Atoms and bonds of every (unique) match, for highlighting
+    atoms: tuple[int, ...]
+    bonds: tuple[int, ...]
+
+
+SYNTAXES = ("smarts", "smiles")
+
+
+def query_mol(query: str, syntax: str = "smarts") -> Chem.Mol:
+    """The query molecule for a SMARTS (or, with ``syntax="smiles"``, SMILES) string."""
+    if syntax == "smarts":
+        mol = Chem.MolFromSmarts(query)
+    elif syntax == "smiles":
+        mol = Chem.MolFromSmiles(query)
+    else:
+        raise ValueError(f"Unknown query syntax {syntax!r}, expected one of {SYNTAXES}")
+    if mol is None:
+        raise ValueError(f"Not a valid {syntax.upper()}: {query!r}")
+    return mol
+
+
+def _match(mol: Chem.Mol | None, pattern: Chem.Mol, max_matches: int) -> tuple | None:
+    if mol is None:
+        return None
+    matches = mol.GetSubstructMatches(pattern, maxMatches=max_matches)
+    if not matches:
+        return None
+    atoms = sorted({atom for match in matches for atom in match})
+    bonds = sorted({bond for match in matches for bond in match_bonds(mol, pattern, match)})
+    return tuple(atoms), tuple(bonds)
+
+
+_worker_pattern: Chem.Mol | None = None
+
+
+def _init_worker(query: str, syntax: str) -> None:
+    global _worker_pattern
+    _worker_pattern = query_mol(query, syntax)
+
+
+def _match_chunk(task: tuple[Sequence[int], Sequence[str], int]) -> list[tuple]:
+    rows, smiles, max_matches = task
+    hits = []
+    for row, value in zip(rows, smiles):
+        # Workers parse for themselves rather than share the parent's molecule cache
+        match = _match(Chem.MolFromSmiles(value), _worker_pattern, max_matches)
+        if match is not None:
+            hits.append((row, *match))
+    return hits
+
+
+def _serial_matches(pattern, candidates, smiles, max_matches):
+    for row in candidates:
+        match = _match(get_mol(smiles[row], copy=False), pattern, max_matches)
+        if match is not None:
+            yield (row, *match)
+
+
+def _parallel_matches(query, syntax, candidates, smiles, max_matches, deadline, processes):
+    tasks = (
+        (rows, [smiles[row] for row in rows], max_matches)
+        for rows in (
+            candidates[start : start + CHUNK_SIZE]
+            for start in range(0, len(candidates), CHUNK_SIZE)
+        )
+    )
+    # No more workers than tasks
+    processes = max(1, min(processes, -(-len(candidates) // CHUNK_SIZE)))
+    # A pool rather than an executor: a running match can only be stopped by
+    # terminating its worker
+    pool = multiprocessing.get_context().Pool(
+        processes, initializer=_init_worker, initargs=(query, syntax)
+    )
+    try:
+        results = pool.imap(_match_chunk, tasks)
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                hits = results.next(timeout=remaining)
+            except StopIteration:
+                break
+            except multiprocessing.TimeoutError:
+                raise SearchTimeout(f"Search for {query!r} timed out") from None
+            yield from hits
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def search(
+    query: str,
+    db: MoleculeDB | None = None,
+    limit: int | None = None,
+    offset: int = 0,
+    timeout: float | None = None,
+    processes: int | None = 1,
+    max_matches: int = MAX_MATCHES,
+    syntax: str = "smarts",
+) -> Iterator[SearchHit]:
+    """Yield the molecules of ``db`` (the default database) containing ``query``.
+
+    Hits come in database order as they are found: the first ``offset`` are
+    skipped and at most ``limit`` are yielded. Raises :class:`SearchTimeout` once
+    ``timeout`` seconds have passed, and ``ValueError`` for an invalid query.
+    ``processes=None`` uses every core. ``query`` is SMARTS, or SMILES with
+    ``syntax="smiles"``.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pattern = query_mol(query, syntax)
+    db = db if db is not None else MoleculeDB.load()
+    screen = FingerprintScreen.of(db.table)
+    candidates = screen.candidates(pattern_fingerprint(pattern)).tolist()
+    logger.debug("%d of %d molecules pass the screen for %s", len(candidates), len(db), query)
+
+    processes = processes or os.cpu_count() or 1
+    # Only a worker process can be stopped in the middle of a match
+    if candidates and (deadline is not None or (processes > 1 and len(candidates) > CHUNK_SIZE)):
+        matches = _parallel_matches(
+            query, syntax, candidates, screen.smiles, max_matches, deadline, processes
+        )
+    else:
+        matches = _serial_matches(pattern, candidates, screen.smiles, max_matches)
+
+    if limit is not None and limit <= 0:
+        return
+    found = 0
+    try:
+        for row, atoms, bonds in matches:
+            found += 1
+            if found <= offset:
+                continue
+            yield SearchHit(row, db.molecules[row], atoms, bonds)
+            if limit is not None and found - offset >= limit:
+                return
+    finally:
+        matches.close()
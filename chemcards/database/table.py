@@ -0,0 +1,298 @@
+"""Columnar (struct-of-arrays) storage backing :class:`MoleculeDB`.
+
+Every string field is stored as an ``int32`` column of codes into a shared,
+interned :class:`StringPool`; ATC classifications are a ragged column
+(``atc_offsets`` / ``atc_codes``) and "unknown" values are tracked in a packed
+bit-array so filters never need to decode strings. Tables can also carry a
+``float32`` matrix of descriptors (see :mod:`chemcards.database.descriptors`),
+which is selected and concatenated along with the rows.
+"""
+import itertools
+import sys
+from collections.abc import Hashable, Iterable, Iterator, Mapping
+
+import numpy as np
+
+UNKNOWN = "unknown"
+
+STRING_FIELDS = (
+    "name",
+    "smiles",
+    "target",
+    "indication",
+    "mechanism_of_action",
+    "action_type",
+    "molecule_chembl_id",
+    "target_chembl_id",
+)
+REQUIRED_FIELDS = ("name", "smiles")
+
+CODE_DTYPE = np.int32
+OFFSET_DTYPE = np.int64
+
+
+class StringPool:
+    """Append-only table of interned strings addressed by integer code.
+
+    Code 0 is always ``"unknown"``.
+    """
+
+    def __init__(self, strings: Iterable[str] = ()):
+        self._strings: list[str] = []
+        self._codes: dict[str, int] = {}
+        self.intern(UNKNOWN)
+        for value in strings:
+            self.intern(value)
+
+    def intern(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._strings)
+            value = sys.intern(value)
+            self._codes[value] = code
+            self._strings.append(value)
+        return code
+
+    def intern_many(self, values: list[str]) -> list[int]:
+        codes = self._codes
+        for value in dict.fromkeys(values):
+            if value not in codes:
+                value = sys.intern(value)
+                codes[value] = len(self._strings)
+                self._strings.append(value)
+        return list(map(codes.__getitem__, values))
+
+    def code(self, value: str) -> int | None:
+        return self._codes.get(value)
+
+    def decode(self, codes: np.ndarray) -> list[str]:
+        strings = self._strings
+        return [strings[code] for code in codes.tolist()]
+
+    def __getitem__(self, code: int) -> str:
+        return self._strings[code]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._strings)
+
+
+class MoleculeTableBuilder:
+    """Accumulates records row by row and freezes them into a :class:`MoleculeTable`."""
+
+    def __init__(self, pool: StringPool | None = None):
+        self.pool = pool if pool is not None else StringPool()
+        self._columns: dict[str, list[int]] = {field: [] for field in STRING_FIELDS}
+        self._atc_offsets: list[int] = [0]
+        self._atc_codes: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._atc_offsets) - 1
+
+    def append(self, record) -> None:
+        """Append a ``MoleculeEntry`` (or any object with matching attributes) or a mapping."""
+        intern = self.pool.intern
+        if isinstance(record, Mapping):
+            for field in REQUIRED_FIELDS:
+                if field not in record:
+                    raise ValueError(f"Molecule record is missing required field {field!r}")
+            get = record.get
+            for field in STRING_FIELDS:
+                self._columns[field].append(intern(get(field, UNKNOWN)))
+            atc = get("atc_classifications") or ()
+        else:
+            for field in STRING_FIELDS:
+                self._columns[field].append(intern(getattr(record, field)))
+            atc = record.atc_classifications
+        self._atc_codes.extend(intern(code) for code in atc)
+        self._atc_offsets.append(len(self._atc_codes))
+
+    def extend(self, records: Iterable) -> None:
+        if not isinstance(records, list) or not all(type(r) is dict for r in records):
+            for record in records:
+                self.append(record)
+            return
+
+        # Column-at-a-time fast path for lists of plain records (e.g. parsed JSON)
+        for record in records:
+            for field in REQUIRED_FIELDS:
+                if field not in record:
+                    raise ValueError(f"Molecule record is missing required field {field!r}")
+        intern_many = self.pool.intern_many
+        for field in STRING_FIELDS:
+            self._columns[field].extend(
+                intern_many([record.get(field, UNKNOWN) for record in records])
+            )
+        atc = [record.get("atc_classifications") or () for record in records]
+        start = len(self._atc_codes)
+        self._atc_codes.extend(intern_many([code for codes in atc for code in codes]))
+        lengths = [len(codes) for codes in atc]
+        self._atc_offsets.extend(start + offset for offset in itertools.accumulate(lengths))
+
+    def build(self) -> "MoleculeTable":
+        return MoleculeTable(
+            pool=self.pool,
+            columns={
+                field: np.asarray(values, dtype=CODE_DTYPE)
+                for field, values in self._columns.items()
+            },
+            atc_offsets=np.asarray(self._atc_offsets, dtype=OFFSET_DTYPE),
+            atc_codes=np.asarray(self._atc_codes, dtype=CODE_DTYPE),
+        )
+
+
+class MoleculeTable:
+    """Immutable struct-of-arrays snapshot of a molecule database."""
+
+    def __init__(
+        self,
+        pool: StringPool,
+        columns: Mapping[str, np.ndarray],
+        atc_offsets: np.ndarray,
+        atc_codes: np.ndarray,
+        unknown: np.ndarray | None = None,
+        descriptors: np.ndarray | None = None,
+    ):
+        self.pool = pool
+        self.columns = dict(columns)
+        self.atc_offsets = atc_offsets
+        self.atc_codes = atc_codes
+        self._length = len(atc_offsets) - 1
+        if unknown is None:
+            unknown = np.packbits(
+                np.stack([self.columns[field] == 0 for field in STRING_FIELDS]), axis=1
+            )
+        # Packed bit-array, one row per field in STRING_FIELDS order
+        self.unknown = unknown
+        # float32[n_rows, n_descriptors], or None until computed
+        self.descriptors = descriptors
+
+    @classmethod
+    def from_records(
+        cls, records: Iterable, pool: StringPool | None = None
+    ) -> "MoleculeTable":
+        builder = MoleculeTableBuilder(pool)
+        builder.extend(records)
+        return builder.build()
+
+    @classmethod
+    def empty(cls) -> "MoleculeTable":
+        return cls.from_records(())
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [*self.columns.values(), self.atc_offsets, self.atc_codes, self.unknown]
+        if self.descriptors is not None:
+            arrays.append(self.descriptors)
+        return sum(array.nbytes for array in arrays)
+
+    def codes(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def column(self, field: str) -> list[str]:
+        return self.pool.decode(self.columns[field])
+
+    def unknown_mask(self, field: str) -> np.ndarray:
+        """Boolean mask of rows whose ``field`` is ``"unknown"``."""
+        bits = self.unknown[STRING_FIELDS.index(field)]
+        return np.unpackbits(bits, count=self._length).astype(bool)
+
+    def atc(self, row: int) -> list[str]:
+        start, stop = self.atc_offsets[row], self.atc_offsets[row + 1]
+        return self.pool.decode(self.atc_codes[start:stop])
+
+    def record(self, row: int) -> dict:
+        if row < 0:
+            row += self._length
+        if not 0 <= row < self._length:
+            raise IndexError("molecule index out of range")
+        pool = self.pool
+        record = {field: pool[int(self.columns[field][row])] for field in STRING_FIELDS}
+        record["atc_classifications"] = self.atc(row)
+        return record
+
+    def records(self) -> Iterator[dict]:
+        decoded = [self.column(field) for field in STRING_FIELDS]
+        offsets = self.atc_offsets.tolist()
+        atc = self.pool.decode(self.atc_codes)
+        for row, values in enumerate(zip(*decoded)):
+            record = dict(zip(STRING_FIELDS, values))
+            record["atc_classifications"] = atc[offsets[row] : offsets[row + 1]]
+            yield record
+
+    def take(self, rows) -> "MoleculeTable":
+        """Select rows by integer index array or boolean mask, sharing the string pool."""
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        rows = rows.astype(np.intp, copy=False)
+
+        starts = self.atc_offsets[rows]
+        lengths = self.atc_offsets[rows + 1] - starts
+        offsets = np.zeros(len(rows) + 1, dtype=OFFSET_DTYPE)
+        np.cumsum(lengths, out=offsets[1:])
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return MoleculeTable(
+            pool=self.pool,
+            columns={field: codes[rows] for field, codes in self.columns.items()},
+            atc_offsets=offsets,
+            atc_codes=self.atc_codes[gather],
+            descriptors=None if self.descriptors is None else self.descriptors[rows],
+        )
+
+    def concat(self, other: "MoleculeTable") -> "MoleculeTable":
+        """Rows of ``self`` followed by rows of ``other``, re-coding ``other`` into this pool."""
+        if other.pool is self.pool:
+            remap = None
+        else:
+            remap = np.fromiter(
+                (self.pool.intern(value) for value in other.pool),
+                dtype=CODE_DTYPE,
+                count=len(other.pool),
+            )
+
+        def recode(codes):
+            return codes if remap is None else remap[codes]
+
+        descriptors = None
+        if self.descriptors is not None or other.descriptors is not None:
+            # Keep the columns of the side that has them: only the other side's molecules
+            # go through RDKit. Not cached, that would evict the whole table's columns
+            from chemcards.database import descriptors as _descriptors
+
+            descriptors = np.concatenate(
+                [_descriptors.of(self, cache_dir=None), _descriptors.of(other, cache_dir=None)]
+            )
+
+        return MoleculeTable(
+            pool=self.pool,
+            columns={
+                field: np.concatenate([self.columns[field], recode(other.columns[field])])
+                for field in STRING_FIELDS
+            },
+            atc_offsets=np.concatenate(
+                [self.atc_offsets, other.atc_offsets[1:] + self.atc_offsets[-1]]
+            ),
+            atc_codes=np.concatenate([self.atc_codes, recode(other.atc_codes)]),
+            descriptors=descriptors,
+        )
+
+    def unique_rows(self, field: str = "name") -> np.ndarray:
+        """Row ids keeping the *last* row per ``field`` value, in first-seen order.
+
+        This mirrors ``dict`` update semantics: ``{m.name: m for m in molecules}``.
+        """
+        return last_unique(self.columns[field].tolist())
+
+
+def last_unique(keys: Iterable[Hashable]) -> np.ndarray:
+    """Positions of the *last* occurrence of every key, in order of first occurrence."""
+    positions: dict = {}
+    for row, key in enumerate(keys):
+        positions[key] = row
+    return np.fromiter(positions.values(), dtype=np.intp, count=len(positions))
@@ -0,0 +1,383 @@
+"""Grading of typed answers against a fuzzy synonym index.
+
+Answers are compared after :func:`normalize`: case, accents and punctuation are
+ignored and, for drug names, salt and hydrate suffixes are dropped ("Imatinib
+mesylate" is "imatinib"), unless that turns the name into another answer: esters
+and prodrugs share the suffixes, and "betamethasone benzoate" is neither
+"betamethasone acetate" nor "betamethasone". A :class:`SynonymIndex` maps the
+normalized variants of every answer (the answers themselves plus the variants
+users accepted) to their answer, with
+
+- a dictionary of exact variants, so most answers are graded by one lookup, and
+- a trigram index, to find the variants within a few typos of a guess: a variant
+  ``k`` edits away from the guess shares all but at most ``3 k`` of its
+  trigrams, so only the variants sharing enough trigrams are compared.
+
+:meth:`SynonymIndex.grade` accepts a guess within :func:`allowed_typos` edits
+(insertions, deletions, substitutions or swaps of adjacent letters) of a variant
+of the answer, unless another answer is strictly closer: "carbonic anhydrase 2" is
+not a typo of "carbonic anhydrase 4". Grading takes microseconds: the distance is
+computed in a band of ``2 k + 1`` diagonals only, and the index is searched only
+when another answer could be closer.
+
+Variants are added one at a time (:meth:`SynonymIndex.add`), without rebuilding,
+and accepted variants persist in a :class:`SynonymStore`.
+"""
+import atexit
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from chemcards.database.resources import SYNONYM_DATABASE
+
+logger = logging.getLogger(__name__)
+
+# Counter-ions and solvates ChEMBL appends to drug names. Some (acetate, benzoate,
+# phosphate, succinate, ...) also name esters, which SynonymIndex keeps apart
+SALTS = frozenset(
+    """
+    acetate anhydrous benzoate besilate besylate bitartrate bromide calcium chloride
+    citrate dihydrate dihydrochloride dimesylate disodium edisylate fumarate gluconate
+    hemifumarate hemihydrate hydrate hydrobromide hydrochloride hcl hyclate lactate
+    magnesium maleate malate mesilate mesylate monohydrate monosodium nitrate oxalate
+    pamoate phosphate potassium sesquihydrate sodium succinate sulfate sulphate tartrate
+    tosilate tosylate trihydrate trihydrochloride tromethamine
+    """.split()
+)
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize(text: str, strip_salts: bool = False) -> str:
+    """``text`` without case, accents or punctuation (and salt suffixes, if asked)."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    words = _SEPARATORS.sub(" ", text).split()
+    while strip_salts and len(words) > 1 and words[-1] in SALTS:
+        words.pop()
+    return " ".join(words)
+
+
+def allowed_typos(length: int) -> int:
+    """Edits tolerated in an answer of ``length`` characters."""
+    if length < 4:
+        return 0
+    return 1 if length < 8 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """The optimal string alignment distance between ``a`` and ``b``: Levenshtein,
+    plus swaps of adjacent characters. Anything over ``limit`` is ``limit + 1``.
+    """
+    # Only the differing middle matters
+    start, shortest = 0, min(len(a), len(b))
+    while start < shortest and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < shortest - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start : len(a) - end], b[start : len(b) - end]
+    la, lb = len(a), len(b)
+    over = limit + 1
+    if abs(la - lb) > limit:
+        return over
+    if not la or not lb:
+        return max(la, lb)
+
+    # Cells more than ``limit`` off the diagonal are over the limit anyway
+    before = None
+    previous = [j if j <= limit else over for j in range(lb + 1)]
+    for i in range(1, la + 1):
+        ca = a[i - 1]
+        current = [over] * (lb + 1)
+        if i <= limit:
+            current[0] = i
+        best = current[0]
+        for j in range(max(1, i - limit), min(lb, i + limit) + 1):
+            cb = b[j - 1]
+            if ca == cb:
+                d = previous[j - 1]
+            else:
+                d = min(previous[j], current[j - 1], previous[j - 1]) + 1
+                if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                    d = min(d, before[j - 2] + 1)
+            current[j] = d
+            if d < best:
+                best = d
+        if best > limit:
+            return over
+        before, previous = previous, current
+    return min(previous[lb], over)
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f" {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class Match(NamedTuple):
+    answer: str
+    variant: str
+    distance: int
+
+
+class Grade(NamedTuple):
+    correct: bool
+    # Edits between the guess and the closest answer found, if any was close enough
+    distance: int | None
+    closest: str | None
+
+
+class SynonymIndex:
+    """Normalized variants of a set of answers, searchable within a few typos."""
+
+    def __init__(self, strip_salts: bool = False):
+        self.strip_salts = strip_salts
+        self.answers: list[str] = []
+        self._answer_ids: dict[str, int] = {}
+        self._variants: list[str] = []
+        self._answer_of = array("i")  # variant -> answer id
+        self._by_answer: list[list[int]] = []  # answer id -> variants
+        self._stripped = array("b")  # variant -> whether salt suffixes were dropped from it
+        self._exact: dict[str, list[int]] = {}
+        self._postings: dict[str, array] = {}
+        self._trigram_counts = array("i")  # variant -> number of trigrams
+        self._lengths = array("i")  # variant -> length
+
+    @classmethod
+    def from_answers(cls, answers: Iterable[str], strip_salts: bool = False) -> "SynonymIndex":
+        index = cls(strip_salts)
+        for answer in answers:
+            index.add(answer, answer)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._variants)
+
+    def normalize(self, text: str) -> str:
+        return normalize(text, self.strip_salts)
+
+    def variants(self, answer: str) -> list[str]:
+        answer_id = self._answer_ids.get(answer)
+        return [] if answer_id is None else [self._variants[v] for v in self._by_answer[answer_id]]
+
+    def add(self, variant: str, answer: str) -> bool:
+        """Accept ``variant`` for ``answer``; ``False`` if it already was.
+
+        A variant with salt suffixes is stored both with and without them.
+        """
+        full = normalize(variant)
+        text = self.normalize(variant)
+        if not text:
+            return False
+        answer_id = self._answer_ids.get(answer)
+        if answer_id is None:
+            answer_id = self._answer_ids[answer] = len(self.answers)
+            self.answers.append(answer)
+            self._by_answer.append([])
+        added = self._add(text, answer_id, stripped=text != full)
+        if text != full:
+            added = self._add(full, answer_id, stripped=False) or added
+        return added
+
+    def _add(self, text: str, answer_id: int, stripped: bool) -> bool:
+        known = self._exact.setdefault(text, [])
+        for v in known:
+            if self._answer_of[v] == answer_id:
+                if self._stripped[v] and not stripped:
+                    # Accepted as it is, e.g. "imatinib" for "imatinib mesylate"
+                    self._stripped[v] = False
+                    return True
+                return False
+        variant_id = len(self._variants)
+        self._variants.append(text)
+        self._answer_of.append(answer_id)
+        self._stripped.append(stripped)
+        self._by_answer[answer_id].append(variant_id)
+        known.append(variant_id)
+        grams = trigrams(text)
+        self._trigram_counts.append(len(grams))
+        self._lengths.append(len(text))
+        for gram in grams:
+            self._postings.setdefault(gram, array("i")).append(variant_id)
+        return True
+
+    def _shadowed(self, v: int) -> bool:
+        """Whether ``v`` was stripped of salt suffixes down to another answer's name."""
+        if not self._stripped[v]:
+            return False
+        answer_id = self._answer_of[v]
+        return any(
+            not self._stripped[w] and self._answer_of[w] != answer_id
+            for w in self._exact[self._variants[v]]
+        )
+
+    def _exact_matches(self, full: str, text: str) -> list[int]:
+        """Variants equal to a guess: as typed (``full``) first, then without its salt
+        suffixes (``text``), e.g. "betamethasone benzoate" is that ester rather than
+        any other salt of betamethasone.
+        """
+        matches = [v for v in self._exact.get(full, ()) if not self._stripped[v]]
+        return matches or [v for v in self._exact.get(text, ()) if not self._shadowed(v)]
+
+    def _candidates(self, text: str, limit: int) -> np.ndarray:
+        """Variants that can be within ``limit`` edits of ``text``: of a close enough
+        length, and sharing enough trigrams (q-gram lemma)."""
+        grams = trigrams(text)
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not lists:
+            return np.zeros(0, dtype=np.intp)
+        shared = np.bincount(
+            np.concatenate([np.frombuffer(ids, dtype=np.int32) for ids in lists]),
+            minlength=len(self._variants),
+        )
+        counts = np.frombuffer(self._trigram_counts, dtype=np.int32)
+        needed = np.maximum(counts, len(grams)) - 3 * limit
+        lengths = np.frombuffer(self._lengths, dtype=np.int32)
+        close = (shared > 0) & (shared >= needed) & (np.abs(lengths - len(text)) <= limit)
+        return np.flatnonzero(close)
+
+    def search(self, text: str, limit: int | None = None) -> list[Match]:
+        """Answers with a variant within ``limit`` edits of ``text`` (by default
+        :func:`allowed_typos`), closest first, with their closest variant."""
+        query = self.normalize(text)
+        if not query:
+            return []
+        limit = allowed_typos(len(query)) if limit is None else limit
+        best: dict[int, tuple[int, int]] = {}
+        for v in self._exact_matches(normalize(text), query):
+            best[self._answer_of[v]] = (0, v)
+        if limit:
+            for v in self._candidates(query, limit).tolist():
+                if self._shadowed(v):
+                    continue
+                answer_id = self._answer_of[v]
+                bound = min(limit, best.get(answer_id, (limit + 1,))[0] - 1)
+                if bound < 0:
+                    continue
+                d = edit_distance(query, self._variants[v], bound)
+                if d <= bound:
+                    best[answer_id] = (d, v)
+        matches = [Match(self.answers[a], self._variants[v], d) for a, (d, v) in best.items()]
+        return sorted(matches, key=lambda match: (match.distance, match.answer))
+
+    def grade(self, guess: str, answer: str) -> Grade:
+        """Whether ``guess`` is ``answer``, allowing for typos."""
+        query = self.normalize(guess)
+        answer_id = self._answer_ids.get(answer)
+        if not query or answer_id is None:
+            return Grade(False, None, None)
+        exact = self._exact_matches(normalize(guess), query)
+        if exact:
+            answer_ids = [self._answer_of[v] for v in exact]
+            closest = answer if answer_id in answer_ids else self.answers[answer_ids[0]]
+            return Grade(answer_id in answer_ids, 0, closest)
+
+        limit = allowed_typos(len(query))
+        distance = min(
+            (
+                edit_distance(query, self._variants[v], limit)
+                for v in self._by_answer[answer_id]
+                if not self._shadowed(v)
+            ),
+            default=limit + 1,
+        )
+        if distance > limit:
+            return Grade(False, None, None)
+        if distance > 1:
+            # No other answer matched exactly; one might still be closer
+            others = [m for m in self.search(query, distance - 1) if m.answer != answer]
+            if others:
+                return Grade(False, others[0].distance, others[0].answer)
+        return Grade(True, distance, answer)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS synonyms (
+    field TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (field, variant, answer)
+) WITHOUT ROWID;
+"""
+
+
+class SynonymStore:
+    """Answer variants accepted by users, per field (e.g. ``"target"``).
+
+    With ``path=None`` (or when the database cannot be opened) nothing persists.
+    """
+
+    def __init__(self, path: Path | None = SYNONYM_DATABASE):
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._disk_failed = False
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self._connection is not None or self.path is None or self._disk_failed:
+            return self._connection
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            with connection:
+                connection.executescript(SCHEMA)
+            self._connection = connection
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Accepted answers will not be saved, cannot open %s: %s", self.path, e)
+            self._disk_failed = True
+        return self._connection
+
+    def load(self, field: str) -> list[tuple[str, str]]:
+        """The ``(variant, answer)`` pairs accepted for ``field``, oldest first."""
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return []
+            return connection.execute(
+                "SELECT variant, answer FROM synonyms WHERE field = ? ORDER BY added_at",
+                (field,),
+            ).fetchall()
+
+    def add(self, field: str, variant: str, answer: str) -> None:
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                with connection:
+                    connection.execute(
+                        "INSERT OR IGNORE INTO synonyms VALUES (?, ?, ?, ?)",
+                        (field, variant, answer, time.time()),
+                    )
+            except sqlite3.Error as e:
+                logger.warning("Could not save the answer %r for %r: %s", variant, answer, e)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_default_store: SynonymStore | None = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> SynonymStore:
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = SynonymStore(SYNONYM_DATABASE)
+            atexit.register(_default_store.close)
+        return _default_store
@@ -1,7 +1,17 @@
-from pydantic import BaseModel
+import copy
+import random
+import threading
+import weakref
+from collections.abc import Hashable, Iterator
+
+import numpy as np
+from pydantic import BaseModel, Field
 from enum import Enum
 from chemcards.database.core import MoleculeDB
+from chemcards.database.table import MoleculeTable
+from chemcards.flashcards.sampling import DistinctSampler
 from abc import abstractmethod
+from typing import Optional, Self
 
 
 class FlashcardType(Enum):
@@ -9,42 +19,343 @@ class FlashcardType(Enum):
 
 
 class FlashCardBase(BaseModel):
-    pass
+    card_key: Optional[str] = Field(
+        None, description="Key of the scheduled card this question is about, if any"
+    )
 
 
 class FilterBase:
+    """A predicate over molecules.
+
+    Filters that implement :meth:`mask` compose with ``&``, ``|`` and ``~`` into
+    expressions that are evaluated as one boolean row mask over the snapshot they
+    are applied to, so stacking filters selects rows once instead of building an
+    intermediate database per filter. Masks are computed with the table's indexes
+    and columns and memoized per table by :attr:`signature`; filters whose state is
+    not hashable have none and are evaluated every time.
+    """
+
+    def mask(self, table: MoleculeTable) -> np.ndarray | None:
+        """Boolean mask of the rows of ``table`` passing the filter.
+
+        Returns ``None`` if the filter can only be applied with :meth:`apply`.
+        """
+        return None
 
-    @abstractmethod
     def apply(self, molecule_db: MoleculeDB) -> MoleculeDB:
-        pass
+        mask = cached_mask(self, molecule_db.table)
+        if mask is None:
+            raise NotImplementedError(f"{type(self).__name__} implements neither mask nor apply")
+        return molecule_db.take(mask)
 
     def __call__(self, molecule_db: MoleculeDB) -> MoleculeDB:
         return self.apply(molecule_db)
 
+    @property
+    def signature(self) -> Hashable | None:
+        """Identifies what the filter selects: equal signatures give equal masks.
+
+        ``None`` when the filter's state is not hashable, so its masks are not memoized.
+        """
+        try:
+            return (type(self).__qualname__, *sorted(_hashable(vars(self)).items()))
+        except TypeError:
+            return None
+
+    def __and__(self, other: "FilterBase") -> "AndFilter":
+        return AndFilter(self, other)
+
+    def __or__(self, other: "FilterBase") -> "OrFilter":
+        return OrFilter(self, other)
+
+    def __invert__(self) -> "NotFilter":
+        return NotFilter(self)
+
+    def to_sql(self) -> tuple[str, tuple] | None:
+        """A ``WHERE`` clause over the ``molecules`` table and its parameters.
+
+        Returns ``None`` if the filter can only be applied in Python.
+        """
+        return None
+
+
+def _hashable(value):
+    """``value`` with its containers made hashable; raises ``TypeError`` for anything else
+    that is not hashable, e.g. an array (keying it by ``id`` would go stale once freed).
+    """
+    if isinstance(value, dict):
+        return {key: _hashable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = tuple(_hashable(item) for item in value)
+        return tuple(sorted(items, key=repr)) if isinstance(value, (set, frozenset)) else items
+    hash(value)
+    return value
+
+
+_masks: "weakref.WeakKeyDictionary[MoleculeTable, dict]" = weakref.WeakKeyDictionary()
+_masks_lock = threading.Lock()
+
+
+def cached_mask(filter: FilterBase, table: MoleculeTable) -> np.ndarray | None:
+    """``filter.mask(table)``, computed once per table and filter signature."""
+    signature = filter.signature
+    if signature is not None:
+        with _masks_lock:
+            masks = _masks.setdefault(table, {})
+            if signature in masks:
+                return masks[signature]
+    mask = filter.mask(table)
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool)
+        # Shared between callers
+        mask.flags.writeable = False
+    if signature is not None:
+        with _masks_lock:
+            masks[signature] = mask
+    return mask
+
+
+class _CompositeFilter(FilterBase):
+    def __init__(self, *filters: FilterBase):
+        self.filters = filters
+
+    @property
+    def signature(self) -> Hashable | None:
+        signatures = [f.signature for f in self.filters]
+        if None in signatures:
+            return None
+        # and/or are commutative: the order of the operands does not matter
+        return (type(self).__qualname__, tuple(sorted(signatures, key=repr)))
+
+    def _sql(self, operator: str) -> tuple[str, tuple] | None:
+        compiled = [f.to_sql() for f in self.filters]
+        if not compiled or any(clause is None for clause in compiled):
+            return None
+        params = tuple(param for _, clause_params in compiled for param in clause_params)
+        return f" {operator} ".join(f"({clause})" for clause, _ in compiled), params
+
+
+class AndFilter(_CompositeFilter):
+    """Molecules passing every filter.
+
+    Filters without a mask are applied one after the other to the rows selected by
+    the others.
+    """
+
+    def __and__(self, other: FilterBase) -> "AndFilter":
+        return AndFilter(*self.filters, other)
+
+    def mask(self, table: MoleculeTable) -> np.ndarray | None:
+        if any(cached_mask(f, table) is None for f in self.filters):
+            return None
+        return self._mask(table, self.filters)
+
+    @staticmethod
+    def _mask(table, filters) -> np.ndarray:
+        mask = np.ones(len(table), dtype=bool)
+        for f in filters:
+            mask &= cached_mask(f, table)
+            if not mask.any():
+                break
+        return mask
+
+    def apply(self, molecule_db: MoleculeDB) -> MoleculeDB:
+        table = molecule_db.table
+        masked = [f for f in self.filters if cached_mask(f, table) is not None]
+        remaining = [f for f in self.filters if f not in masked]
+        if not remaining:
+            return super().apply(molecule_db)
+        if masked:
+            molecule_db = molecule_db.take(self._mask(table, masked))
+        for f in remaining:
+            molecule_db = f(molecule_db)
+        return molecule_db
+
+    def to_sql(self) -> tuple[str, tuple] | None:
+        return self._sql("AND")
+
+
+class OrFilter(_CompositeFilter):
+    """Molecules passing any of the filters."""
+
+    def __or__(self, other: FilterBase) -> "OrFilter":
+        return OrFilter(*self.filters, other)
+
+    def mask(self, table: MoleculeTable) -> np.ndarray | None:
+        masks = [cached_mask(f, table) for f in self.filters]
+        if any(mask is None for mask in masks):
+            return None
+        return np.logical_or.reduce(masks, initial=False) if masks else np.zeros(len(table), bool)
+
+    def to_sql(self) -> tuple[str, tuple] | None:
+        return self._sql("OR")
+
+
+class NotFilter(FilterBase):
+    """Molecules not passing ``filter``."""
+
+    def __init__(self, filter: FilterBase):
+        self.filter = filter
+
+    @property
+    def signature(self) -> Hashable | None:
+        signature = self.filter.signature
+        return None if signature is None else (type(self).__qualname__, signature)
+
+    def __invert__(self) -> FilterBase:
+        return self.filter
+
+    def mask(self, table: MoleculeTable) -> np.ndarray | None:
+        mask = cached_mask(self.filter, table)
+        return None if mask is None else ~mask
+
+    def to_sql(self) -> tuple[str, tuple] | None:
+        compiled = self.filter.to_sql()
+        if compiled is None:
+            return None
+        clause, params = compiled
+        return f"NOT ({clause})", params
+
 
 class FlashCardGeneratorBase:
+    """Generates questions about the molecules passing ``filters``.
+
+    Each generator draws from its own random number generators, seeded from
+    ``seed`` (an int, a :class:`numpy.random.SeedSequence`, or ``None`` for fresh
+    entropy): the same seed and the same calls give the same questions.
+    :meth:`shard` derives independent streams from the seed the way
+    :meth:`numpy.random.SeedSequence.spawn` does, so each process of a parallel job
+    can rebuild its own shard from ``(seed, index)`` alone, e.g.::
 
+        generator = MultipleChoiceMoleculeToTargetGenerator(db, seed=1234)
+        questions = list(generator.deck(shard=index, shards=processes))
+    """
 
     @property
     @abstractmethod
     def name(self) -> str:
         return "FlashCardGeneratorBase"
 
-    def __init__(self, molecule_db: MoleculeDB, filters: list[FilterBase] = ()):
+    def __init__(
+        self,
+        molecule_db: MoleculeDB,
+        filters: list[FilterBase] = (),
+        seed: int | np.random.SeedSequence | None = None,
+    ):
         self.molecule_db = self.apply_filters(molecule_db, filters)
         self.filters = filters
+        self.seed(seed)
+
+    def seed(self, seed: int | np.random.SeedSequence | None = None) -> None:
+        """Restart the generator's random streams from ``seed``."""
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        # ``rng`` for array sampling, ``random`` for scalar draws
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(int(self.rng.integers(1 << 62)))
+
+    def shard(self, index: int) -> Self:
+        """A copy of the generator drawing from the ``index``-th child stream of its seed.
+
+        Shard ``i`` is seeded like the ``i``-th child of ``seed_sequence.spawn``, but
+        without spawning, so the same shard is derived in any process.
+        """
+        parent = self.seed_sequence
+        child = np.random.SeedSequence(
+            parent.entropy, spawn_key=(*parent.spawn_key, index), pool_size=parent.pool_size
+        )
+        shard = copy.copy(self)
+        shard.seed(child)
+        return shard
+
+    def shards(self, count: int) -> list[Self]:
+        return [self.shard(index) for index in range(count)]
+
+    def stream(self, n: int | None = None, batch_size: int = 64) -> Iterator[FlashCardBase]:
+        """Questions one at a time, generated ``batch_size`` at a time.
+
+        Endless unless ``n`` is given. The questions depend on ``batch_size`` when
+        the generator samples in bulk.
+        """
+        produced = 0
+        while n is None or produced < n:
+            batch = self.next_batch(batch_size if n is None else min(batch_size, n - produced))
+            if not batch:
+                return
+            yield from batch
+            produced += len(batch)
+
+    def deck(self, shard: int = 0, shards: int = 1) -> Iterator[FlashCardBase]:
+        """One question per card, in an order fixed by the seed.
+
+        The cards are split between shards ``0 .. shards - 1`` of the same seed:
+        together they ask about every card exactly once, each shard with its own
+        random stream.
+        """
+        keys = self.card_keys()
+        # Drawn from the seed itself: every shard sees the same order
+        order = np.random.default_rng(self.seed_sequence).permutation(len(keys))
+        generator = self.shard(shard)
+        for i in order[shard::shards].tolist():
+            yield generator.card(keys[i])
 
     @classmethod
     def apply_filters(
         cls, molecule_db: MoleculeDB, filters: list[FilterBase] = ()
     ) -> MoleculeDB:
-        for filter in filters:
-            molecule_db = filter(molecule_db)
-        return molecule_db
+        if not filters:
+            return molecule_db
+        # One row selection for the whole stack
+        return AndFilter(*filters).apply(molecule_db)
 
     @abstractmethod
     def next(self) -> FlashCardBase:
         pass
 
-    def __iter__(self):
-        return self.next()
+    def next_batch(self, n: int) -> list[FlashCardBase]:
+        """``n`` questions at once; generators that can sample in bulk override this."""
+        return [self.next() for _ in range(n)]
+
+    def card_keys(self) -> list[str]:
+        """Stable keys of the cards this generator asks about, for scheduling."""
+        raise NotImplementedError(f"{type(self).__name__} cannot be scheduled")
+
+    def card(self, key: str) -> FlashCardBase:
+        """A question about the card ``key``."""
+        raise NotImplementedError(f"{type(self).__name__} cannot be scheduled")
+
+    def __iter__(self) -> Iterator[FlashCardBase]:
+        return self.stream()
+
+
+class MoleculeFieldCardsBase(FlashCardGeneratorBase):
+    """Asks about the ``field`` value of molecules, drawn by ``sampler``.
+
+    Every molecule with a known value is a card, keyed by the molecule's name;
+    :meth:`_question` asks about one row.
+    """
+
+    field: str
+
+    def __init__(self, molecule_db, filters=(), seed=None):
+        super().__init__(molecule_db, filters, seed)
+        self.sampler = DistinctSampler(self.molecule_db.indexes.field(self.field))
+
+    @abstractmethod
+    def _question(self, row: int) -> FlashCardBase:
+        pass
+
+    def card_keys(self) -> list[str]:
+        names = self.molecule_db.table.pool.decode(
+            self.molecule_db.table.codes("name")[self.sampler.items]
+        )
+        return list(dict.fromkeys(names))
+
+    def card(self, key: str) -> FlashCardBase:
+        rows = self.molecule_db.indexes.field("name").rows(key)
+        # The first molecule of that name with a known value, e.g. not a salt form without one
+        rows = rows[np.isin(rows, self.sampler.items)]
+        if not len(rows):
+            raise KeyError(key)
+        return self._question(int(rows[0]))
@@ -0,0 +1,471 @@
+"""Export of flashcard questions to Anki packages and CSV.
+
+:func:`export` consumes any iterable of multiple-choice questions (e.g. a
+generator's ``stream(n)`` or ``deck()``) in batches of ``batch_size``: the
+structures a batch shows are rendered to PNG, in a process pool if asked to, and
+its notes are written in one transaction. Only the batch in flight is held in
+memory, plus one file name per distinct structure and one hash per note, so a
+deck's memory use barely grows with its size.
+
+Images are named by the hash of their content: a structure is rendered once, and
+structures drawn identically (e.g. the same molecule under two SMILES) share a
+file. Notes are named by the hash of their fields and repeated questions are
+written once.
+
+The output format follows the file extension:
+
+- ``.apkg``: an Anki package (a ``collection.anki2`` SQLite collection with one
+  deck and a Front/Back note type, plus the media files).
+- ``.zip``: ``cards.csv`` (with Anki's import headers) and the images in
+  ``media/``; copy them to Anki's ``collection.media`` folder before importing.
+"""
+import csv
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+from pathlib import Path
+from typing import NamedTuple
+
+from pydantic import BaseModel
+from rdkit import Chem
+from rdkit.Chem.Draw import rdMolDraw2D
+
+from chemcards.database.cheminformatics import FunctionalGroup
+from chemcards.database.core import MoleculeEntry
+from chemcards.flashcards.multiplechoice import (
+    MultipleChoice,
+    MultipleChoiceMoleculeToFunctionalGroupNameGenerator,
+    MultipleChoiceMoleculeToMechanismGenerator,
+    MultipleChoiceMoleculeToNameGenerator,
+    MultipleChoiceMoleculeToTargetGenerator,
+    MultipleChoiceMostSpecificFunctionalGroupGenerator,
+    MultipleChoiceNameToMoleculeGenerator,
+    MultipleChoiceScaffoldFamilyGenerator,
+)
+
+logger = logging.getLogger(__name__)
+
+# Questions per batch: rendered together and written in one transaction
+WRITE_BATCH = 256
+IMAGE_SIZE = 300
+# Structures per task sent to a worker process
+RENDER_CHUNK = 16
+
+GENERATORS = {
+    "molecule-to-target": MultipleChoiceMoleculeToTargetGenerator,
+    "molecule-to-mechanism": MultipleChoiceMoleculeToMechanismGenerator,
+    "molecule-to-name": MultipleChoiceMoleculeToNameGenerator,
+    "name-to-molecule": MultipleChoiceNameToMoleculeGenerator,
+    "functional-group-name": MultipleChoiceMoleculeToFunctionalGroupNameGenerator,
+    "most-specific-functional-group": MultipleChoiceMostSpecificFunctionalGroupGenerator,
+    "scaffold-family": MultipleChoiceScaffoldFamilyGenerator,
+}
+
+# ("smiles" | "smarts", text)
+Structure = tuple[str, str]
+
+
+class Note(NamedTuple):
+    guid: str
+    front: str
+    back: str
+
+
+class ExportStats(BaseModel):
+    questions: int = 0
+    notes: int = 0
+    duplicates: int = 0  # questions identical to one already written
+    images: int = 0  # distinct image files written
+    rendered: int = 0  # structures drawn
+    seconds: float = 0.0
+
+
+def structure_of(item) -> Structure | None:
+    if isinstance(item, FunctionalGroup):
+        return ("smarts", item.smarts)
+    if isinstance(item, MoleculeEntry):
+        return ("smiles", item.smiles)
+    return None
+
+
+def render_png(structure: Structure, size: int = IMAGE_SIZE) -> bytes | None:
+    """``structure`` drawn as a PNG, or ``None`` if it does not parse."""
+    kind, text = structure
+    mol = Chem.MolFromSmarts(text) if kind == "smarts" else Chem.MolFromSmiles(text)
+    if mol is None:
+        return None
+    # Straight to PNG with Cairo: a third faster than going through a PIL image
+    drawer = rdMolDraw2D.MolDraw2DCairo(size, size)
+    rdMolDraw2D.PrepareAndDrawMolecule(drawer, mol)
+    drawer.FinishDrawing()
+    return drawer.GetDrawingText()
+
+
+class ImageRenderer:
+    """Renders structures once each and names the images by content hash."""
+
+    def __init__(self, size: int = IMAGE_SIZE, processes: int | None = 1):
+        self.size = size
+        self.names: dict[Structure, str | None] = {}
+        self.rendered = 0
+        self._files: set[str] = set()
+        processes = processes or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(processes) if processes > 1 else None
+
+    def render(self, structures: Iterable[Structure]) -> list[tuple[str, bytes]]:
+        """Render the structures not seen yet; returns the new ``(name, png)`` files."""
+        todo = [s for s in dict.fromkeys(structures) if s not in self.names]
+        if self._executor is not None and len(todo) > RENDER_CHUNK:
+            pngs = self._executor.map(render_png, todo, repeat(self.size), chunksize=RENDER_CHUNK)
+        else:
+            pngs = map(render_png, todo, repeat(self.size))
+        files = []
+        for structure, png in zip(todo, pngs):
+            self.rendered += 1
+            if png is None:
+                self.names[structure] = None
+                continue
+            name = f"chemcards-{hashlib.sha1(png).hexdigest()[:20]}.png"
+            self.names[structure] = name
+            if name not in self._files:
+                self._files.add(name)
+                files.append((name, png))
+        return files
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+
+
+def _item_html(item, names: dict[Structure, str | None]) -> str:
+    structure = structure_of(item)
+    if structure is None:
+        return html.escape(str(item))
+    name = names.get(structure)
+    # No alt text: a molecule's name would give the answer away
+    return f'<img src="{name}">' if name else html.escape(structure[1])
+
+
+def to_note(question: MultipleChoice, names: dict[Structure, str | None]) -> Note:
+    """The Front/Back fields of ``question``, with images referenced by file name."""
+    front = f'<div class="question">{html.escape(question.question)}</div>'
+    if question.display is not None:
+        front += f'<div class="display">{_item_html(question.display, names)}</div>'
+    choices = "".join(f"<li>{_item_html(choice, names)}</li>" for choice in question.choices)
+    front += f'<ol type="A" class="choices">{choices}</ol>'
+
+    letter = chr(ord("A") + question.answer_index)
+    back = f'<div class="answer">{letter}. {_item_html(question.answer, names)}</div>'
+    molecule = question.answer_molecule
+    if molecule is not None:
+        details = [molecule.name, molecule.target, molecule.mechanism_of_action]
+        back += '<div class="details">{}</div>'.format(
+            "<br>".join(html.escape(value) for value in details if value != "unknown")
+        )
+    guid = hashlib.sha1(f"{front}\x1f{back}".encode()).hexdigest()[:16]
+    return Note(guid, front, back)
+
+
+class CSVZipWriter:
+    """``cards.csv`` and ``media/`` in a zip file."""
+
+    def __init__(self, path: Path, deck_name: str):
+        self.path = Path(path)
+        self.zip = zipfile.ZipFile(self.path, "w", zipfile.ZIP_DEFLATED)
+        # The zip cannot take the CSV while media are added: spool it to disk
+        self._cards = tempfile.TemporaryFile("w+", newline="", encoding="utf-8")
+        self._cards.write(f"#separator:Comma\n#html:true\n#guid column:1\n#deck:{deck_name}\n")
+        self._csv = csv.writer(self._cards)
+
+    def add_media(self, name: str, data: bytes) -> None:
+        # PNGs are compressed already
+        self.zip.writestr(f"media/{name}", data, compress_type=zipfile.ZIP_STORED)
+
+    def add_notes(self, notes: Sequence[Note]) -> None:
+        self._csv.writerows(notes)
+
+    def close(self) -> None:
+        self._cards.seek(0)
+        with self.zip.open("cards.csv", "w") as out:
+            while chunk := self._cards.read(1 << 16):
+                out.write(chunk.encode("utf-8"))
+        self._cards.close()
+        self.zip.close()
+
+    def discard(self) -> None:
+        self._cards.close()
+        self.zip.close()
+        self.path.unlink(missing_ok=True)
+
+
+ANKI_SCHEMA = """
+CREATE TABLE col (
+    id integer primary key, crt integer not null, mod integer not null,
+    scm integer not null, ver integer not null, dty integer not null, usn integer not null,
+    ls integer not null, conf text not null, models text not null, decks text not null,
+    dconf text not null, tags text not null
+);
+CREATE TABLE notes (
+    id integer primary key, guid text not null, mid integer not null, mod integer not null,
+    usn integer not null, tags text not null, flds text not null, sfld integer not null,
+    csum integer not null, flags integer not null, data text not null
+);
+CREATE TABLE cards (
+    id integer primary key, nid integer not null, did integer not null, ord integer not null,
+    mod integer not null, usn integer not null, type integer not null, queue integer not null,
+    due integer not null, ivl integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, left integer not null, odue integer not null,
+    odid integer not null, flags integer not null, data text not null
+);
+CREATE TABLE revlog (
+    id integer primary key, cid integer not null, usn integer not null, ease integer not null,
+    ivl integer not null, lastIvl integer not null, factor integer not null,
+    time integer not null, type integer not null
+);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+"""
+
+ANKI_CSS = """.card { font-family: arial; font-size: 20px; text-align: center; }
+.choices { display: inline-block; text-align: left; }
+img { max-width: 300px; }
+"""
+
+
+def _anki_id(text: str) -> int:
+    # Stable across exports, so re-importing a deck updates it
+    return int(hashlib.sha1(text.encode()).hexdigest()[:12], 16)
+
+
+class AnkiPackageWriter:
+    """An Anki package: a legacy (schema 11) collection and its media, zipped."""
+
+    def __init__(self, path: Path, deck_name: str):
+        self.path = Path(path)
+        self.deck_name = deck_name
+        self.deck_id = _anki_id(f"deck {deck_name}")
+        self.model_id = _anki_id("chemcards multiple choice")
+        self.now = int(time.time())
+        self._next_id = self.now * 1000
+        self._position = 0
+        self._media: list[str] = []
+        self._directory = tempfile.TemporaryDirectory()
+        self._collection = Path(self._directory.name) / "collection.anki2"
+        self.connection = sqlite3.connect(self._collection)
+        self.connection.executescript(ANKI_SCHEMA)
+        self.zip = zipfile.ZipFile(self.path, "w", zipfile.ZIP_DEFLATED)
+
+    def add_media(self, name: str, data: bytes) -> None:
+        # Packages store media as 0, 1, ...; the "media" file maps them to names
+        self.zip.writestr(str(len(self._media)), data, compress_type=zipfile.ZIP_STORED)
+        self._media.append(name)
+
+    def add_notes(self, notes: Sequence[Note]) -> None:
+        note_rows, card_rows = [], []
+        for note in notes:
+            note_id, card_id = self._next_id, self._next_id + 1
+            self._next_id += 2
+            sort_field = re.sub(r"<[^>]+>", "", note.front)
+            checksum = int(hashlib.sha1(sort_field.encode()).hexdigest()[:8], 16)
+            note_rows.append(
+                (note_id, note.guid, self.model_id, self.now, -1, "",
+                 f"{note.front}\x1f{note.back}", sort_field, checksum, 0, "")
+            )
+            # A new card, queued in export order
+            card_rows.append(
+                (card_id, note_id, self.deck_id, 0, self.now, -1, 0, 0, self._position,
+                 0, 0, 0, 0, 0, 0, 0, 0, "")
+            )
+            self._position += 1
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", note_rows
+            )
+            self.connection.executemany(
+                "INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                card_rows,
+            )
+
+    def _collection_row(self) -> tuple:
+        model = {
+            "id": self.model_id,
+            "name": "ChemCards Multiple Choice",
+            "type": 0,
+            "mod": self.now,
+            "usn": -1,
+            "sortf": 0,
+            "did": self.deck_id,
+            "tmpls": [
+                {
+                    "name": "Card 1",
+                    "ord": 0,
+                    "qfmt": "{{Front}}",
+                    "afmt": "{{FrontSide}}<hr id=answer>{{Back}}",
+                    "did": None,
+                    "bqfmt": "",
+                    "bafmt": "",
+                }
+            ],
+            "flds": [
+                {"name": name, "ord": i, "sticky": False, "rtl": False, "font": "Arial",
+                 "size": 20, "media": []}
+                for i, name in enumerate(["Front", "Back"])
+            ],
+            "css": ANKI_CSS,
+            "latexPre": "",
+            "latexPost": "",
+            "tags": [],
+            "vers": [],
+            "req": [[0, "any", [0]]],
+        }
+        deck = {
+            "name": self.deck_name,
+            "extendRev": 50,
+            "usn": -1,
+            "collapsed": False,
+            "newToday": [0, 0],
+            "timeToday": [0, 0],
+            "dyn": 0,
+            "extendNew": 10,
+            "conf": 1,
+            "revToday": [0, 0],
+            "lrnToday": [0, 0],
+            "id": self.deck_id,
+            "mod": self.now,
+            "desc": "",
+        }
+        default_deck = {**deck, "name": "Default", "id": 1}
+        options = {
+            "id": 1,
+            "name": "Default",
+            "replayq": True,
+            "lapse": {"delays": [10], "mult": 0, "minInt": 1, "leechFails": 8, "leechAction": 0},
+            "rev": {"perDay": 100, "ease4": 1.3, "fuzz": 0.05, "minSpace": 1, "ivlFct": 1,
+                    "maxIvl": 36500, "bury": True},
+            "timer": 0,
+            "maxTaken": 60,
+            "usn": 0,
+            "new": {"delays": [1, 10], "ints": [1, 4, 7], "initialFactor": 2500,
+                    "separate": True, "order": 1, "perDay": 20, "bury": True},
+            "mod": 0,
+            "autoplay": True,
+            "dyn": False,
+        }
+        conf = {
+            "nextPos": self._position + 1,
+            "estTimes": True,
+            "activeDecks": [self.deck_id],
+            "sortType": "noteFld",
+            "timeLim": 0,
+            "sortBackwards": False,
+            "addToCur": True,
+            "curDeck": self.deck_id,
+            "newBottom": True,
+            "newSpread": 0,
+            "dueCounts": True,
+            "curModel": self.model_id,
+            "collapseTime": 1200,
+        }
+        return (
+            1, self.now, self.now * 1000, self.now * 1000, 11, 0, 0, 0,
+            json.dumps(conf),
+            json.dumps({str(self.model_id): model}),
+            json.dumps({"1": default_deck, str(self.deck_id): deck}),
+            json.dumps({"1": options}),
+            "{}",
+        )
+
+    def close(self) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO col VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._collection_row(),
+            )
+        self.connection.close()
+        self.zip.write(self._collection, "collection.anki2")
+        self.zip.writestr("media", json.dumps(dict(enumerate(self._media))))
+        self.zip.close()
+        self._directory.cleanup()
+
+    def discard(self) -> None:
+        self.connection.close()
+        self.zip.close()
+        self._directory.cleanup()
+        self.path.unlink(missing_ok=True)
+
+
+WRITERS = {".apkg": AnkiPackageWriter, ".zip": CSVZipWriter}
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+def export(
+    questions: Iterable[MultipleChoice],
+    path: Path,
+    deck_name: str = "ChemCards",
+    processes: int | None = 1,
+    image_size: int = IMAGE_SIZE,
+    batch_size: int = WRITE_BATCH,
+) -> ExportStats:
+    """Write ``questions`` to ``path``, an ``.apkg`` or ``.zip`` file.
+
+    ``processes=None`` renders on every core. A failed export leaves no file behind.
+    """
+    path = Path(path)
+    try:
+        writer = WRITERS[path.suffix.lower()](path, deck_name)
+    except KeyError:
+        raise ValueError(f"Cannot export to {path.name}: use {' or '.join(WRITERS)}") from None
+    start = time.perf_counter()
+    stats = ExportStats()
+    renderer = ImageRenderer(image_size, processes)
+    written: set[str] = set()
+    try:
+        for batch in _batches(questions, batch_size):
+            structures = []
+            for question in batch:
+                items = [question.display, *question.choices]
+                structures.extend(s for s in map(structure_of, items) if s is not None)
+            for name, png in renderer.render(structures):
+                writer.add_media(name, png)
+                stats.images += 1
+            notes = []
+            for note in (to_note(question, renderer.names) for question in batch):
+                if note.guid in written:
+                    stats.duplicates += 1
+                    continue
+                written.add(note.guid)
+                notes.append(note)
+            writer.add_notes(notes)
+            stats.questions += len(batch)
+            stats.notes += len(notes)
+        writer.close()
+    except BaseException:
+        writer.discard()
+        raise
+    finally:
+        renderer.close()
+    stats.rendered = renderer.rendered
+    stats.seconds = time.perf_counter() - start
+    logger.info("Exported %d notes and %d images to %s", stats.notes, stats.images, path)
+    return stats
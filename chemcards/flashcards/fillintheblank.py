@@ -0,0 +1,91 @@
+"""Questions answered by typing the answer.
+
+Typed answers are graded by a :class:`~chemcards.flashcards.answers.SynonymIndex`
+over the generator's answers, so typos, case and (for names) salt suffixes do not
+count against the answer. A guess graded wrong that the user considers right can
+be accepted with :meth:`FillInTheBlankGeneratorBase.accept`: it becomes a variant
+of the answer at once and is saved for the next sessions.
+"""
+from typing import Optional
+
+from pydantic import Field
+
+from chemcards.database.core import MoleculeEntry
+from chemcards.database.table import UNKNOWN
+from chemcards.flashcards.answers import Grade, SynonymIndex, SynonymStore, default_store
+from chemcards.flashcards.core import FlashCardBase, MoleculeFieldCardsBase
+
+
+class FillInTheBlank(FlashCardBase):
+    question: str
+    display: Optional[MoleculeEntry] = Field(None, description="Molecule to display")
+    answer: str
+    answer_molecule: Optional[MoleculeEntry] = Field(
+        None, description="Molecule to view the information of if required"
+    )
+
+
+class FillInTheBlankGeneratorBase(MoleculeFieldCardsBase):
+    """Asks for the ``field`` value of a molecule.
+
+    Every molecule with a known value is a card, keyed by the molecule's name.
+    """
+
+    question: str
+
+    def __init__(self, molecule_db, filters=(), seed=None, store: SynonymStore | None = None):
+        super().__init__(molecule_db, filters, seed)
+        index = self.molecule_db.indexes.field(self.field)
+        self.store = store if store is not None else default_store()
+        self.synonyms = SynonymIndex.from_answers(
+            [value for value in index if value != UNKNOWN],
+            strip_salts=self.field == "name",
+        )
+        for variant, answer in self.store.load(self.field):
+            self.synonyms.add(variant, answer)
+
+    def _question(self, row: int) -> FillInTheBlank:
+        molecule = self.molecule_db.molecules[row]
+        return FillInTheBlank(
+            question=self.question,
+            display=molecule,
+            answer=getattr(molecule, self.field),
+            answer_molecule=molecule,
+        )
+
+    def next(self) -> FillInTheBlank:
+        items = self.sampler.items
+        if not items:
+            raise ValueError(f"No molecule has a known {self.field}")
+        return self._question(self.random.choice(items))
+
+    def grade(self, card: FillInTheBlank, guess: str) -> Grade:
+        return self.synonyms.grade(guess, card.answer)
+
+    def accept(self, card: FillInTheBlank, guess: str) -> bool:
+        """Count ``guess`` as a right answer to ``card`` from now on."""
+        if not self.synonyms.add(guess, card.answer):
+            return False
+        self.store.add(self.field, guess, card.answer)
+        return True
+
+
+class FillInTheBlankMoleculeToNameGenerator(FillInTheBlankGeneratorBase):
+
+    name = "Fill in the Blank - Molecule to Name"
+    field = "name"
+    question = "What is the name of this molecule?"
+
+
+class FillInTheBlankMoleculeToTargetGenerator(FillInTheBlankGeneratorBase):
+
+    name = "Fill in the Blank - Molecule to Target"
+    field = "target"
+    question = "What is the target of this molecule?"
+
+
+class FillInTheBlankMoleculeToMechanismGenerator(FillInTheBlankGeneratorBase):
+
+    name = "Fill in the Blank - Molecule to Mechanism"
+    field = "mechanism_of_action"
+    question = "What is the mechanism of action of this molecule?"
@@ -1,12 +1,181 @@
+import numpy as np
+
 from chemcards.flashcards.core import FilterBase
-from chemcards.database.core import MoleculeDB
+from chemcards.database import descriptors
+from chemcards.database.indexes import MoleculeIndexes, atc_level
+from chemcards.database.table import UNKNOWN, MoleculeTable
+
+
+def _rows_mask(table: MoleculeTable, rows: np.ndarray) -> np.ndarray:
+    mask = np.zeros(len(table), dtype=bool)
+    mask[rows] = True
+    return mask
 
 
 class MissingTargetFilter(FilterBase):
-    def apply(self, molecule_db: "MoleculeDB") -> "MoleculeDB":
-        return MoleculeDB(
-            molecules=[mol for mol in molecule_db.molecules if mol.target != "unknown"]
+    def mask(self, table: MoleculeTable) -> np.ndarray:
+        return ~table.unknown_mask("target")
+
+    def to_sql(self) -> tuple[str, tuple]:
+        return "target != ?", (UNKNOWN,)
+
+
+class FieldValueFilter(FilterBase):
+    """Keep molecules whose ``field`` equals one of ``values``."""
+
+    field: str
+
+    def __init__(self, *values: str):
+        self.values = values
+
+    def mask(self, table: MoleculeTable) -> np.ndarray:
+        return _rows_mask(table, MoleculeIndexes.of(table).field(self.field).rows_any(self.values))
+
+    def to_sql(self) -> tuple[str, tuple]:
+        placeholders = ", ".join("?" for _ in self.values)
+        return f"{self.field} IN ({placeholders})", tuple(self.values)
+
+
+class TargetFilter(FieldValueFilter):
+    field = "target"
+
+
+class TargetChemblIdFilter(FieldValueFilter):
+    field = "target_chembl_id"
+
+
+class ActionTypeFilter(FieldValueFilter):
+    field = "action_type"
+
+
+class MechanismFilter(FieldValueFilter):
+    field = "mechanism_of_action"
+
+
+class TargetContainsFilter(FilterBase):
+    """Keep molecules whose target name contains ``text`` (case-insensitive), e.g. ``"kinase"``."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def mask(self, table: MoleculeTable) -> np.ndarray:
+        index = MoleculeIndexes.of(table).target
+        text = self.text.lower()
+        return _rows_mask(table, index.rows_any(value for value in index if text in value.lower()))
+
+    def to_sql(self) -> tuple[str, tuple]:
+        # Not LIKE: it has wildcards to escape and folds ASCII letters only.
+        # py_lower is str.lower, registered by the SQLite store
+        return "instr(py_lower(target), ?) > 0", (self.text.lower(),)
+
+
+class ATCFilter(FilterBase):
+    """Keep molecules with an ATC classification starting with any of ``prefixes``.
+
+    A prefix can be a code at any ATC level, e.g. ``"L"``, ``"L01"`` or ``"L01EA01"``.
+    """
+
+    def __init__(self, *prefixes: str):
+        self.prefixes = prefixes
+
+    def mask(self, table: MoleculeTable) -> np.ndarray:
+        if all(atc_level(prefix) is not None for prefix in self.prefixes):
+            return _rows_mask(table, MoleculeIndexes.of(table).atc.rows_any(self.prefixes))
+        # Prefixes that are not a whole ATC level (e.g. "L0") are matched by scanning
+        codes = [
+            code
+            for code in np.unique(table.atc_codes).tolist()
+            if table.pool[code].startswith(self.prefixes)
+        ]
+        hits = np.concatenate([[0], np.cumsum(np.isin(table.atc_codes, codes))])
+        offsets = table.atc_offsets
+        return hits[offsets[1:]] > hits[offsets[:-1]]
+
+    def to_sql(self) -> tuple[str, tuple]:
+        if not self.prefixes:
+            return "0", ()
+        # Half-open ranges keep the lookup on the atc_classifications(code) index
+        ranges, params = [], []
+        for prefix in self.prefixes:
+            if not prefix:
+                # Every code starts with ""
+                ranges.append("(code >= ?)")
+                params.append(prefix)
+                continue
+            ranges.append("(code >= ? AND code < ?)")
+            params.extend([prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)])
+        ranges = " OR ".join(ranges)
+        return (
+            f"id IN (SELECT molecule_id FROM atc_classifications WHERE {ranges})",
+            tuple(params),
         )
 
 
+class DescriptorRangeFilter(FilterBase):
+    """Keep molecules whose ``descriptor`` lies within ``[minimum, maximum]``.
+
+    Either bound may be omitted. The comparison runs on the stored descriptor column,
+    so molecules are never parsed; molecules without a structure are dropped.
+    """
+
+    descriptor: str
+
+    def __init__(self, minimum: float | None = None, maximum: float | None = None):
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def mask(self, table: MoleculeTable) -> np.ndarray:
+        return descriptors.in_range(table, self.descriptor, self.minimum, self.maximum)
+
+
+class HeavyAtomFilter(DescriptorRangeFilter):
+    descriptor = "heavy_atoms"
+
+
+class MolecularWeightFilter(DescriptorRangeFilter):
+    descriptor = "molecular_weight"
+
+
+class LogPFilter(DescriptorRangeFilter):
+    descriptor = "clogp"
+
+
+class TPSAFilter(DescriptorRangeFilter):
+    descriptor = "tpsa"
+
+
+class HBondDonorFilter(DescriptorRangeFilter):
+    descriptor = "hbd"
+
+
+class HBondAcceptorFilter(DescriptorRangeFilter):
+    descriptor = "hba"
+
+
+class RotatableBondFilter(DescriptorRangeFilter):
+    descriptor = "rotatable_bonds"
+
+
+class RingCountFilter(DescriptorRangeFilter):
+    descriptor = "rings"
+
+
+class LipinskiFilter(FilterBase):
+    """Keep molecules breaking at most ``max_violations`` of Lipinski's rule of five."""
+
+    def __init__(self, max_violations: int = 1):
+        self.max_violations = max_violations
+
+    def mask(self, table: MoleculeTable) -> np.ndarray:
+        violations = descriptors.lipinski_violations(table)
+        return (violations >= 0) & (violations <= self.max_violations)
+
+
+class VeberFilter(FilterBase):
+    """Keep molecules with at most 10 rotatable bonds and a TPSA of at most 140."""
+
+    def mask(self, table: MoleculeTable) -> np.ndarray:
+        return descriptors.veber(table)
+
+
 FILTERS = [MissingTargetFilter()]
@@ -1,11 +1,16 @@
+import numpy as np
 from pydantic import Field
 
 from chemcards.database.core import MoleculeEntry
-from chemcards.flashcards.core import FlashCardBase, FlashCardGeneratorBase
-import random
+from chemcards.flashcards.core import FlashCardBase, FlashCardGeneratorBase, MoleculeFieldCardsBase
+from chemcards.flashcards.sampling import DistinctSampler
 from abc import abstractmethod
 from typing import Optional, Union
-from chemcards.database.cheminformatics import FUNCTIONAL_GROUPS, FunctionalGroup
+from chemcards.database.cheminformatics import (
+    FUNCTIONAL_GROUPS,
+    FunctionalGroup,
+    FunctionalGroupDatabase,
+)
 
 
 class MultipleChoice(FlashCardBase):
@@ -31,48 +36,88 @@ class MultipleChoiceGeneratorBase(FlashCardGeneratorBase):
         pass
 
 
-class MultipleChoiceMoleculeToTargetGenerator(MultipleChoiceGeneratorBase):
+class MoleculeFieldGeneratorBase(MultipleChoiceGeneratorBase, MoleculeFieldCardsBase):
+    """Questions whose choices are the ``field`` values of distinct molecules.
 
-    name = "Multiple Choice - Molecule to Target"
+    No two choices show the same value: see :class:`DistinctSampler`. Every
+    molecule with a known value is a card, keyed by the molecule's name.
+    """
+
+    @abstractmethod
+    def question(
+        self, molecules: list[MoleculeEntry], choices: list[str], correct: int
+    ) -> MultipleChoice:
+        pass
+
+    def _question(self, row: int | None = None) -> MultipleChoice:
+        items, values, correct = self.sampler.sample(4, self.random, item=row)
+        return self.question([self.molecule_db.molecules[row] for row in items], values, correct)
 
     def next(self) -> MultipleChoice:
-        example_molecules = random.sample(self.molecule_db.molecules, 4)
-        correct = random.randint(0, 3)
+        return self._question()
+
+    def next_batch(self, n: int) -> list[MultipleChoice]:
+        molecules = self.molecule_db.molecules
+        return [
+            self.question([molecules[row] for row in items], values, correct)
+            for items, values, correct in self.sampler.sample_batch(n, 4, self.rng)
+        ]
+
+
+class MultipleChoiceMoleculeToTargetGenerator(MoleculeFieldGeneratorBase):
+
+    name = "Multiple Choice - Molecule to Target"
+    field = "target"
+
+    def question(self, example_molecules, choices, correct) -> MultipleChoice:
         return MultipleChoice(
             question="What is the target of this molecule?",
             display=example_molecules[correct],
-            choices=[mol.target for mol in example_molecules],
+            choices=choices,
+            answer_index=correct,
+            answer_molecule=example_molecules[correct],
+        )
+
+
+class MultipleChoiceMoleculeToMechanismGenerator(MoleculeFieldGeneratorBase):
+
+    name = "Multiple Choice - Molecule to Mechanism"
+    field = "mechanism_of_action"
+
+    def question(self, example_molecules, choices, correct) -> MultipleChoice:
+        return MultipleChoice(
+            question="What is the mechanism of action of this molecule?",
+            display=example_molecules[correct],
+            choices=choices,
             answer_index=correct,
             answer_molecule=example_molecules[correct],
         )
 
 
-class MultipleChoiceMoleculeToNameGenerator(FlashCardGeneratorBase):
+class MultipleChoiceMoleculeToNameGenerator(MoleculeFieldGeneratorBase):
 
     name = "Multiple Choice - Molecule to Name"
+    field = "name"
 
-    def next(self) -> MultipleChoice:
-        example_molecules = random.sample(self.molecule_db.molecules, 4)
-        correct = random.randint(0, 3)
+    def question(self, example_molecules, choices, correct) -> MultipleChoice:
         return MultipleChoice(
             question="What is the name of this molecule?",
             display=example_molecules[correct],
-            choices=[mol.name for mol in example_molecules],
+            choices=choices,
             answer_index=correct,
             answer_molecule=example_molecules[correct],
         )
 
 
-class MultipleChoiceNameToMoleculeGenerator(FlashCardGeneratorBase):
+class MultipleChoiceNameToMoleculeGenerator(MoleculeFieldGeneratorBase):
 
     name = "Multiple Choice - Name to Molecule"
+    field = "name"
 
-    def next(self) -> MultipleChoice:
-        example_molecules = random.sample(self.molecule_db.molecules, 4)
-        correct = random.randint(0, 3)
+    def question(self, example_molecules, choices, correct) -> MultipleChoice:
         return MultipleChoice(
             question=f"Which of these molecules is {example_molecules[correct].name}?",
-            choices=[mol for mol in example_molecules],
+            choices=example_molecules,
             answer_index=correct,
             answer_molecule=example_molecules[correct],
         )
@@ -82,18 +127,125 @@ class MultipleChoiceMoleculeToFunctionalGroupNameGenerator(FlashCardGeneratorBas
 
     name = "Multiple Choice - Functional Group (SMARTS) to Name"
 
-    def next(self) -> MultipleChoice:
-        # Sample functional groups directly from the project's functional_groups.yaml
-        # Be robust if the data file has fewer than 4 entries
-        sample_count = min(4, len(FUNCTIONAL_GROUPS))
-        example_fgs = random.sample(FUNCTIONAL_GROUPS, sample_count)
-        correct = random.randrange(sample_count)
-        chosen = example_fgs[correct]
+    def __init__(self, molecule_db, filters=(), seed=None):
+        super().__init__(molecule_db, filters, seed)
+        self.sampler = DistinctSampler.from_values([fg.name for fg in FUNCTIONAL_GROUPS])
+
+    def _question(self, item: int | None = None) -> MultipleChoice:
+        # Functional groups come straight from the project's functional_groups.yaml
+        items, choices, correct = self.sampler.sample(4, self.random, item=item)
         # Ask which name corresponds to the SMARTS pattern; display the functional group as a molecule
         return MultipleChoice(
             question=f"What is the name of this functional group?",
-            display=chosen,
-            choices=[fg.name for fg in example_fgs],
+            display=FUNCTIONAL_GROUPS[items[correct]],
+            choices=choices,
             answer_index=correct,
             answer_molecule=None,
         )
+
+    def next(self) -> MultipleChoice:
+        return self._question()
+
+    def card_keys(self) -> list[str]:
+        return list(dict.fromkeys(fg.name for fg in FUNCTIONAL_GROUPS))
+
+    def card(self, key: str) -> MultipleChoice:
+        for i, fg in enumerate(FUNCTIONAL_GROUPS):
+            if fg.name == key:
+                return self._question(i)
+        raise KeyError(key)
+
+
+class MultipleChoiceMostSpecificFunctionalGroupGenerator(FlashCardGeneratorBase):
+    """Which of a molecule's functional groups is the most specific?
+
+    The answer is a group with parents in the functional group hierarchy (e.g.
+    ester, whose parent is ether) and the distractors are its ancestors, present in
+    the molecule but less specific, then related groups absent from it.
+    """
+
+    name = "Multiple Choice - Most Specific Functional Group"
+
+    def __init__(self, molecule_db, filters=(), seed=None):
+        super().__init__(molecule_db, filters, seed)
+        self.functional_groups = FunctionalGroupDatabase.from_moleculedb(self.molecule_db)
+        hierarchy = self.functional_groups.hierarchy
+        self.answers = [
+            i
+            for i in range(len(hierarchy))
+            if hierarchy.parents[i] and len(self.functional_groups.molecules_with(i))
+        ]
+
+    def next(self) -> MultipleChoice:
+        if not self.answers:
+            raise ValueError("No molecule contains a functional group with a parent group")
+        fgs = self.functional_groups
+        hierarchy = fgs.hierarchy
+        answer = self.random.choice(self.answers)
+        row = int(self.random.choice(fgs.molecules_with(answer)))
+        present = {fgs.group_index(fg) for fg in fgs.groups_of(row)}
+
+        ancestors = hierarchy.ancestors(answer)
+        relatives = {j for i in ancestors for j in hierarchy.descendants(i)}
+        more_specific = [i for i in hierarchy.descendants(answer) if i not in present]
+        related = [i for i in sorted(relatives) if i not in present and i != answer]
+        others = [i for i in range(len(fgs.groups)) if i not in present and i not in relatives]
+        distractors = []
+        for candidates in (ancestors, more_specific, related, others):
+            candidates = [i for i in candidates if i not in distractors]
+            self.random.shuffle(candidates)
+            distractors.extend(candidates[: 3 - len(distractors)])
+
+        choices = [answer, *distractors]
+        self.random.shuffle(choices)
+        molecule = fgs.annotated(row)
+        return MultipleChoice(
+            question="Which of these is the most specific functional group in this molecule?",
+            display=molecule,
+            choices=[fgs.groups[i].name for i in choices],
+            answer_index=choices.index(answer),
+            answer_molecule=molecule,
+        )
+
+
+class MultipleChoiceScaffoldFamilyGenerator(FlashCardGeneratorBase):
+    """Pick a molecule by name among near misses from its own scaffold family.
+
+    Distractors share the answer's Murcko scaffold where possible, then its generic
+    framework, and only then are drawn at random.
+    """
+
+    name = "Multiple Choice - Scaffold Family"
+
+    def __init__(self, molecule_db, filters=(), seed=None):
+        super().__init__(molecule_db, filters, seed)
+        families = [rows for _, rows in self.molecule_db.indexes.scaffold.groups()]
+        # Only molecules with at least one near miss
+        self.answers = np.concatenate(
+            [rows for rows in families if len(rows) >= 2] or [np.zeros(0, dtype=np.intp)]
+        )
+
+    def next(self) -> MultipleChoice:
+        if not len(self.answers):
+            raise ValueError("No two molecules share a scaffold")
+        indexes = self.molecule_db.indexes
+        answer = int(self.random.choice(self.answers))
+        count = min(4, len(self.molecule_db))
+        rows = [answer]
+        for family in (indexes.scaffold.family(answer), indexes.framework.family(answer)):
+            candidates = [row for row in family.tolist() if row not in rows]
+            rows.extend(self.random.sample(candidates, min(count - len(rows), len(candidates))))
+        while len(rows) < count:
+            row = self.random.randrange(len(self.molecule_db))
+            if row not in rows:
+                rows.append(row)
+
+        self.random.shuffle(rows)
+        molecules = [self.molecule_db.molecules[row] for row in rows]
+        correct = rows.index(answer)
+        return MultipleChoice(
+            question=f"Which of these molecules is {molecules[correct].name}?",
+            choices=molecules,
+            answer_index=correct,
+            answer_molecule=molecules[correct],
+        )
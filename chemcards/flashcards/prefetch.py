@@ -0,0 +1,159 @@
+"""Questions generated ahead of time on a background thread.
+
+A :class:`PrefetchQueue` keeps up to ``depth`` questions ready: a worker thread
+tops the queue up with ``next_batch`` and runs ``prepare`` on each question (e.g.
+rendering its molecule images), so taking the next question is a dequeue. A
+question that is not ready yet is waited for and counted as a miss.
+
+Generators that lease cards (a scheduling :class:`~chemcards.flashcards.scheduling.Deck`)
+get the cards of unused questions back when the queue is closed.
+"""
+import logging
+import queue
+import threading
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+from pydantic import BaseModel
+
+from chemcards.flashcards.core import FlashCardBase
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEPTH = 8
+# How long the worker waits before asking a generator that had nothing to give again
+IDLE_WAIT = 0.05
+
+
+class Prefetched(NamedTuple):
+    question: FlashCardBase
+    # Whatever ``prepare`` returned for the question
+    prepared: Any
+
+
+class PrefetchStats(BaseModel):
+    depth: int = 0  # questions ready now
+    capacity: int = 0
+    hits: int = 0
+    misses: int = 0
+    generated: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class _Failure(NamedTuple):
+    error: BaseException
+
+
+class PrefetchQueue:
+    def __init__(
+        self,
+        generator,
+        depth: int = DEFAULT_DEPTH,
+        prepare: Callable[[FlashCardBase], Any] | None = None,
+    ):
+        self.generator = generator
+        self.capacity = depth
+        self.prepare = prepare
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="question-prefetch", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def stats(self) -> PrefetchStats:
+        return PrefetchStats(
+            depth=self.depth,
+            capacity=self.capacity,
+            hits=self.hits,
+            misses=self.misses,
+            generated=self.generated,
+        )
+
+    def get(self) -> Prefetched:
+        """The next question and its prepared payload."""
+        try:
+            item = self._queue.get_nowait()
+            self.hits += 1
+        except queue.Empty:
+            self.misses += 1
+            while True:
+                if not self._thread.is_alive() and self._queue.empty():
+                    raise RuntimeError("The prefetch queue is closed")
+                try:
+                    item = self._queue.get(timeout=0.1)
+                    break
+                except queue.Empty:
+                    continue
+        if isinstance(item, _Failure):
+            raise item.error
+        return item
+
+    def next(self) -> FlashCardBase:
+        return self.get().question
+
+    def close(self) -> None:
+        """Stop the worker and hand back the cards of unused questions."""
+        self._stop.set()
+        self._thread.join()
+        unused = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, Prefetched):
+                unused.append(item.question)
+        self._release(unused)
+
+    def _release(self, questions: list) -> None:
+        release = getattr(self.generator, "release", None)
+        keys = [question.card_key for question in questions if question.card_key is not None]
+        if release is not None and keys:
+            release(keys)
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            free = self.capacity - self._queue.qsize()
+            if free <= 0:
+                self._stop.wait(IDLE_WAIT)
+                continue
+            try:
+                questions = self.generator.next_batch(free)
+            except Exception as e:
+                logger.exception("Prefetching questions failed")
+                self._put(_Failure(e))
+                return
+            if not questions:
+                # e.g. every card of a small deck is already queued or being answered
+                self._stop.wait(IDLE_WAIT)
+                continue
+            for i, question in enumerate(questions):
+                try:
+                    prepared = self.prepare(question) if self.prepare is not None else None
+                except Exception:
+                    logger.exception("Preparing a prefetched question failed")
+                    prepared = None
+                if not self._put(Prefetched(question, prepared)):
+                    self._release(questions[i:])
+                    return
+                self.generated += 1
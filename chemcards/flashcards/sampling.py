@@ -0,0 +1,166 @@
+"""Sampling of multiple-choice questions whose choices are all different.
+
+A :class:`DistinctSampler` is built on a ``value -> items`` inverted index (e.g.
+target -> molecules). It draws the answer item uniformly, then distractor
+*values* uniformly among the other values by rejection, and one item per
+distractor value. The answers shown are therefore pairwise distinct and never
+repeat the correct one, and drawing ``k`` distractors takes ``O(k)`` expected time
+while there are at least twice as many values as choices; with fewer values the
+remaining ones are sampled directly. :meth:`DistinctSampler.sample_batch` draws many
+questions at once with the same scheme on whole index arrays, redrawing only the
+rows that came out with a repeated value.
+
+"unknown" is not a meaningful answer and is never drawn, as answer or distractor.
+"""
+import random
+from collections.abc import Sequence
+from typing import NamedTuple
+
+import numpy as np
+
+from chemcards.database.indexes import InvertedIndex
+from chemcards.database.table import StringPool
+
+
+class Sample(NamedTuple):
+    # Item (row) per choice and the value shown for it, pairwise distinct
+    items: list[int]
+    values: list[str]
+    answer_index: int
+
+
+class DistinctSampler:
+    """Draw an item plus distractor items whose values all differ from each other."""
+
+    def __init__(self, index: InvertedIndex, exclude_unknown: bool = True):
+        self.index = index
+        counts = index.counts.tolist()
+        # Code 0 is "unknown" and sorts first
+        skip = exclude_unknown and len(index) and int(index.keys[0]) == 0
+        self._first_value = int(skip)
+        self._first_item = counts[0] if skip else 0
+        # Plain lists: scalar indexing is much faster than on numpy arrays
+        self._items = index.rows_by_key.tolist()
+        self._starts = index.starts.tolist()
+        self._counts = counts
+        self._value_of = np.repeat(np.arange(len(index)), index.counts).tolist()
+        self._values = index.pool.decode(index.keys)
+        self._positions: dict[int, int] | None = None
+        # The same, as arrays for batches
+        self._item_array = index.rows_by_key
+        self._start_array = index.starts
+        self._count_array = index.counts
+        self._value_array = np.repeat(np.arange(len(index)), index.counts)
+        self._value_names = np.array(self._values, dtype=object)
+
+    @classmethod
+    def from_values(cls, values: Sequence[str], exclude_unknown: bool = True) -> "DistinctSampler":
+        """A sampler over items ``0 .. len(values) - 1`` whose values are ``values``."""
+        pool = StringPool()
+        codes = np.asarray(pool.intern_many(list(values)), dtype=np.int32)
+        return cls(InvertedIndex.from_codes(pool, codes), exclude_unknown)
+
+    @property
+    def n_values(self) -> int:
+        """Number of distinct values that can be drawn."""
+        return len(self._values) - self._first_value
+
+    @property
+    def n_items(self) -> int:
+        return len(self._items) - self._first_item
+
+    @property
+    def items(self) -> list[int]:
+        """The items that can be drawn, grouped by value."""
+        return self._items[self._first_item :]
+
+    def _position(self, item: int) -> int:
+        if self._positions is None:
+            self._positions = {item: position for position, item in enumerate(self._items)}
+        position = self._positions.get(item, -1)
+        if position < self._first_item:
+            raise ValueError(f"Item {item} cannot be drawn")
+        return position
+
+    def sample(
+        self, choices: int = 4, rng: random.Random | None = None, item: int | None = None
+    ) -> Sample:
+        """An answer (``item``, or a random one) and up to ``choices - 1`` distractors,
+        in random order.
+
+        Fewer choices are returned when there are fewer distinct values.
+        """
+        rng = rng if rng is not None else random
+        if item is not None:
+            position = self._position(item)
+        elif self.n_items:
+            position = self._first_item + rng.randrange(self.n_items)
+        else:
+            raise ValueError("No items to sample from")
+        answer = self._value_of[position]
+
+        wanted = min(choices, self.n_values)
+        if 2 * wanted <= self.n_values:
+            picked = {answer}
+            values = [answer]
+            while len(values) < wanted:
+                value = self._first_value + rng.randrange(self.n_values)
+                if value not in picked:
+                    picked.add(value)
+                    values.append(value)
+            distractors = values[1:]
+        else:
+            others = [
+                value for value in range(self._first_value, len(self._values)) if value != answer
+            ]
+            distractors = rng.sample(others, wanted - 1)
+
+        items = [
+            self._items[self._starts[value] + rng.randrange(self._counts[value])]
+            for value in distractors
+        ]
+        answer_index = rng.randrange(len(items) + 1)
+        items.insert(answer_index, self._items[position])
+        values = [self._values[value] for value in distractors]
+        values.insert(answer_index, self._values[answer])
+        return Sample(items, values, answer_index)
+
+    def sample_batch(
+        self, n: int, choices: int = 4, rng: np.random.Generator | None = None
+    ) -> list[Sample]:
+        """``n`` independent samples, drawn with array operations."""
+        rng = rng if rng is not None else np.random.default_rng()
+        wanted = min(choices, self.n_values)
+        if not self.n_items:
+            raise ValueError("No items to sample from")
+        if 2 * wanted > self.n_values:
+            python_rng = random.Random(int(rng.integers(1 << 62)))
+            return [self.sample(choices, python_rng) for _ in range(n)]
+
+        positions = self._first_item + rng.integers(self.n_items, size=n)
+        values = np.empty((n, wanted), dtype=np.intp)
+        values[:, 0] = self._value_array[positions]
+        redraw = np.ones(n, dtype=bool)
+        while redraw.any():
+            values[redraw, 1:] = self._first_value + rng.integers(
+                self.n_values, size=(int(redraw.sum()), wanted - 1)
+            )
+            ordered = np.sort(values, axis=1)
+            redraw = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+
+        offsets = (rng.random((n, wanted)) * self._count_array[values]).astype(np.intp)
+        items = self._item_array[self._start_array[values] + offsets]
+        items[:, 0] = self._item_array[positions]
+        # Move the answer from the first column to a random one
+        answer_index = rng.integers(wanted, size=n)
+        rows = np.arange(n)
+        for array in (items, values):
+            swapped = array[rows, answer_index]
+            array[rows, answer_index] = array[:, 0]
+            array[:, 0] = swapped
+        return [
+            Sample(row_items, row_values, correct)
+            for row_items, row_values, correct in zip(
+                items.tolist(), self._value_names[values].tolist(), answer_index.tolist()
+            )
+        ]
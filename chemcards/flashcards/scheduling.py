@@ -0,0 +1,428 @@
+"""Spaced-repetition scheduling of flashcards.
+
+A :class:`Deck` schedules the cards of a generator (any generator implementing
+``card_keys()`` and ``card(key)``) with the SM-2 algorithm: each answer is rated
+from :attr:`Rating.AGAIN` to :attr:`Rating.EASY`, a correct answer multiplies the
+card's interval by its ease factor, and a wrong one brings it back after
+``RELEARN_SECONDS`` with a lower ease.
+
+Cards sit in a heap ordered by due time, so the next card is found in
+``O(log n)``: reviewing a card pushes its new due time and leaves the old heap
+entry behind, to be discarded when it reaches the top. Cards never reviewed are
+due when the deck is opened, in random order, after any overdue reviews; when
+nothing is due the earliest card comes next.
+
+Card states and the review log are kept in a SQLite :class:`ReviewStore`. Reviews
+are handed to a background thread that writes them in batches, one transaction
+per batch, so answering a card never waits for the disk.
+"""
+import atexit
+import heapq
+import logging
+import queue
+import random
+import sqlite3
+import threading
+import time
+from enum import IntEnum
+from pathlib import Path
+from typing import NamedTuple
+
+from chemcards.database.resources import REVIEW_DATABASE
+from chemcards.flashcards.core import FlashCardBase, FlashCardGeneratorBase
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+RELEARN_SECONDS = 10 * 60
+INITIAL_EASE = 2.5
+MINIMUM_EASE = 1.3
+# The background writer commits this many reviews at once ...
+WRITE_BATCH = 256
+# ... or whatever it has after waiting this long (seconds)
+FLUSH_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    due REAL NOT NULL,
+    interval REAL NOT NULL,
+    ease REAL NOT NULL,
+    reps INTEGER NOT NULL,
+    lapses INTEGER NOT NULL,
+    PRIMARY KEY (source, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reviews (
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    reviewed_at REAL NOT NULL,
+    rating INTEGER NOT NULL,
+    interval REAL NOT NULL
+);
+"""
+
+
+class Rating(IntEnum):
+    AGAIN = 1
+    HARD = 2
+    GOOD = 3
+    EASY = 4
+
+
+# SM-2 response quality (0-5) of each rating
+QUALITY = {Rating.AGAIN: 1, Rating.HARD: 3, Rating.GOOD: 4, Rating.EASY: 5}
+
+
+class CardState(NamedTuple):
+    due: float  # Unix time
+    interval: float  # days
+    ease: float
+    reps: int  # correct answers in a row
+    lapses: int
+
+    @property
+    def new(self) -> bool:
+        return self.reps == 0 and self.lapses == 0
+
+
+NEW_CARD = CardState(0.0, 0.0, INITIAL_EASE, 0, 0)
+
+
+def sm2(state: CardState, rating: Rating, now: float) -> CardState:
+    """The state of a card after answering it with ``rating`` at ``now``."""
+    quality = QUALITY[Rating(rating)]
+    ease = max(
+        MINIMUM_EASE, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    )
+    if quality < 3:
+        return CardState(now + RELEARN_SECONDS, 0.0, ease, 0, state.lapses + 1)
+    reps = state.reps + 1
+    if reps == 1:
+        interval = 1.0
+    elif reps == 2:
+        interval = 6.0
+    else:
+        interval = state.interval * ease
+    return CardState(now + interval * DAY, interval, ease, reps, state.lapses)
+
+
+class Review(NamedTuple):
+    source: str
+    key: str
+    reviewed_at: float
+    rating: Rating
+    state: CardState
+
+
+class ReviewStore:
+    """Card states and review log, written in batches by a background thread.
+
+    With ``path=None`` (or when the database cannot be opened) nothing persists.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = REVIEW_DATABASE,
+        batch_size: int = WRITE_BATCH,
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        self.path = Path(path) if path is not None else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batches = 0  # transactions committed by the writer
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._disk_failed = False
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self.path is None or self._disk_failed:
+            return None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode = WAL")
+            with connection:
+                connection.executescript(SCHEMA)
+            return connection
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Reviews will not be saved, cannot open %s: %s", self.path, e)
+            self._disk_failed = True
+            return None
+
+    def load(self, source: str) -> dict[str, CardState]:
+        """The stored state of every reviewed card of ``source``."""
+        self.flush()
+        connection = self._connect()
+        if connection is None:
+            return {}
+        try:
+            rows = connection.execute(
+                "SELECT key, due, interval, ease, reps, lapses FROM cards WHERE source = ?",
+                (source,),
+            )
+            return {key: CardState(*state) for key, *state in rows}
+        finally:
+            connection.close()
+
+    def reviews(self, source: str) -> list[tuple[str, float, Rating, float]]:
+        """The review log of ``source``: key, time, rating and the interval it set."""
+        self.flush()
+        connection = self._connect()
+        if connection is None:
+            return []
+        try:
+            rows = connection.execute(
+                "SELECT key, reviewed_at, rating, interval FROM reviews WHERE source = ? "
+                "ORDER BY rowid",
+                (source,),
+            )
+            return [(key, at, Rating(rating), interval) for key, at, rating, interval in rows]
+        finally:
+            connection.close()
+
+    def record(self, review: Review) -> None:
+        """Queue ``review`` to be written; returns immediately."""
+        if self.path is None or self._disk_failed:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="review-writer", daemon=True
+                )
+                self._thread.start()
+        self._queue.put(review)
+
+    def flush(self) -> None:
+        """Wait until every queued review is written."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self) -> None:
+        connection = self._connect()
+        stop = False
+        while not stop:
+            batch, waiting = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            # Collect a batch until it is full, the interval is up, or someone waits
+            while True:
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiting.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch and connection is not None:
+                self._write(connection, batch)
+            for event in waiting:
+                event.set()
+        if connection is not None:
+            connection.close()
+
+    def _write(self, connection: sqlite3.Connection, batch: list[Review]) -> None:
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO cards (source, key, due, interval, ease, reps, lapses) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(review.source, review.key, *review.state) for review in batch],
+                )
+                connection.executemany(
+                    "INSERT INTO reviews (source, key, reviewed_at, rating, interval) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (review.source, review.key, review.reviewed_at, int(review.rating),
+                         review.state.interval)
+                        for review in batch
+                    ],
+                )
+            self.batches += 1
+        except sqlite3.Error as e:
+            logger.warning("Could not save %d reviews: %s", len(batch), e)
+
+
+_default_store: ReviewStore | None = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> ReviewStore:
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ReviewStore(REVIEW_DATABASE)
+            atexit.register(_default_store.close)
+        return _default_store
+
+
+class Deck:
+    """The cards of ``source`` in the order they are due for review.
+
+    ``next()`` and ``next_batch()`` ask about the cards due first and lease them:
+    a leased card is not asked again until it is reviewed or released, so
+    questions generated ahead of time (see :mod:`chemcards.flashcards.prefetch`)
+    never repeat a card. ``review()`` rates an answer. Decks are thread-safe.
+
+    New cards come in a random order drawn from ``rng``, by default the source's
+    own stream, so a seeded source gives the same deck every time.
+    """
+
+    def __init__(
+        self,
+        source: FlashCardGeneratorBase,
+        store: ReviewStore | None = None,
+        now: float | None = None,
+        rng: random.Random | None = None,
+    ):
+        self.source = source
+        self.name = source.name
+        self.store = store if store is not None else default_store()
+        now = time.time() if now is None else now
+        rng = rng if rng is not None else source.random
+
+        self.keys = source.card_keys()
+        self._index = {key: i for i, key in enumerate(self.keys)}
+        stored = self.store.load(self.name)
+        self.states = [stored.get(key, NEW_CARD) for key in self.keys]
+        # Heap of (due, order, card, version); an entry is stale once the card's
+        # version has moved on
+        self._versions = [0] * len(self.keys)
+        order = list(range(len(self.keys)))
+        rng.shuffle(order)
+        self._heap = [
+            (state.due if not state.new else now, order[i], i, 0)
+            for i, state in enumerate(self.states)
+        ]
+        heapq.heapify(self._heap)
+        self._order = len(self.keys)
+        # Heap entries of the cards handed out and not yet reviewed
+        self._leased: dict[int, tuple] = {}
+        # State of each reviewed card before its last review, to rate that review again
+        self._before: dict[int, CardState] = {}
+        self._lock = threading.RLock()
+        self.current: str | None = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _top(self) -> tuple | None:
+        heap, versions = self._heap, self._versions
+        while heap and heap[0][3] != versions[heap[0][2]]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def next_key(self) -> str:
+        """The key of the card due first, without leasing it."""
+        with self._lock:
+            top = self._top()
+            if top is None:
+                raise ValueError(f"{self.name} has no cards left to ask")
+            return self.keys[top[2]]
+
+    def due(self, now: float | None = None) -> int:
+        """Number of cards due at ``now`` (leased ones included), in ``O(n)``."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = [*self._heap, *self._leased.values()]
+            return sum(
+                1 for due, _, card, version in entries if version == self._versions[card] and due <= now
+            )
+
+    def lease(self, n: int) -> list[str]:
+        """The keys of the next ``n`` cards (fewer if the rest are leased), leasing them."""
+        with self._lock:
+            keys = []
+            while len(keys) < n:
+                top = self._top()
+                if top is None:
+                    break
+                heapq.heappop(self._heap)
+                self._leased[top[2]] = top
+                keys.append(self.keys[top[2]])
+            return keys
+
+    def release(self, keys) -> None:
+        """Return leased cards that were not reviewed to their place in the queue."""
+        with self._lock:
+            for key in keys:
+                entry = self._leased.pop(self._index[key], None)
+                if entry is not None:
+                    heapq.heappush(self._heap, entry)
+
+    def _card(self, key: str) -> FlashCardBase:
+        card = self.source.card(key)
+        if isinstance(card, FlashCardBase):
+            card.card_key = key
+        return card
+
+    def next(self) -> FlashCardBase:
+        with self._lock:
+            keys = self.lease(1)
+            if not keys:
+                # Every card was skipped: offer them again
+                self.release(list(self.keys[card] for card in self._leased))
+                keys = self.lease(1)
+            if not keys:
+                raise ValueError(f"{self.name} has no cards")
+            self.current = keys[0]
+        return self._card(self.current)
+
+    def next_batch(self, n: int) -> list[FlashCardBase]:
+        """Questions about the next ``n`` cards not leased yet (possibly fewer)."""
+        return [self._card(key) for key in self.lease(n)]
+
+    def review(
+        self,
+        rating: Rating | bool,
+        key: str | None = None,
+        now: float | None = None,
+        replace: bool = False,
+    ) -> CardState:
+        """Rate the answer to ``key`` (the last card asked by :meth:`next` by default).
+
+        ``True`` and ``False`` stand for :attr:`Rating.GOOD` and :attr:`Rating.AGAIN`.
+        With ``replace``, ``rating`` overrides the card's last review instead of
+        adding one, e.g. for an answer graded wrong that the user shows was right;
+        the review log keeps both ratings.
+        """
+        key = key if key is not None else self.current
+        if key is None:
+            raise ValueError("No card to review")
+        if isinstance(rating, bool):
+            rating = Rating.GOOD if rating else Rating.AGAIN
+        now = time.time() if now is None else now
+        card = self._index[key]
+        with self._lock:
+            self._leased.pop(card, None)
+            if not replace or card not in self._before:
+                self._before[card] = self.states[card]
+            state = self.states[card] = sm2(self._before[card], rating, now)
+            self._versions[card] += 1
+            self._order += 1
+            heapq.heappush(self._heap, (state.due, self._order, card, self._versions[card]))
+            # Rebuild once stale entries dominate, so the heap stays O(n)
+            if len(self._heap) > 2 * len(self.keys) + 64:
+                self._heap = [
+                    entry for entry in self._heap if entry[3] == self._versions[entry[2]]
+                ]
+                heapq.heapify(self._heap)
+        self.store.record(Review(self.name, key, now, Rating(rating), state))
+        return state
@@ -5,9 +5,15 @@ import ttkbootstrap as tb
 from chemcards.gui.core import WindowOptions, FontDefaults
 from chemcards.gui.quizwindow import (
     MultipleChoiceMoleculeToTargetQuiz,
+    MultipleChoiceMoleculeToMechanismQuiz,
     MultipleChoiceMoleculeToNameQuiz,
     MultipleChoiceNameToMoleculeQuiz,
     MultipleChoiceMoleculeToFunctionalGroupNameQuiz,
+    MultipleChoiceMostSpecificFunctionalGroupQuiz,
+    MultipleChoiceScaffoldFamilyQuiz,
+    FillInTheBlankMoleculeToNameQuiz,
+    FillInTheBlankMoleculeToTargetQuiz,
+    FillInTheBlankMoleculeToMechanismQuiz,
 )
 from functools import partial
 
@@ -15,9 +21,15 @@ QUIZZES = {
     quiz.name: quiz
     for quiz in [
         MultipleChoiceMoleculeToTargetQuiz,
+        MultipleChoiceMoleculeToMechanismQuiz,
         MultipleChoiceMoleculeToNameQuiz,
         MultipleChoiceNameToMoleculeQuiz,
         MultipleChoiceMoleculeToFunctionalGroupNameQuiz,
+        MultipleChoiceMostSpecificFunctionalGroupQuiz,
+        MultipleChoiceScaffoldFamilyQuiz,
+        FillInTheBlankMoleculeToNameQuiz,
+        FillInTheBlankMoleculeToTargetQuiz,
+        FillInTheBlankMoleculeToMechanismQuiz,
     ]
 }
 
@@ -24,6 +24,12 @@ class MoleculeViz:
     def img_path(self) -> Path:
         return TEMP_DIR / f"{self.molecule.name}.png"
 
+    def render(self, height=400, width=400) -> Image.Image:
+        """The molecule drawn in memory, without a temporary file, so it can be
+        rendered off the Tk thread (e.g. while prefetching questions)."""
+        img = Draw.MolToImage(self.molecule.to_rdkit(), size=(800, 800))
+        return img.resize((height, width))
+
     def get_image(
         self,
         height=400,
@@ -42,16 +48,15 @@ class MoleculeViz:
             raise NotImplementedError
 
         if highlight_functional_group:
-            if highlight_functional_group.match(self.molecule):
+            # Find the atoms to highlight
+            atoms = highlight_functional_group.match_atoms(mol)
+            if atoms:
                 # Set Draw Options
                 dopts = Draw.rdMolDraw2D.MolDrawOptions()
                 dopts.setHighlightColour(HIGHLIGHT_COLORS[0])
                 dopts.highlightBondWidthMultiplier = 16
 
-                # Find the atoms to highlight
-                highlight = [
-                    mol.GetSubstructMatch(highlight_functional_group.to_rdkit())
-                ]
+                highlight = [atoms]
 
                 # Draw the molecules
                 img = Draw.MolsToGridImage(
@@ -1,24 +1,38 @@
+import logging
 import tkinter as tk
 from abc import abstractmethod
 
 import ttkbootstrap as tb
+from PIL import ImageTk
 
 from chemcards.database.core import MoleculeDB
 from chemcards.flashcards.core import (
     FlashCardGeneratorBase,
 )
 from chemcards.flashcards.filters import MissingTargetFilter
+from chemcards.flashcards.fillintheblank import (
+    FillInTheBlankGeneratorBase,
+    FillInTheBlankMoleculeToMechanismGenerator,
+    FillInTheBlankMoleculeToNameGenerator,
+    FillInTheBlankMoleculeToTargetGenerator,
+)
 from chemcards.flashcards.multiplechoice import (
     MultipleChoiceGeneratorBase,
     MultipleChoiceMoleculeToTargetGenerator,
+    MultipleChoiceMoleculeToMechanismGenerator,
     MultipleChoiceMoleculeToNameGenerator,
     MultipleChoiceNameToMoleculeGenerator,
-    MultipleChoiceMoleculeToFunctionalGroupNameGenerator
-
+    MultipleChoiceMoleculeToFunctionalGroupNameGenerator,
+    MultipleChoiceMostSpecificFunctionalGroupGenerator,
+    MultipleChoiceScaffoldFamilyGenerator,
 )
+from chemcards.flashcards.prefetch import PrefetchQueue
+from chemcards.flashcards.scheduling import Deck
 from chemcards.gui.core import WindowOptions, FontDefaults
 from chemcards.gui.molecules import MoleculeViz, MoleculeWindow
 
+logger = logging.getLogger(__name__)
+
 
 class MultipleChoiceQuizBase:
     name = "Quiz Base"
@@ -43,9 +57,15 @@ class MultipleChoiceQuizBase:
 
         self.molecule_database: MoleculeDB = MoleculeDB.load()
 
-        self.question_generator: MultipleChoiceGeneratorBase = (
-            self.get_question_generator()
-        )
+        generator = self.get_question_generator()
+        try:
+            # Quizzes over a fixed set of cards are spaced-repetition decks
+            self.question_generator: MultipleChoiceGeneratorBase | Deck = Deck(generator)
+        except NotImplementedError:
+            self.question_generator = generator
+        self.answered = False
+        # Questions and their images are prepared ahead on a worker thread
+        self.prefetch = PrefetchQueue(self.question_generator, prepare=self.prepare_question)
 
         self.make_frames()
 
@@ -57,6 +77,11 @@ class MultipleChoiceQuizBase:
     def get_question_generator(self) -> MultipleChoiceGeneratorBase:
         pass
 
+    @abstractmethod
+    def prepare_question(self, question) -> list:
+        """The PIL images of ``question``; runs on the prefetch thread."""
+        pass
+
     def add_check_answer_button(self):
         # Check Answer
         check_answer_button = tb.Button(
@@ -74,9 +99,16 @@ class MultipleChoiceQuizBase:
         self.option_buttons[self.current_question.answer_index].configure(
             bootstyle="success.Outline.Toolbutton"
         )
+        if self.answered:
+            return
+        self.answered = True
         self.total_number_of_questions += 1
-        if option_selected == self.current_question.answer:
+        correct = option_selected == self.current_question.answer_index
+        if correct:
             self.correct += 1
+        if isinstance(self.question_generator, Deck):
+            # Prefetched questions are leased, not asked with Deck.next(): name the card
+            self.question_generator.review(correct, key=self.current_question.card_key)
 
     def add_next_button(self):
         next_button = tb.Button(
@@ -135,7 +167,15 @@ class MultipleChoiceQuizBase:
         self.add_molecule_info_button()
 
     def next_question(self):
-        self.current_question = self.question_generator.next()
+        previous = getattr(self, "current_question", None)
+        if previous is not None and not self.answered and isinstance(self.question_generator, Deck):
+            # Skipped: the card goes back to its place in the queue
+            self.question_generator.release([previous.card_key])
+        self.current_question, self.current_images = self.prefetch.get()
+        if self.current_images is None:
+            # Preparing failed on the worker; try again here
+            self.current_images = self.prepare_question(self.current_question)
+        self.answered = False
         self.display_question()
 
     def destroy_buttons(self):
@@ -147,6 +187,8 @@ class MultipleChoiceQuizBase:
         self.next_question()
 
     def end(self):
+        self.prefetch.close()
+        logger.debug("Question prefetch: %s", self.prefetch.stats)
         self.destroy_buttons()
         report = tb.Label(
             self.frame,
@@ -166,6 +208,9 @@ class MultipleChoiceQuizBase:
 class MultipleChoiceTextToImageQuizBase(MultipleChoiceQuizBase):
     name = "Multiple Choice (Text to Image) Quiz Base"
 
+    def prepare_question(self, question) -> list:
+        return [MoleculeViz(choice).render(250, 250) for choice in question.choices]
+
     def make_frames(self):
         self.title_frame = tb.Frame(self.frame)
         self.title_frame.grid(row=0, pady=self.window_options.between)
@@ -227,8 +272,7 @@ class MultipleChoiceTextToImageQuizBase(MultipleChoiceQuizBase):
 
         self.option_selected.set(0)
         for i, choice in enumerate(self.current_question.choices):
-            mviz = MoleculeViz(choice)
-            img = mviz.get_image(250, 250)
+            img = ImageTk.PhotoImage(self.current_images[i])
 
             # I don't understand why but both of these lines are neccessary
             self.option_buttons[i].image = img
@@ -242,6 +286,11 @@ class MultipleChoiceTextToImageQuizBase(MultipleChoiceQuizBase):
 class MultipleChoiceImageToTextQuizBase(MultipleChoiceQuizBase):
     name = "Multiple Choice (Image to Text) Quiz Base"
 
+    def prepare_question(self, question) -> list:
+        if not question.display:
+            return []
+        return [MoleculeViz(question.display).render()]
+
     def make_frames(self):
         self.title_frame = tb.Frame(self.frame)
         self.title_frame.grid(row=0, columnspan=4, pady=self.window_options.between)
@@ -315,7 +364,7 @@ class MultipleChoiceImageToTextQuizBase(MultipleChoiceQuizBase):
 
         if self.current_question.display:
 
-            img = MoleculeViz(self.current_question.display).get_image()
+            img = ImageTk.PhotoImage(self.current_images[0])
 
             # I don't understand why but both of these lines are neccessary
             self.display_panel.image = img
@@ -335,6 +384,13 @@ class MultipleChoiceMoleculeToTargetQuiz(MultipleChoiceImageToTextQuizBase):
         return MultipleChoiceMoleculeToTargetGenerator(self.molecule_database)
 
 
+class MultipleChoiceMoleculeToMechanismQuiz(MultipleChoiceImageToTextQuizBase):
+    name = MultipleChoiceMoleculeToMechanismGenerator.name
+
+    def get_question_generator(self) -> FlashCardGeneratorBase:
+        return MultipleChoiceMoleculeToMechanismGenerator(self.molecule_database)
+
+
 class MultipleChoiceMoleculeToNameQuiz(MultipleChoiceImageToTextQuizBase):
     name = MultipleChoiceMoleculeToNameGenerator.name
 
@@ -352,4 +408,123 @@ class MultipleChoiceMoleculeToFunctionalGroupNameQuiz(MultipleChoiceImageToTextQ
     name = MultipleChoiceMoleculeToFunctionalGroupNameGenerator.name
 
     def get_question_generator(self) -> FlashCardGeneratorBase:
-        return MultipleChoiceMoleculeToFunctionalGroupNameGenerator(self.molecule_database)
\ No newline at end of file
+        return MultipleChoiceMoleculeToFunctionalGroupNameGenerator(self.molecule_database)
+
+
+class MultipleChoiceMostSpecificFunctionalGroupQuiz(MultipleChoiceImageToTextQuizBase):
+    name = MultipleChoiceMostSpecificFunctionalGroupGenerator.name
+
+    def get_question_generator(self) -> FlashCardGeneratorBase:
+        return MultipleChoiceMostSpecificFunctionalGroupGenerator(self.molecule_database)
+
+
+class MultipleChoiceScaffoldFamilyQuiz(MultipleChoiceTextToImageQuizBase):
+    name = MultipleChoiceScaffoldFamilyGenerator.name
+
+    def get_question_generator(self) -> FlashCardGeneratorBase:
+        return MultipleChoiceScaffoldFamilyGenerator(self.molecule_database)
+
+
+class FillInTheBlankQuizBase(MultipleChoiceImageToTextQuizBase):
+    """Type the answer. A guess graded wrong can be counted as right, which also
+    accepts it as a variant of the answer from now on."""
+
+    name = "Fill in the Blank Quiz Base"
+
+    @property
+    def generator(self) -> FillInTheBlankGeneratorBase:
+        if isinstance(self.question_generator, Deck):
+            return self.question_generator.source
+        return self.question_generator
+
+    def _make_buttons(self):
+        self.question_label = tb.Label(
+            self.title_frame,
+            text="",
+            font=FontDefaults.title(),
+            bootstyle="primary",
+        )
+        self.question_label.pack(anchor="w", side="top")
+
+        self.display_panel = tb.Label(self.display_frame)
+        self.display_panel.pack(anchor="center", padx=self.window_options.between, pady=self.window_options.between)
+
+        self.answer_entry = tb.Entry(self.question_frame, width=40)
+        self.answer_entry.pack(pady=self.window_options.between)
+        self.answer_entry.bind("<Return>", lambda event: self.check_answer())
+
+        self.feedback_label = tb.Label(self.question_frame, text="", wraplength=400)
+        self.feedback_label.pack(pady=self.window_options.between)
+
+        self.accept_button = tb.Button(
+            self.question_frame,
+            text="My Answer Was Right",
+            bootstyle="secondary",
+            command=self.accept_answer,
+        )
+
+    def display_question(self):
+        self.question_label.configure(text=self.current_question.question)
+        img = ImageTk.PhotoImage(self.current_images[0])
+        self.display_panel.image = img
+        self.display_panel.configure(image=img)
+        self.answer_entry.delete(0, tk.END)
+        self.answer_entry.focus_set()
+        self.feedback_label.configure(text="")
+        self.accept_button.pack_forget()
+
+    def check_answer(self):
+        if self.answered:
+            return
+        self.guess = self.answer_entry.get()
+        grade = self.generator.grade(self.current_question, self.guess)
+        answer = self.current_question.answer
+        if grade.correct:
+            text = "Correct!" if grade.distance == 0 else f"Correct! (It is spelled {answer})"
+            self.feedback_label.configure(text=text, bootstyle="success")
+        else:
+            text = f"The answer is {answer}"
+            if grade.closest is not None:
+                text += f" (your answer looks like {grade.closest})"
+            self.feedback_label.configure(text=text, bootstyle="danger")
+            if self.guess.strip():
+                self.accept_button.pack(pady=self.window_options.between)
+        self.answered = True
+        self.total_number_of_questions += 1
+        self.correct += grade.correct
+        if isinstance(self.question_generator, Deck):
+            self.question_generator.review(grade.correct, key=self.current_question.card_key)
+
+    def accept_answer(self):
+        self.generator.accept(self.current_question, self.guess)
+        self.correct += 1
+        if isinstance(self.question_generator, Deck):
+            # The card was rated wrong when checked: rate that answer again
+            self.question_generator.review(
+                True, key=self.current_question.card_key, replace=True
+            )
+        self.feedback_label.configure(
+            text=f"{self.guess} now counts as {self.current_question.answer}", bootstyle="success"
+        )
+        self.accept_button.pack_forget()
+
+
+class FillInTheBlankMoleculeToNameQuiz(FillInTheBlankQuizBase):
+    name = FillInTheBlankMoleculeToNameGenerator.name
+
+    def get_question_generator(self) -> FlashCardGeneratorBase:
+        return FillInTheBlankMoleculeToNameGenerator(self.molecule_database)
+
+
+class FillInTheBlankMoleculeToTargetQuiz(FillInTheBlankQuizBase):
+    name = FillInTheBlankMoleculeToTargetGenerator.name
+
+    def get_question_generator(self) -> FlashCardGeneratorBase:
+        return FillInTheBlankMoleculeToTargetGenerator(self.molecule_database)
+
+
+class FillInTheBlankMoleculeToMechanismQuiz(FillInTheBlankQuizBase):
+    name = FillInTheBlankMoleculeToMechanismGenerator.name
+
+    def get_question_generator(self) -> FlashCardGeneratorBase:
+        return FillInTheBlankMoleculeToMechanismGenerator(self.molecule_database)
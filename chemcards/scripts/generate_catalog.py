@@ -12,7 +12,14 @@ from pathlib import Path
 from itertools import groupby
 import json
 import logging
+
+import numpy as np
+
+from chemcards.database import descriptors
 from chemcards.database.core import MoleculeDB
+from chemcards.database.matching import compile_smarts, match_bonds
+from chemcards.database.screening import FingerprintScreen
+from chemcards.database.molcache import get_mol
 
 try:
     from rdkit import Chem
@@ -203,7 +210,7 @@ def _load_functional_groups(yaml_path: Path):
         category = item.get("category") or "uncategorized"
         smarts = item.get("smarts")
         if smarts:
-            patt = Chem.MolFromSmarts(smarts) if Chem else None
+            patt = compile_smarts(smarts) if Chem else None
             if patt:
                 groups.append(
                     {
@@ -229,48 +236,46 @@ def _load_functional_group_examples(yaml_path: Path):
     examples = []
     missing = 0
 
-    candidate_molecules = []
-    for molecule in molecule_db.molecules:
-        rmol = molecule.to_rdkit()
-        if not rmol:
-            continue
-        heavy_atoms = rmol.GetNumHeavyAtoms()
-        if MIN_HEAVY_ATOMS <= heavy_atoms <= MAX_HEAVY_ATOMS:
-            candidate_molecules.append((molecule, rmol))
+    # Heavy atoms come from the descriptor column, so only the examples are parsed
+    candidate_rows = np.flatnonzero(
+        descriptors.in_range(molecule_db.table, "heavy_atoms", MIN_HEAVY_ATOMS, MAX_HEAVY_ATOMS)
+    )
 
     logging.info(
         "Functional-group example candidates after heavy-atom prefilter (%d-%d): %d",
         MIN_HEAVY_ATOMS,
         MAX_HEAVY_ATOMS,
-        len(candidate_molecules),
+        len(candidate_rows),
     )
 
-    for fg in groups:
-        pattern = fg["pattern"]
-        match_entry = None
-        for molecule, rmol in candidate_molecules:
-            if rmol.HasSubstructMatch(pattern):
-                highlight_atoms = rmol.GetSubstructMatch(pattern)
-                if highlight_atoms:
-                    highlight_bonds = []
-                    for bond in pattern.GetBonds():
-                        begin = highlight_atoms[bond.GetBeginAtomIdx()]
-                        end = highlight_atoms[bond.GetEndAtomIdx()]
-                        match_bond = rmol.GetBondBetweenAtoms(begin, end)
-                        if match_bond is not None:
-                            highlight_bonds.append(match_bond.GetIdx())
-
-                    match_entry = {
-                        "name": fg["name"],
-                        "category": fg["category"],
-                        "smarts": fg["smarts"],
-                        "mol": rmol,
-                        "highlight_atoms": highlight_atoms,
-                        "highlight_bonds": tuple(highlight_bonds),
-                        "example_name": molecule.name,
-                    }
-                    break
+    # The first candidate containing each group; the fingerprint screen skips most
+    # candidates that cannot contain it without running a substructure match
+    screen = FingerprintScreen.of(molecule_db.table)
+    found = {}
+    for i, fg in enumerate(groups):
+        rows = screen.search(fg["smarts"], rows=candidate_rows, limit=1)
+        if not len(rows):
+            continue
+        molecule = molecule_db.molecules[int(rows[0])]
+        rmol = molecule.to_rdkit()
+        highlight_atoms = rmol.GetSubstructMatch(fg["pattern"])
+        found[i] = {
+            "name": fg["name"],
+            "category": fg["category"],
+            "smarts": fg["smarts"],
+            "mol": rmol,
+            "highlight_atoms": highlight_atoms,
+            "highlight_bonds": match_bonds(rmol, fg["pattern"], highlight_atoms),
+            "example_name": molecule.name,
+        }
+    logging.info(
+        "Fingerprint screen ruled out %d molecules, %d substructure matches run",
+        screen.screened,
+        screen.verified,
+    )
 
+    for i, fg in enumerate(groups):
+        match_entry = found.get(i)
         if match_entry is None:
             missing += 1
             logging.warning("No example molecule found for functional group: %s", fg["name"])
@@ -295,7 +300,7 @@ def _load_approved_drugs(json_path: Path):
         smiles = entry.get("canonical_smiles") or entry.get("smiles")
         name = entry.get("pref_name") or entry.get("molecule_chembl_id") or "unknown"
         if smiles:
-            mol = Chem.MolFromSmiles(smiles) if Chem else None
+            mol = get_mol(smiles) if Chem else None
             if mol:
                 drugs.append({"name": name, "mol": mol})
     return drugs
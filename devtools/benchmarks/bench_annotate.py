@@ -0,0 +1,49 @@
+"""Scaling of functional group annotation with the number of worker processes.
+
+Annotates a synthetic database of ``--molecules`` molecules (the shipped database's
+SMILES, repeated) with 1, 2, 4, ... up to ``--processes`` workers and checks that
+every run produces the same bit matrix.
+
+    python devtools/benchmarks/bench_annotate.py --molecules 100000 --processes 8
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from chemcards.database.cheminformatics import FUNCTIONAL_GROUPS
+from chemcards.database.core import MoleculeDB
+from chemcards.database.matching import annotate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--molecules", type=int, default=100_000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    shipped = MoleculeDB.load().table.column("smiles")
+    smiles = [shipped[i % len(shipped)] for i in range(args.molecules)]
+    print(f"{len(smiles)} molecules x {len(FUNCTIONAL_GROUPS)} groups, {os.cpu_count()} cores")
+
+    counts = sorted({1, *(2**k for k in range(1, 8) if 2**k < args.processes), args.processes})
+    reference = None
+    baseline = None
+    for processes in counts:
+        start = time.perf_counter()
+        result = annotate(smiles, FUNCTIONAL_GROUPS, processes=processes)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference, baseline = result, elapsed
+        identical = np.array_equal(result.bits, reference.bits) and np.array_equal(
+            result.parsed, reference.parsed
+        )
+        print(
+            f"{processes:>3} processes: {elapsed:6.2f} s  "
+            f"speedup {baseline / elapsed:4.1f}x  identical={identical}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Latency of grading typed answers, and of accepting a new variant.
+
+Grades the answers of the shipped database's name, target and mechanism cards
+typed exactly, with one and two typos and completely wrong, then times adding a
+variant to the index against rebuilding the index.
+
+    python devtools/benchmarks/bench_answers.py
+"""
+import random
+import time
+
+from chemcards.database.core import MoleculeDB
+from chemcards.flashcards.answers import SynonymIndex, SynonymStore
+from chemcards.flashcards.fillintheblank import (
+    FillInTheBlankMoleculeToMechanismGenerator,
+    FillInTheBlankMoleculeToNameGenerator,
+    FillInTheBlankMoleculeToTargetGenerator,
+)
+
+QUESTIONS = 2000
+
+
+def typo(text: str, rng: random.Random) -> str:
+    i = rng.randrange(len(text))
+    edit = rng.randrange(3)
+    if edit == 0:
+        return text[:i] + text[i + 1 :]
+    if edit == 1:
+        return text[:i] + rng.choice("aeiou") + text[i:]
+    return text[:i] + text[i + 1 : i + 2] + text[i : i + 1] + text[i + 2 :]
+
+
+def main():
+    db = MoleculeDB.load()
+    rng = random.Random(0)
+    guesses = {
+        "exact": lambda answer: answer.lower(),
+        "1 typo": lambda answer: typo(answer, rng),
+        "2 typos": lambda answer: typo(typo(answer, rng), rng),
+        "wrong": lambda answer: "paracetamol",
+    }
+    for generator_type in (
+        FillInTheBlankMoleculeToNameGenerator,
+        FillInTheBlankMoleculeToTargetGenerator,
+        FillInTheBlankMoleculeToMechanismGenerator,
+    ):
+        start = time.perf_counter()
+        generator = generator_type(db, seed=0, store=SynonymStore(None))
+        build_ms = (time.perf_counter() - start) * 1000
+        cards = [generator.next() for _ in range(QUESTIONS)]
+        results = []
+        for label, guess in guesses.items():
+            typed = [guess(card.answer) for card in cards]
+            start = time.perf_counter()
+            grades = [generator.grade(card, text) for card, text in zip(cards, typed)]
+            us = (time.perf_counter() - start) / QUESTIONS * 1e6
+            results.append(f"{label} {us:6.1f} µs ({sum(g.correct for g in grades) / QUESTIONS:4.0%})")
+        print(f"{generator.field:>19}: {len(generator.synonyms)} variants, built in "
+              f"{build_ms:.0f} ms; " + ", ".join(results))
+
+    index = generator.synonyms
+    answers = list(index.answers)
+    start = time.perf_counter()
+    for i in range(1000):
+        index.add(f"variant {i}", answers[i % len(answers)])
+    add_us = (time.perf_counter() - start) / 1000 * 1e6
+    start = time.perf_counter()
+    SynonymIndex.from_answers(answers)
+    rebuild_ms = (time.perf_counter() - start) * 1000
+    print(f"Accepting a variant: {add_us:.1f} µs; rebuilding the index: {rebuild_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Descriptor range filters against parsing every molecule.
+
+Times the catalog's heavy-atom prefilter the old way (parse each molecule and count
+its heavy atoms) and on the stored descriptor column, then times the range and
+drug-likeness filters on the shipped database and on a synthetic database of
+``--molecules`` rows (the shipped descriptors, repeated).
+
+    python devtools/benchmarks/bench_descriptors.py --molecules 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from chemcards.database import descriptors
+from chemcards.database.core import MoleculeDB
+from chemcards.flashcards.filters import (
+    HeavyAtomFilter,
+    LipinskiFilter,
+    LogPFilter,
+    TPSAFilter,
+    VeberFilter,
+)
+from chemcards.scripts.generate_catalog import MAX_HEAVY_ATOMS, MIN_HEAVY_ATOMS
+
+FILTERS = [
+    HeavyAtomFilter(MIN_HEAVY_ATOMS, MAX_HEAVY_ATOMS),
+    LogPFilter(-1, 3),
+    TPSAFilter(maximum=90),
+    LipinskiFilter(0),
+    VeberFilter(),
+]
+
+
+def timed(function, repeat: int = 1):
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--molecules", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    db = MoleculeDB.load()
+    table = db.table
+
+    def parsed():
+        return [
+            row
+            for row, molecule in enumerate(db.molecules)
+            if (mol := molecule.to_rdkit()) is not None
+            and MIN_HEAVY_ATOMS <= mol.GetNumHeavyAtoms() <= MAX_HEAVY_ATOMS
+        ]
+
+    def column():
+        return np.flatnonzero(
+            descriptors.in_range(table, "heavy_atoms", MIN_HEAVY_ATOMS, MAX_HEAVY_ATOMS)
+        )
+
+    old, old_ms = timed(parsed)
+    new, new_ms = timed(column, repeat=100)
+    print(f"{len(db)} molecules, heavy-atom prefilter: parsing {old_ms:8.2f} ms, "
+          f"column {new_ms:.3f} ms, identical={np.array_equal(old, new)}")
+
+    repeats = -(-args.molecules // len(db))
+    large = db.take(np.tile(np.arange(len(db)), repeats)[: args.molecules])
+    for filter in FILTERS:
+        kept, small_ms = timed(lambda: filter(db), repeat=20)
+        # The mask alone: building a million-row MoleculeDB would dominate the timing
+        _, large_ms = timed(lambda: filter.mask(large.table))
+        print(f"{type(filter).__name__:>16}: {len(kept):>5} kept, {small_ms:6.3f} ms; "
+              f"mask over {len(large)} rows {large_ms:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
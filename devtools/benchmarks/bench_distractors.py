@@ -0,0 +1,46 @@
+"""Distinct-answer question sampling against drawing four random molecules.
+
+For every field question (target, mechanism, name) on the shipped database, counts
+how often four random molecules show a repeated answer, then draws ``--questions``
+samples with :class:`DistinctSampler`, checks every one has distinct answers and
+reports the time per question.
+
+    python devtools/benchmarks/bench_distractors.py --questions 1000000
+"""
+import argparse
+import random
+import time
+
+from chemcards.database.core import MoleculeDB
+from chemcards.flashcards.filters import MissingTargetFilter
+from chemcards.flashcards.sampling import DistinctSampler
+
+FIELDS = ("target", "mechanism_of_action", "name")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    db = MissingTargetFilter()(MoleculeDB.load())
+    rng = random.Random(0)
+    for field in FIELDS:
+        column = db.table.column(field)
+        naive = sum(
+            len({column[row] for row in rng.sample(range(len(db)), 4)}) < 4 for _ in range(10_000)
+        )
+
+        sampler = DistinctSampler(db.indexes.field(field))
+        repeated = 0
+        start = time.perf_counter()
+        for _ in range(args.questions):
+            repeated += len(set(sampler.sample(4, rng).values)) < 4
+        elapsed = time.perf_counter() - start
+        print(f"{field:>20}: {sampler.n_values:>5} values; random molecules repeat an answer "
+              f"in {naive / 100:5.1f}% of questions, sampler in {repeated} of "
+              f"{args.questions} ({elapsed / args.questions * 1e6:.2f} us/question)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Deck export: time and memory against the number of cards.
+
+Exports ``--cards`` target questions (and a quarter and half as many) from the
+shipped database to an Anki package, and reports the time, the structures drawn
+and the peak Python memory of each run. Drawing dominates and is bounded by the
+number of distinct structures, not of cards; ``--processes`` spreads it over cores.
+
+    python devtools/benchmarks/bench_export.py --cards 10000 --processes 4
+"""
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from chemcards.database.core import MoleculeDB
+from chemcards.flashcards.export import export
+from chemcards.flashcards.multiplechoice import MultipleChoiceMoleculeToTargetGenerator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cards", type=int, default=10_000)
+    parser.add_argument("--processes", type=int, default=1)
+    args = parser.parse_args()
+
+    db = MoleculeDB.load()
+    with tempfile.TemporaryDirectory() as directory:
+        for cards in (args.cards // 4, args.cards // 2, args.cards):
+            generator = MultipleChoiceMoleculeToTargetGenerator(db, seed=0)
+            path = Path(directory) / f"deck{cards}.apkg"
+            tracemalloc.start()
+            stats = export(generator.stream(cards), path, processes=args.processes)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{cards:>6} questions: {stats.notes} notes, {stats.rendered} structures drawn, "
+                  f"{stats.images} images, {stats.seconds:6.2f} s "
+                  f"({stats.seconds / cards * 1000:.2f} ms/card), peak {peak / 2**20:5.1f} MiB, "
+                  f"{path.stat().st_size / 2**20:.1f} MiB package")
+
+
+if __name__ == "__main__":
+    main()
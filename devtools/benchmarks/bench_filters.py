@@ -0,0 +1,70 @@
+"""Stacked filters as one expression against applying them one after the other.
+
+Times one to five stacked filters the old way (each filter builds the database the
+next one filters) and as a single expression (one mask, one row selection), cold
+and with the masks memoized, on the shipped database and on a synthetic database of
+``--molecules`` rows (the shipped molecules, repeated).
+
+    python devtools/benchmarks/bench_filters.py --molecules 200000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from chemcards.database.core import MoleculeDB
+from chemcards.flashcards.core import AndFilter
+from chemcards.flashcards.filters import (
+    ActionTypeFilter,
+    HeavyAtomFilter,
+    LipinskiFilter,
+    MissingTargetFilter,
+    TPSAFilter,
+)
+
+FILTERS = [
+    MissingTargetFilter(),
+    ActionTypeFilter("INHIBITOR", "ANTAGONIST", "AGONIST"),
+    HeavyAtomFilter(8, 60),
+    TPSAFilter(maximum=140),
+    LipinskiFilter(1),
+]
+
+
+def timed(function, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def sequential(db, filters):
+    for f in filters:
+        db = f(db)
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--molecules", type=int, default=200_000)
+    args = parser.parse_args()
+
+    shipped = MoleculeDB.load()
+    repeats = -(-args.molecules // len(shipped))
+    large = shipped.take(np.tile(np.arange(len(shipped)), repeats)[: args.molecules])
+    for db in (shipped, large):
+        print(f"{len(db)} molecules")
+        for n in range(1, len(FILTERS) + 1):
+            filters = FILTERS[:n]
+            # Fresh snapshots so that neither side reuses masks or indexes of the other
+            old, old_ms = timed(lambda: sequential(db.take(np.arange(len(db))), filters))
+            fresh = db.take(np.arange(len(db)))
+            new, cold_ms = timed(lambda: AndFilter(*filters).apply(fresh))
+            _, warm_ms = timed(lambda: AndFilter(*filters).apply(fresh), repeat=20)
+            same = list(old.table.records()) == list(new.table.records())
+            print(f"  {n} filters: sequential {old_ms:8.2f} ms, expression cold {cold_ms:8.2f} ms, "
+                  f"memoized {warm_ms:6.2f} ms, {len(new)} kept, identical={same}")
+
+
+if __name__ == "__main__":
+    main()
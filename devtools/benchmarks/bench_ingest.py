@@ -0,0 +1,77 @@
+"""Peak memory and time of ingesting a ChEMBL molecule download.
+
+Compares the previous ``json.load`` + list-of-entries ingestion with the streaming
+parser on a synthetic download of ``--entries`` molecules.
+
+    python devtools/benchmarks/bench_ingest.py --entries 50000
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from chemcards.database.services.chembl import ChemblDB, ChemblMoleculeEntry
+from chemcards.database.services.streaming import write_json_array
+
+
+def synthetic_entry(i: int) -> dict:
+    # Roughly the size and shape of a real ChEMBL molecule record
+    return {
+        "pref_name": f"DRUG {i}",
+        "molecule_chembl_id": f"CHEMBL{i}",
+        "max_phase": "4.0",
+        "molecule_structures": {
+            "canonical_smiles": "CC(=O)Oc1ccccc1C(=O)O" + "C" * (i % 17),
+            "molfile": "\n".join("    0.0000    0.0000    0.0000 C   0  0" for _ in range(20)),
+            "standard_inchi": "InChI=1S/" + "C" * 40,
+            "standard_inchi_key": "BSYNRYMUTXBXSQ-UHFFFAOYSA-N",
+        },
+        "molecule_properties": {f"property_{k}": k * 1.5 for k in range(25)},
+        "molecule_synonyms": [
+            {"molecule_synonym": f"synonym {k}", "syn_type": "OTHER"} for k in range(5)
+        ],
+        "usan_stem_definition": "target" if i % 3 else None,
+        "atc_classifications": ["N02BA01"] if i % 2 else [],
+    }
+
+
+def previous_from_download(path: Path) -> ChemblDB:
+    """The previous implementation: the whole file, then two more full lists."""
+    with open(path, "r") as f:
+        molecule_list = json.load(f)
+    raw_converted = [ChemblMoleculeEntry.from_download(entry) for entry in molecule_list]
+    converted_molecules = [mol for mol in raw_converted if mol is not None]
+    return ChemblDB(molecules=converted_molecules)
+
+
+def measure(function, path: Path) -> tuple[int, float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    db = function(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(db), elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "chembl_approved_drugs.json"
+        write_json_array(path, (synthetic_entry(i) for i in range(args.entries)))
+        print(f"download: {args.entries} entries, {path.stat().st_size / 2**20:.1f} MB")
+        for label, function in [
+            ("json.load", previous_from_download),
+            ("streaming", ChemblDB.from_download),
+        ]:
+            count, elapsed, peak = measure(function, path)
+            print(f"{label:>10}: {count} molecules in {elapsed:.2f} s, peak {peak:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
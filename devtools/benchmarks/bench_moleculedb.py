@@ -0,0 +1,97 @@
+"""Benchmark the columnar MoleculeDB against a list of pydantic MoleculeEntry objects.
+
+Reports load time, filter time and resident memory on the shipped database and on a
+synthetic copy scaled up by ``--scale`` (default 100x).
+
+    python devtools/benchmarks/bench_moleculedb.py --scale 100
+"""
+import argparse
+import gc
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from chemcards.database import binary
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.database.resources import MOLECULE_DATABASE
+from chemcards.flashcards.filters import MissingTargetFilter
+
+
+class ListMoleculeDB(BaseModel):
+    """The previous representation: one validated model per molecule."""
+
+    molecules: list[MoleculeEntry]
+    last_updated: str | None = None
+
+
+def synthetic_json(scale: int) -> str:
+    data = json.loads(MOLECULE_DATABASE.read_text())
+    molecules = []
+    for copy in range(scale):
+        for molecule in data["molecules"]:
+            molecules.append({**molecule, "name": f"{molecule['name']}-{copy}"})
+    return json.dumps({"molecules": molecules, "last_updated": data["last_updated"]})
+
+
+def timed(func, repeat: int = 3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def measure_memory(func):
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, result
+
+
+def run(label: str, payload: str):
+    list_load, list_db = timed(lambda: ListMoleculeDB.model_validate_json(payload))
+    columnar_load, columnar_db = timed(lambda: MoleculeDB.model_validate_json(payload))
+
+    list_filter, _ = timed(
+        lambda: ListMoleculeDB(
+            molecules=[m for m in list_db.molecules if m.target != "unknown"]
+        )
+    )
+    columnar_filter, _ = timed(lambda: MissingTargetFilter()(columnar_db))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = binary.write_table(columnar_db.table, Path(tmp) / "bench.ccdb")
+        mapped_load, _ = timed(lambda: binary.read_table(path))
+
+    del list_db, columnar_db
+    list_mem, list_db = measure_memory(lambda: ListMoleculeDB.model_validate_json(payload))
+    del list_db
+    columnar_mem, columnar_db = measure_memory(lambda: MoleculeDB.model_validate_json(payload))
+
+    print(f"== {label}: {len(columnar_db)} molecules")
+    print(f"{'':12}{'list':>14}{'columnar':>14}")
+    print(f"{'load':12}{list_load * 1e3:>12.1f}ms{columnar_load * 1e3:>12.1f}ms")
+    print(f"{'mmap open':12}{'':>14}{mapped_load * 1e3:>12.2f}ms")
+    print(f"{'filter':12}{list_filter * 1e3:>12.2f}ms{columnar_filter * 1e3:>12.2f}ms")
+    print(f"{'memory':12}{list_mem / 2**20:>12.1f}MB{columnar_mem / 2**20:>12.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", type=int, default=100)
+    args = parser.parse_args()
+
+    run("shipped", MOLECULE_DATABASE.read_text())
+    run(f"synthetic x{args.scale}", synthetic_json(args.scale))
+
+
+if __name__ == "__main__":
+    main()
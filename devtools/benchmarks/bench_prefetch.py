@@ -0,0 +1,65 @@
+"""Question generation in bulk and the cost of "Next" with a prefetch queue.
+
+Times ``next()`` one question at a time against ``next_batch(n)`` on the shipped
+database, then simulates a quiz: each "Next" either generates and renders the
+question on the spot, or takes it from a :class:`PrefetchQueue` that rendered it
+while the (simulated) user was answering.
+
+    python devtools/benchmarks/bench_prefetch.py --questions 20000 --think 0.2
+"""
+import argparse
+import time
+
+from rdkit.Chem import Draw
+
+from chemcards.database.core import MoleculeDB
+from chemcards.flashcards.filters import MissingTargetFilter
+from chemcards.flashcards.multiplechoice import MultipleChoiceMoleculeToTargetGenerator
+from chemcards.flashcards.prefetch import PrefetchQueue
+
+
+def render(question):
+    # What the quiz does to show a molecule-to-text question
+    return Draw.MolToImage(question.display.to_rdkit(), size=(800, 800)).resize((400, 400))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=20_000)
+    parser.add_argument("--clicks", type=int, default=20)
+    parser.add_argument("--think", type=float, default=0.2, help="Seconds per answer.")
+    args = parser.parse_args()
+
+    db = MissingTargetFilter()(MoleculeDB.load())
+    generator = MultipleChoiceMoleculeToTargetGenerator(db)
+
+    start = time.perf_counter()
+    for _ in range(args.questions):
+        generator.next()
+    single = (time.perf_counter() - start) / args.questions * 1e6
+    start = time.perf_counter()
+    generator.next_batch(args.questions)
+    batch = (time.perf_counter() - start) / args.questions * 1e6
+    print(f"{args.questions} questions: next() {single:.1f} us each, next_batch {batch:.1f} us each")
+
+    start = time.perf_counter()
+    for _ in range(args.clicks):
+        render(generator.next())
+    synchronous = (time.perf_counter() - start) / args.clicks * 1000
+
+    prefetch = PrefetchQueue(generator, prepare=render)
+    latencies = []
+    for _ in range(args.clicks):
+        time.sleep(args.think)
+        start = time.perf_counter()
+        prefetch.get()
+        latencies.append(time.perf_counter() - start)
+    prefetch.close()
+    stats = prefetch.stats
+    print(f"Next: {synchronous:.2f} ms generating and rendering on click, "
+          f"{sum(latencies) / len(latencies) * 1000:.3f} ms from the prefetch queue "
+          f"(hit rate {stats.hit_rate:.0%}, {stats.generated} prepared)")
+
+
+if __name__ == "__main__":
+    main()
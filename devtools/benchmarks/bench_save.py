@@ -0,0 +1,70 @@
+"""Compare the journaled MoleculeDB.save() with a full JSON rewrite.
+
+Saves a single new molecule into the shipped database and into a synthetic copy
+scaled up by ``--scale``.
+
+    python devtools/benchmarks/bench_save.py --scale 100
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.database.resources import MOLECULE_DATABASE
+
+sys.path.insert(0, str(Path(__file__).parent))
+from bench_moleculedb import synthetic_json  # noqa: E402
+
+
+def full_rewrite(db: MoleculeDB, path: Path) -> None:
+    """The previous save(): load everything, merge in memory, rewrite the file in place."""
+    with open(path, "r") as f:
+        existing = MoleculeDB.model_validate_json(f.read())
+    merged = db.update(existing)
+    with open(path, "w") as f:
+        f.write(merged.model_dump_json())
+
+
+def run(label: str, payload: str, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "molecule_database.json"
+        path.write_text(payload)
+        MoleculeDB.load(path)  # build the binary sidecar once
+
+        rewrite = journaled = 0.0
+        for i in range(repeat):
+            change = MoleculeDB(molecules=[MoleculeEntry(name=f"new drug {i}", smiles="CCO")])
+
+            start = time.perf_counter()
+            full_rewrite(change, path)
+            rewrite += time.perf_counter() - start
+
+        path.write_text(payload)
+        MoleculeDB.load(path)
+        for i in range(repeat):
+            change = MoleculeDB(molecules=[MoleculeEntry(name=f"new drug {i}", smiles="CCO")])
+
+            start = time.perf_counter()
+            change.save(path)
+            journaled += time.perf_counter() - start
+
+        n = len(MoleculeDB.load(path))
+    print(f"== {label}: {n} molecules, {repeat} single-molecule saves")
+    print(f"full rewrite  {rewrite / repeat * 1e3:>10.2f} ms/save")
+    print(f"journaled     {journaled / repeat * 1e3:>10.2f} ms/save")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    run("shipped", MOLECULE_DATABASE.read_text(), args.repeat)
+    run(f"synthetic x{args.scale}", synthetic_json(args.scale), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
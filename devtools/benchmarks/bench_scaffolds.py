@@ -0,0 +1,67 @@
+"""Build and query times of the Murcko scaffold index.
+
+Times, on the shipped database:
+
+- a cold build, decomposing every molecule,
+- a warm build from the persisted structure index (a new database snapshot),
+- an incremental build after ``--new`` molecules were added to the database,
+  where only those are decomposed,
+- "molecules sharing this scaffold" lookups.
+
+    python devtools/benchmarks/bench_scaffolds.py --new 100
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from chemcards.database.core import MoleculeDB
+from chemcards.database.identity import StructureIndex, index_path
+from chemcards.database.indexes import ScaffoldIndex
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--new", type=int, default=100)
+    args = parser.parse_args()
+
+    db = MoleculeDB.load()
+    table = db.table
+    old, new = table.take(np.arange(len(table) - args.new)), table
+    print(f"{len(table)} molecules")
+
+    index, cold = timed(lambda: ScaffoldIndex(table, structures=StructureIndex()))
+    print(f"cold build:         {cold:8.3f} s  ({len(index)} scaffolds)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Path(tmp) / "molecules.json"
+        structures = StructureIndex()
+        ScaffoldIndex(old, structures=structures)
+        structures.save(database, old.column("smiles"))
+        print(f"persisted keys:     {index_path(database).stat().st_size / 1024:8.0f} KiB")
+
+        def warm(snapshot):
+            structures = StructureIndex()
+            structures.load(database)
+            return ScaffoldIndex(snapshot, structures=structures)
+
+        _, elapsed = timed(lambda: warm(old))
+        print(f"warm build:         {elapsed:8.3f} s")
+        _, elapsed = timed(lambda: warm(new))
+        print(f"after +{args.new} molecules: {elapsed:8.3f} s")
+
+    rows = np.random.default_rng(0).integers(len(table), size=10_000).tolist()
+    _, elapsed = timed(lambda: [index.family(row) for row in rows])
+    print(f"family lookup:      {elapsed / len(rows) * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Latency of picking and reviewing cards in a large spaced-repetition deck.
+
+Builds a deck of ``--cards`` cards (half of them already reviewed, with due times
+spread over a year), then times ``next_key`` + ``review`` against a linear scan
+for the earliest due card, and reports how the background writer batched the
+review log.
+
+    python devtools/benchmarks/bench_scheduler.py --cards 100000
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from chemcards.flashcards.core import FlashCardGeneratorBase
+from chemcards.flashcards.scheduling import DAY, Deck, Rating, ReviewStore
+
+
+class Cards(FlashCardGeneratorBase):
+    name = "benchmark"
+
+    def __init__(self, n):
+        super().__init__(None)
+        self.n = n
+
+    def next(self):
+        raise NotImplementedError
+
+    def card_keys(self):
+        return [f"card {i}" for i in range(self.n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--reviews", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ReviewStore(Path(tmp) / "reviews.sqlite")
+        deck = Deck(Cards(args.cards), store, now=0.0, rng=rng)
+        for key in rng.sample(deck.keys, args.cards // 2):
+            deck.review(Rating.GOOD, key, now=rng.uniform(-365, 0) * DAY)
+        store.flush()
+
+        start = time.perf_counter()
+        deck = Deck(Cards(args.cards), store, now=0.0, rng=rng)
+        print(f"{args.cards} cards, deck opened in {time.perf_counter() - start:.3f} s")
+
+        batches = store.batches
+        start = time.perf_counter()
+        for i in range(args.reviews):
+            key = deck.next_key()
+            deck.review(rng.random() < 0.8, key, now=float(i))
+        heap_us = (time.perf_counter() - start) / args.reviews * 1e6
+
+        start = time.perf_counter()
+        for _ in range(100):
+            min(range(len(deck)), key=lambda card: deck.states[card].due)
+        scan_us = (time.perf_counter() - start) / 100 * 1e6
+        print(f"next + review: {heap_us:.1f} us (heap) vs {scan_us:.0f} us to scan for the next card")
+
+        start = time.perf_counter()
+        store.close()
+        print(f"{args.reviews} reviews written in {store.batches - batches} transactions, "
+              f"{time.perf_counter() - start:.3f} s left to write at exit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Fraction of substructure matches avoided by the pattern fingerprint screen.
+
+Searches the shipped database for every functional group twice, once by matching
+every molecule and once through :class:`FingerprintScreen`, checks that both find
+the same molecules and reports how many ``HasSubstructMatch`` calls the screen
+saved.
+
+    python devtools/benchmarks/bench_screen.py
+"""
+import argparse
+import time
+
+from chemcards.database.cheminformatics import FUNCTIONAL_GROUPS
+from chemcards.database.core import MoleculeDB
+from chemcards.database.matching import compile_smarts
+from chemcards.database.molcache import get_mol
+from chemcards.database.screening import FingerprintScreen, fingerprints
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.parse_args()
+
+    smiles = MoleculeDB.load().table.column("smiles")
+    mols = [get_mol(value, copy=False) for value in smiles]
+    groups = [group for group in FUNCTIONAL_GROUPS if compile_smarts(group.smarts) is not None]
+    print(f"{len(smiles)} molecules x {len(groups)} groups")
+
+    start = time.perf_counter()
+    expected = []
+    for group in groups:
+        pattern = compile_smarts(group.smarts)
+        expected.append([
+            row
+            for row, mol in enumerate(mols)
+            if mol is not None and mol.HasSubstructMatch(pattern)
+        ])
+    full = time.perf_counter() - start
+
+    start = time.perf_counter()
+    screen = FingerprintScreen(smiles, fingerprints(smiles))
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = [screen.search(group.smarts).tolist() for group in groups]
+    screened = time.perf_counter() - start
+
+    pairs = len(smiles) * len(groups)
+    hits = sum(len(rows) for rows in expected)
+    print(f"exact:            {found == expected}")
+    print(f"true matches:     {hits} of {pairs} pairs ({hits / pairs:.1%})")
+    print(f"matches avoided:  {screen.screened} of {pairs} ({screen.screened / pairs:.1%})")
+    print(f"full matching:    {full:6.3f} s")
+    print(f"screen + verify:  {screened:6.3f} s")
+    print(f"fingerprints:     {build:6.3f} s  ({screen.fingerprints.nbytes / 1024:.0f} KiB, "
+          "computed once and cached per database)")
+    assert found == expected
+
+
+if __name__ == "__main__":
+    main()
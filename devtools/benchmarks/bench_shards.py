@@ -0,0 +1,47 @@
+"""A whole deck generated in shards across processes.
+
+Each worker process rebuilds the generator from the seed and produces its shard of
+the deck; the run is timed against one process, and the shards are checked to
+cover every card exactly once and to match a second run byte for byte.
+
+    python devtools/benchmarks/bench_shards.py --processes 4
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from chemcards.database.core import MoleculeDB
+from chemcards.flashcards.multiplechoice import MultipleChoiceMoleculeToTargetGenerator
+
+SEED = 20260101
+
+
+def shard(index: int, count: int) -> list[str]:
+    generator = MultipleChoiceMoleculeToTargetGenerator(MoleculeDB.load(), seed=SEED)
+    return [question.model_dump_json() for question in generator.deck(index, count)]
+
+
+def run(processes: int) -> tuple[list[list[str]], float]:
+    start = time.perf_counter()
+    with ProcessPoolExecutor(processes) as pool:
+        shards = list(pool.map(shard, range(processes), [processes] * processes))
+    return shards, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    cards = MultipleChoiceMoleculeToTargetGenerator(MoleculeDB.load(), seed=SEED).card_keys()
+    single, single_s = run(1)
+    shards, sharded_s = run(args.processes)
+    questions = [question for questions in shards for question in questions]
+    again, _ = run(args.processes)
+    print(f"{len(cards)} cards: 1 process {single_s:.2f} s, {args.processes} processes "
+          f"{sharded_s:.2f} s, {len(questions)} questions, "
+          f"{len(set(questions))} distinct, reproducible={shards == again}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Latency of Tanimoto nearest-neighbour search over Morgan fingerprints.
+
+Reports single-query latency on the shipped database and on a synthetic database
+of ``--molecules`` fingerprints (the shipped ones, repeated), then times an
+all-vs-all top-k run on the shipped database with 1 and ``--threads`` threads and
+checks both agree.
+
+    python devtools/benchmarks/bench_similarity.py --molecules 1000000 --threads 8
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from chemcards.database.core import MoleculeDB
+from chemcards.database.similarity import SimilarityIndex
+
+
+def single_query_ms(index: SimilarityIndex, queries: np.ndarray, k: int) -> float:
+    index.search(queries[0], k)
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, k)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--molecules", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    db = MoleculeDB.load()
+    start = time.perf_counter()
+    index = SimilarityIndex.of(db.table)
+    print(f"{len(index)} molecules, fingerprints loaded/computed in "
+          f"{time.perf_counter() - start:.3f} s, {os.cpu_count()} cores")
+    rng = np.random.default_rng(0)
+    queries = index.fingerprints[rng.choice(len(index), 100)]
+    print(f"single query, shipped database:    {single_query_ms(index, queries, args.k):8.3f} ms")
+
+    repeats = -(-args.molecules // len(index))
+    large = SimilarityIndex(np.tile(index.fingerprints, (repeats, 1))[: args.molecules])
+    print(f"single query, {len(large):>9} molecules: "
+          f"{single_query_ms(large, queries[:10], args.k):8.3f} ms "
+          f"({large.fingerprints.nbytes / 2**20:.0f} MiB of fingerprints)")
+
+    reference = None
+    for threads in sorted({1, args.threads}):
+        start = time.perf_counter()
+        result = index.all_neighbours(args.k, threads=threads)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = result
+        identical = np.array_equal(result.rows, reference.rows) and np.array_equal(
+            result.scores, reference.scores
+        )
+        print(f"all-vs-all top-{args.k}, {threads:>2} threads: {elapsed:6.3f} s  "
+              f"identical={identical}")
+
+
+if __name__ == "__main__":
+    main()
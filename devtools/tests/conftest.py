@@ -0,0 +1,26 @@
+import pytest
+
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+
+
+@pytest.fixture(scope="session")
+def drug_db():
+    """Factory of databases of ``count`` molecules named ``drug 0``, ``drug 1``, ...
+
+    Molecule ``i`` has the SMILES ``smiles[i % len(smiles)]`` and, with ``targets``,
+    the target ``target {i % targets}``. Other ``fields`` are functions of ``i``;
+    ``extra`` molecules are appended as they are.
+    """
+
+    def make(count, targets=None, smiles=("C",), extra=(), **fields):
+        molecules = []
+        for i in range(count):
+            values = {field: value(i) for field, value in fields.items()}
+            if targets is not None:
+                values["target"] = f"target {i % targets}"
+            molecules.append(
+                MoleculeEntry(name=f"drug {i}", smiles=smiles[i % len(smiles)], **values)
+            )
+        return MoleculeDB(molecules=[*molecules, *extra])
+
+    return make
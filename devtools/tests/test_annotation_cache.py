@@ -0,0 +1,91 @@
+import numpy as np
+
+from chemcards.database.annotation_cache import AnnotationCache
+from chemcards.database.matching import annotate
+
+GROUPS = [
+    {"name": "carboxylic acid", "smarts": "[CX3](=O)[OX2H1]"},
+    {"name": "ester", "smarts": "[#6][CX3](=O)[OX2][#6]"},
+]
+AMINE = {"name": "amine", "smarts": "[NX3;H2,H1;!$(NC=O)]"}
+SMILES = ["CC(=O)Oc1ccccc1C(=O)O", "NCC(=O)O", "not a smiles", "CCO", "NCC(=O)O"]
+
+
+def assert_same(result, expected):
+    assert np.array_equal(result.bits, expected.bits)
+    assert np.array_equal(result.parsed, expected.parsed)
+
+
+class TestAnnotationCache:
+    def test_second_run_is_a_cache_read(self, tmp_path):
+        cache = AnnotationCache(tmp_path / "annotations.sqlite")
+        first = cache.annotate(SMILES, GROUPS)
+        assert cache.matched == 4 * 2  # unique SMILES x groups
+        assert_same(first, annotate(SMILES, GROUPS))
+
+        reopened = AnnotationCache(tmp_path / "annotations.sqlite")
+        assert_same(reopened.annotate(SMILES, GROUPS), first)
+        assert reopened.matched == 0
+
+    def test_new_group_and_molecule_are_matched_incrementally(self, tmp_path):
+        cache = AnnotationCache(tmp_path / "annotations.sqlite")
+        cache.annotate(SMILES, GROUPS)
+        cache.matched = 0
+
+        # Only the new group is matched against the (parseable) known molecules
+        result = cache.annotate(SMILES, [*GROUPS, AMINE])
+        assert cache.matched == 3
+        assert_same(result, annotate(SMILES, [*GROUPS, AMINE]))
+
+        # Only the new molecule is matched, against every group
+        cache.matched = 0
+        smiles = [*SMILES, "CCN"]
+        result = cache.annotate(smiles, [AMINE, *GROUPS])
+        assert cache.matched == 3
+        assert_same(result, annotate(smiles, [AMINE, *GROUPS]))
+
+    def test_without_disk(self):
+        cache = AnnotationCache(None)
+        assert_same(cache.annotate(SMILES, GROUPS), annotate(SMILES, GROUPS))
+
+    def test_fewer_groups_keep_the_stored_bits(self, tmp_path):
+        cache = AnnotationCache(tmp_path / "annotations.sqlite")
+        cache.annotate(["CCO"], [*GROUPS, AMINE])
+        cache.annotate(["NCC(=O)O"], [AMINE])
+        # Writes the amine's molecule again, with a narrower set of groups
+        cache.annotate(["NCC(=O)O"], GROUPS[:1])
+        cache.matched = 0
+        result = cache.annotate(["NCC(=O)O"], [AMINE, GROUPS[0]])
+        assert cache.matched == 0
+        assert_same(result, annotate(["NCC(=O)O"], [AMINE, GROUPS[0]]))
+
+    def test_counts_cover_the_tests_run(self, tmp_path):
+        cache = AnnotationCache(tmp_path / "annotations.sqlite")
+        # Repeated SMILES are matched once
+        expected = annotate(list(dict.fromkeys(SMILES)), GROUPS)
+        first = cache.annotate(SMILES, GROUPS)
+        assert (first.matched, first.pruned) == (expected.matched, expected.pruned)
+        assert first.matched + first.pruned > 0
+        second = cache.annotate(SMILES, GROUPS)
+        assert (second.matched, second.pruned) == (0, 0)
+
+    def test_positions_assigned_concurrently(self, tmp_path):
+        first = AnnotationCache(tmp_path / "annotations.sqlite")
+        second = AnnotationCache(tmp_path / "annotations.sqlite")
+        connection = first._connect()
+
+        statements = []
+
+        def interleave(statement):
+            # The other process assigns its positions between this one's read and write
+            if statements and statements[0].startswith("SELECT key, position"):
+                connection.set_trace_callback(None)
+                second.annotate(SMILES, [AMINE])
+            statements.append(statement)
+
+        connection.set_trace_callback(interleave)
+        result = first.annotate(SMILES, GROUPS)
+        assert_same(result, annotate(SMILES, GROUPS))
+        second.matched = 0
+        assert_same(second.annotate(SMILES, [*GROUPS, AMINE]), annotate(SMILES, [*GROUPS, AMINE]))
+        assert second.matched == 0
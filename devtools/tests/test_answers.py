@@ -0,0 +1,195 @@
+import random
+
+import pytest
+
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.flashcards.answers import (
+    SynonymIndex,
+    SynonymStore,
+    edit_distance,
+    normalize,
+)
+from chemcards.flashcards.fillintheblank import (
+    FillInTheBlankMoleculeToNameGenerator,
+    FillInTheBlankMoleculeToTargetGenerator,
+)
+from chemcards.flashcards.scheduling import Deck, ReviewStore
+
+TARGETS = [
+    "Carbonic anhydrase 2",
+    "Carbonic anhydrase 4",
+    "Tyrosine-protein kinase ABL",
+    "Mu opioid receptor",
+    "Cyclooxygenase-1",
+]
+
+
+def reference_distance(a, b):
+    d = [[i + j if not i or not j else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+
+@pytest.fixture
+def db():
+    return MoleculeDB(
+        molecules=[
+            MoleculeEntry(name="IMATINIB MESYLATE", smiles="C", target=TARGETS[2]),
+            MoleculeEntry(name="ACETAZOLAMIDE", smiles="C", target=TARGETS[1]),
+            MoleculeEntry(name="MORPHINE SULFATE", smiles="C", target=TARGETS[3]),
+            MoleculeEntry(name="ASPIRIN", smiles="C", target=TARGETS[4]),
+            MoleculeEntry(name="ETHANOL", smiles="C"),
+        ]
+    )
+
+
+class TestNormalize:
+    def test_case_accents_punctuation(self):
+        assert normalize("  Tyrosine-protein kinase ABL ") == "tyrosine protein kinase abl"
+        assert normalize("Cafédrine") == "cafedrine"
+
+    def test_salts(self):
+        assert normalize("IMATINIB MESYLATE", strip_salts=True) == "imatinib"
+        assert normalize("Morphine sulfate pentahydrate", strip_salts=True) == "morphine sulfate pentahydrate"
+        assert normalize("Doxycycline hyclate monohydrate", strip_salts=True) == "doxycycline"
+        # A salt alone is a name
+        assert normalize("SODIUM", strip_salts=True) == "sodium"
+        assert normalize("IMATINIB MESYLATE") == "imatinib mesylate"
+
+
+class TestEditDistance:
+    def test_matches_reference(self):
+        rng = random.Random(0)
+        for _ in range(5000):
+            a = "".join(rng.choice("abc") for _ in range(rng.randrange(7)))
+            b = "".join(rng.choice("abc") for _ in range(rng.randrange(7)))
+            limit = rng.randrange(4)
+            assert edit_distance(a, b, limit) == min(reference_distance(a, b), limit + 1)
+
+    def test_swaps(self):
+        assert edit_distance("imatinib", "imatnib", 2) == 1
+        assert edit_distance("imatinib", "imaitnib", 2) == 1
+
+
+class TestSynonymIndex:
+    @pytest.fixture
+    def index(self):
+        return SynonymIndex.from_answers(TARGETS)
+
+    @pytest.mark.parametrize(
+        "guess",
+        ["mu opioid receptor", "MU-OPIOID RECEPTOR", "mu opiod receptor", "mu opioid recpetor"],
+    )
+    def test_accepts_variants_and_typos(self, index, guess):
+        assert index.grade(guess, "Mu opioid receptor").correct
+
+    def test_rejects_other_answers(self, index):
+        grade = index.grade("carbonic anhydrase 2", "Carbonic anhydrase 4")
+        assert grade == (False, 0, "Carbonic anhydrase 2")
+        # Closer to another answer than to the right one
+        grade = index.grade("carbonic anhydrase 22", "Carbonic anhydrase 4")
+        assert not grade.correct and grade.closest == "Carbonic anhydrase 2"
+
+    def test_rejects_far_guesses(self, index):
+        assert index.grade("mu receptor", "Mu opioid receptor") == (False, None, None)
+        assert index.grade("", "Mu opioid receptor") == (False, None, None)
+        assert not index.grade("Mu opioid receptor", "Not an answer").correct
+
+    def test_search(self, index):
+        matches = index.search("carbonic anhydrase")
+        assert [m.answer for m in matches] == ["Carbonic anhydrase 2", "Carbonic anhydrase 4"]
+        assert {m.distance for m in matches} == {2}
+        assert index.search("cyclooxygenase 1")[0] == ("Cyclooxygenase-1", "cyclooxygenase 1", 0)
+
+    def test_esters_are_not_salts(self):
+        index = SynonymIndex.from_answers(
+            ["BETAMETHASONE ACETATE", "BETAMETHASONE BENZOATE", "ABIRATERONE ACETATE"],
+            strip_salts=True,
+        )
+        assert index.grade("betamethasone benzoate", "BETAMETHASONE ACETATE") == (
+            False, 0, "BETAMETHASONE BENZOATE"
+        )
+        assert index.grade("Betamethasone acetat", "BETAMETHASONE ACETATE").correct
+        assert index.grade("abiraterone", "ABIRATERONE ACETATE").correct
+        # Once the parent drug is an answer itself, its name is not a salt of it
+        index.add("ABIRATERONE", "ABIRATERONE")
+        assert index.grade("abiraterone", "ABIRATERONE ACETATE") == (False, 0, "ABIRATERONE")
+        assert not index.grade("abirateron", "ABIRATERONE ACETATE").correct
+        assert not index.grade("abiraterone hydrochloride", "ABIRATERONE ACETATE").correct
+        assert index.grade("abiraterone acetate", "ABIRATERONE ACETATE").correct
+
+    def test_add_incrementally(self, index):
+        assert not index.grade("MOR", "Mu opioid receptor").correct
+        assert index.add("MOR", "Mu opioid receptor")
+        assert not index.add("mor", "Mu opioid receptor")
+        assert index.grade("mor", "Mu opioid receptor") == (True, 0, "Mu opioid receptor")
+        assert index.add("bcr-abl kinase", "Tyrosine-protein kinase ABL")
+        assert index.grade("bcr abl kinse", "Tyrosine-protein kinase ABL").correct
+        assert index.variants("Tyrosine-protein kinase ABL") == [
+            "tyrosine protein kinase abl",
+            "bcr abl kinase",
+        ]
+
+
+class TestFillInTheBlank:
+    def test_names_accept_salts_and_typos(self, db):
+        generator = FillInTheBlankMoleculeToNameGenerator(db, seed=0, store=SynonymStore(None))
+        card = generator.card("IMATINIB MESYLATE")
+        assert card.answer == "IMATINIB MESYLATE" and card.display.name == card.answer
+        for guess in ["imatinib", "Imatinib mesylate", "imatinbi", "imatinib hydrochloride"]:
+            assert generator.grade(card, guess).correct, guess
+        assert not generator.grade(card, "acetazolamide").correct
+
+    def test_unknown_values_are_not_cards(self, db):
+        generator = FillInTheBlankMoleculeToTargetGenerator(db, seed=0, store=SynonymStore(None))
+        assert sorted(generator.card_keys()) == sorted(m.name for m in db.molecules[:4])
+        assert all(generator.next().answer != "unknown" for _ in range(20))
+        assert "unknown" not in generator.synonyms.answers
+
+    def test_card_skips_rows_without_a_value(self, db):
+        salt = MoleculeEntry(name="ASPIRIN", smiles="CC")
+        generator = FillInTheBlankMoleculeToTargetGenerator(
+            MoleculeDB(molecules=[salt, *db.molecules]), seed=0, store=SynonymStore(None)
+        )
+        card = generator.card("ASPIRIN")
+        assert card.answer == TARGETS[4] and card.answer_molecule.smiles == "C"
+        with pytest.raises(KeyError):
+            generator.card("ETHANOL")
+
+    def test_accepted_answers_persist(self, db, tmp_path):
+        store = SynonymStore(tmp_path / "synonyms.sqlite")
+        generator = FillInTheBlankMoleculeToTargetGenerator(db, seed=0, store=store)
+        card = generator.card("MORPHINE SULFATE")
+        assert not generator.grade(card, "MOR").correct
+        assert generator.accept(card, "MOR")
+        assert not generator.accept(card, "mor")
+        assert generator.grade(card, "mor").correct
+        store.close()
+
+        reopened = SynonymStore(tmp_path / "synonyms.sqlite")
+        assert reopened.load("target") == [("MOR", "Mu opioid receptor")]
+        assert reopened.load("name") == []
+        generator = FillInTheBlankMoleculeToTargetGenerator(db, seed=0, store=reopened)
+        assert generator.grade(generator.card("MORPHINE SULFATE"), "mor").correct
+
+    def test_scheduled(self, db):
+        generator = FillInTheBlankMoleculeToTargetGenerator(db, seed=0, store=SynonymStore(None))
+        deck = Deck(generator, ReviewStore(None))
+        card = deck.next()
+        assert card.card_key == card.answer_molecule.name
+        deck.review(generator.grade(card, card.answer).correct)
+
+    def test_accepted_answer_reaches_the_scheduler(self, db):
+        # As the quiz window does for "My Answer Was Right"
+        generator = FillInTheBlankMoleculeToTargetGenerator(db, seed=0, store=SynonymStore(None))
+        deck = Deck(generator, ReviewStore(None))
+        (card,) = deck.next_batch(1)
+        grade = generator.grade(card, "no idea")
+        wrong = deck.review(grade.correct, key=card.card_key)
+        generator.accept(card, "no idea")
+        right = deck.review(True, key=card.card_key, replace=True)
+        assert wrong.lapses == 1 and right.lapses == 0 and right.reps == 1
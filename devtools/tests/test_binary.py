@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from chemcards.database import binary, core, identity
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.database.resources import MOLECULE_DATABASE
+
+
+@pytest.fixture
+def database_json(tmp_path):
+    path = tmp_path / "molecule_database.json"
+    shutil.copy(MOLECULE_DATABASE, path)
+    return path
+
+
+class TestBinaryFormat:
+    def test_roundtrip(self, database_json, tmp_path):
+        db = MoleculeDB.model_validate_json(database_json.read_text())
+        path = binary.write_table(db.table, tmp_path / "db.ccdb", db.last_updated)
+        table, last_updated, _ = binary.read_table(path)
+        assert last_updated == db.last_updated
+        assert list(table.records()) == list(db.table.records())
+        assert (table.unknown == db.table.unknown).all()
+
+    def test_stale_source_is_ignored(self, database_json):
+        db = MoleculeDB.load(database_json)
+        sidecar = binary.binary_path(database_json)
+        assert binary.read_table(sidecar, source=database_json) is not None
+
+        os.utime(database_json, ns=(0, 0))
+        assert binary.read_table(sidecar, source=database_json) is None
+
+    def test_rejects_foreign_file(self, tmp_path):
+        path = tmp_path / "db.ccdb"
+        path.write_bytes(b"x" * 4096)
+        with pytest.raises(binary.BinaryFormatError):
+            binary.read_table(path)
+
+
+class TestMappedMoleculeDB:
+    def test_load_maps_sidecar(self, database_json):
+        first = MoleculeDB.load(database_json)
+        assert binary.binary_path(database_json).exists()
+        second = MoleculeDB.load(database_json)
+        assert isinstance(second.table.pool, binary.MappedStringPool)
+        assert second.last_updated == first.last_updated
+        assert json.loads(second.model_dump_json()) == json.loads(database_json.read_text())
+
+    @pytest.mark.parametrize("keep", [0.1, 0.5, 0.99])
+    def test_truncated_sidecar_falls_back_to_json(self, database_json, keep):
+        expected = json.loads(MoleculeDB.load(database_json).model_dump_json())
+        sidecar = binary.binary_path(database_json)
+        data = sidecar.read_bytes()
+        sidecar.write_bytes(data[: int(len(data) * keep)])
+        with pytest.raises(binary.BinaryFormatError):
+            binary.read_table(sidecar, source=database_json)
+        assert json.loads(MoleculeDB.load(database_json).model_dump_json()) == expected
+
+    def test_cold_load_leaves_out_identities(self, database_json, monkeypatch):
+        def fail(self, table):
+            raise AssertionError("identities computed on load")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(identity.StructureIndex, "identities", fail)
+            loaded = MoleculeDB.load(database_json)
+        mapped = binary.read_table(binary.binary_path(database_json), source=database_json)
+        assert mapped.identity_hashes is None
+
+        # The first save computes them to tell new molecules from known ones
+        first = loaded.molecules[0]
+        assert not MoleculeDB(molecules=[first]).save(database_json)
+        assert MoleculeDB(molecules=[MoleculeEntry(name="new drug", smiles="CCO")]).save(
+            database_json
+        )
+
+    def test_read_only_directory_skips_sidecar(self, database_json, monkeypatch):
+        def fail(*args, **kwargs):
+            raise AssertionError("sidecar built in a read-only directory")
+
+        monkeypatch.setattr(core.os, "access", lambda path, mode: False)
+        monkeypatch.setattr(binary, "write_table", fail)
+        assert len(MoleculeDB.load(database_json)) > 0
+        assert not binary.binary_path(database_json).exists()
+
+    def test_update_mapped_database(self, database_json):
+        MoleculeDB.load(database_json)
+        mapped = MoleculeDB.load(database_json)
+        merged = mapped.update(MoleculeDB(molecules=[MoleculeEntry(name="new drug", smiles="CCO")]))
+        assert len(merged) == len(mapped) + 1
+        assert merged.molecules[-1].name == "new drug"
+        assert merged.molecules[0].name == mapped.molecules[0].name
+
+    def test_save_refreshes_sidecar(self, database_json):
+        db = MoleculeDB(molecules=[MoleculeEntry(name="new drug", smiles="CCO")])
+        db.save(database_json)
+        reloaded = MoleculeDB.load(database_json)
+        assert isinstance(reloaded.table.pool, binary.MappedStringPool)
+        assert "new drug" in reloaded.table.column("name")
@@ -0,0 +1,51 @@
+import pytest
+
+from chemcards.database.cheminformatics import (
+    AnnotatedMoleculeEntry,
+    FunctionalGroup,
+    FunctionalGroupDatabase,
+)
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+
+CARBOXYLIC_ACID = FunctionalGroup(name="carboxylic acid", smarts="[CX3](=O)[OX2H1]")
+ESTER = FunctionalGroup(name="ester", smarts="[#6][CX3](=O)[OX2][#6]")
+AMINE = FunctionalGroup(name="amine", smarts="[NX3;H2,H1;!$(NC=O)]")
+GROUPS = [CARBOXYLIC_ACID, ESTER, AMINE]
+
+
+@pytest.fixture
+def fgdb():
+    db = MoleculeDB(
+        molecules=[
+            MoleculeEntry(name="aspirin", smiles="CC(=O)Oc1ccccc1C(=O)O"),
+            MoleculeEntry(name="glycine", smiles="NCC(=O)O"),
+            MoleculeEntry(name="broken", smiles="not a smiles"),
+            MoleculeEntry(name="ethanol", smiles="CCO"),
+        ]
+    )
+    return FunctionalGroupDatabase.from_moleculedb(db, groups=GROUPS)
+
+
+class TestFunctionalGroupDatabase:
+    def test_bitwise_queries(self, fgdb):
+        assert fgdb.molecules_with(CARBOXYLIC_ACID).tolist() == [0, 1]
+        assert fgdb.molecules_with(CARBOXYLIC_ACID, ESTER).tolist() == [0]
+        assert fgdb.molecules_with_any(ESTER, "amine").tolist() == [0, 1]
+        # Unparseable molecules are neither with nor without a group
+        assert fgdb.molecules_without(CARBOXYLIC_ACID).tolist() == [3]
+        assert fgdb.groups_of(1) == [CARBOXYLIC_ACID, AMINE]
+        assert fgdb.groups_absent_from(1) == [ESTER]
+        assert fgdb.groups_absent_from(2) == []
+        assert fgdb.counts() == {CARBOXYLIC_ACID: 2, ESTER: 1, AMINE: 1}
+
+    def test_dict_views(self, fgdb):
+        assert list(fgdb.functional_groups) == GROUPS
+        (aspirin,) = fgdb.functional_groups[ESTER]
+        assert isinstance(aspirin, AnnotatedMoleculeEntry)
+        assert aspirin.name == "aspirin"
+        assert aspirin.anti_functional_groups == [AMINE]
+        # The same entry object is shared between views, as before
+        assert fgdb.anti_functional_groups[AMINE][0] is aspirin
+        assert [m.name for m in fgdb.anti_functional_groups[ESTER]] == ["glycine", "ethanol"]
+        with pytest.raises(KeyError):
+            fgdb.functional_groups[FunctionalGroup(name="missing", smarts="[Xe]")]
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from chemcards.database import descriptors
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.flashcards.filters import (
+    HeavyAtomFilter,
+    LipinskiFilter,
+    MolecularWeightFilter,
+    RingCountFilter,
+    VeberFilter,
+)
+
+MOLECULES = [
+    MoleculeEntry(name="ethanol", smiles="CCO"),
+    MoleculeEntry(name="benzene", smiles="c1ccccc1"),
+    MoleculeEntry(name="aspirin", smiles="CC(=O)Oc1ccccc1C(=O)O"),
+    MoleculeEntry(name="broken", smiles="C1CC"),
+    # Cyclosporin-sized: breaks the rule of five and Veber's rules
+    MoleculeEntry(name="decapeptide", smiles="CC(N)C(=O)" + "NC(C)C(=O)" * 9 + "O"),
+]
+
+
+@pytest.fixture
+def db():
+    return MoleculeDB(molecules=MOLECULES)
+
+
+class TestDescriptors:
+    def test_columns(self, db):
+        heavy_atoms = descriptors.column(db.table, "heavy_atoms")
+        assert heavy_atoms[:3].tolist() == [3, 6, 13]
+        assert np.isnan(heavy_atoms[3])
+        assert descriptors.column(db.table, "rings")[:3].tolist() == [0, 1, 1]
+        assert descriptors.column(db.table, "molecular_weight")[2] == pytest.approx(180.16, abs=0.01)
+
+    def test_unknown_descriptor(self, db):
+        with pytest.raises(KeyError):
+            descriptors.column(db.table, "charge")
+
+    def test_selected_with_rows(self, db):
+        expected = descriptors.of(db.table)[[2, 0]]
+        assert np.array_equal(db.take([2, 0]).table.descriptors, expected)
+
+    def test_concat_computes_missing(self, db):
+        descriptors.of(db.table)
+        merged = db.update(MoleculeDB(molecules=[MoleculeEntry(name="methane", smiles="C")]))
+        assert descriptors.column(merged.table, "heavy_atoms")[-1] == 1
+
+    def test_computed_on_first_use(self, db, tmp_path, monkeypatch):
+        path = tmp_path / "molecule_database.json"
+        db.save(path)
+        MoleculeDB(molecules=[MoleculeEntry(name="methane", smiles="C")]).save(path)
+
+        def fail(smiles):
+            raise AssertionError("descriptors computed")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(descriptors, "compute", fail)
+            loaded = MoleculeDB.load(path)
+        assert loaded.table.descriptors is None
+        computed = descriptors.of(loaded.table, cache_dir=tmp_path)
+
+        # Persisted: the next load maps them instead of going through RDKit
+        monkeypatch.setattr(descriptors, "compute", fail)
+        reloaded = MoleculeDB.load(path)
+        assert np.array_equal(
+            descriptors.of(reloaded.table, cache_dir=tmp_path), computed, equal_nan=True
+        )
+        assert [m.name for m in HeavyAtomFilter(1, 3)(reloaded).molecules] == ["ethanol", "methane"]
+        assert "methane" in [m.name for m in LipinskiFilter()(reloaded).molecules]
+
+    def test_lipinski_and_veber(self, db):
+        assert descriptors.lipinski_violations(db.table).tolist() == [0, 0, 0, -1, 3]
+        assert descriptors.veber(db.table).tolist() == [True, True, True, False, False]
+
+
+class TestDescriptorFilters:
+    def names(self, db):
+        return [molecule.name for molecule in db.molecules]
+
+    def test_range(self, db):
+        assert self.names(HeavyAtomFilter(5, 29)(db)) == ["benzene", "aspirin"]
+        assert self.names(MolecularWeightFilter(maximum=100)(db)) == ["ethanol", "benzene"]
+        assert self.names(RingCountFilter(minimum=1)(db)) == ["benzene", "aspirin"]
+
+    def test_drug_likeness(self, db):
+        assert self.names(LipinskiFilter(0)(db)) == ["ethanol", "benzene", "aspirin"]
+        assert self.names(LipinskiFilter(3)(db)) == ["ethanol", "benzene", "aspirin", "decapeptide"]
+        assert self.names(VeberFilter()(db)) == ["ethanol", "benzene", "aspirin"]
+
+    def test_no_rdkit_at_query_time(self, db, monkeypatch):
+        descriptors.of(db.table)
+        monkeypatch.setattr(descriptors, "compute", None)
+        assert len(HeavyAtomFilter(maximum=10)(db)) == 2
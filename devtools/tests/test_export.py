@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+import sqlite3
+import zipfile
+
+import pytest
+from click.testing import CliRunner
+
+from chemcards import cli
+from chemcards.flashcards import export as export_module
+from chemcards.flashcards.export import GENERATORS, export
+from chemcards.flashcards.multiplechoice import (
+    MultipleChoiceMoleculeToFunctionalGroupNameGenerator,
+    MultipleChoiceMoleculeToTargetGenerator,
+    MultipleChoiceNameToMoleculeGenerator,
+)
+
+SMILES = ["CCO", "c1ccccc1", "CC(=O)Oc1ccccc1C(=O)O", "CN1CCC23c4c5ccc(O)c4OC2C(O)C=CC3C1C5"]
+
+
+@pytest.fixture(scope="module")
+def db(drug_db):
+    # Every structure appears under three names
+    return drug_db(12, targets=6, smiles=SMILES)
+
+
+def read_csv(path):
+    with zipfile.ZipFile(path) as archive:
+        text = archive.read("cards.csv").decode()
+        media = {name for name in archive.namelist() if name.startswith("media/")}
+    rows = list(csv.reader(io.StringIO(text)))
+    return [row for row in rows if not row[0].startswith("#")], media
+
+
+class TestExport:
+    def test_anki_package(self, db, tmp_path):
+        path = tmp_path / "deck.apkg"
+        generator = MultipleChoiceMoleculeToTargetGenerator(db, seed=1)
+        stats = export(generator.deck(), path, "Targets", batch_size=5)
+        assert stats.notes == 12 and stats.questions == 12
+        # One file per structure
+        assert stats.images == stats.rendered == 4
+
+        with zipfile.ZipFile(path) as archive:
+            media = json.loads(archive.read("media"))
+            assert sorted(media) == ["0", "1", "2", "3"]
+            assert all(archive.read(key).startswith(b"\x89PNG") for key in media)
+            collection = tmp_path / "collection.anki2"
+            collection.write_bytes(archive.read("collection.anki2"))
+        connection = sqlite3.connect(collection)
+        fields = [row[0] for row in connection.execute("SELECT flds FROM notes ORDER BY id")]
+        assert len(fields) == 12
+        assert all(any(name in f for name in media.values()) for f in fields)
+        assert connection.execute("SELECT count(DISTINCT nid), max(due) FROM cards").fetchone() == (12, 11)
+        decks = json.loads(connection.execute("SELECT decks FROM col").fetchone()[0])
+        assert "Targets" in [deck["name"] for deck in decks.values()]
+
+    def test_csv_zip(self, db, tmp_path):
+        path = tmp_path / "deck.zip"
+        generator = MultipleChoiceNameToMoleculeGenerator(db, seed=1)
+        stats = export(generator.stream(30), path)
+        rows, media = read_csv(path)
+        assert len(rows) == stats.notes
+        assert stats.notes + stats.duplicates == 30
+        assert len({guid for guid, _, _ in rows}) == len(rows)
+        assert media == {f"media/{name}" for _, front, _ in rows for name in _images(front)}
+
+    def test_functional_groups(self, tmp_path):
+        generator = MultipleChoiceMoleculeToFunctionalGroupNameGenerator(None, seed=1)
+        stats = export(generator.deck(), tmp_path / "groups.zip")
+        rows, media = read_csv(tmp_path / "groups.zip")
+        assert len(rows) == stats.notes == len(generator.card_keys())
+        assert len(media) == stats.images > 0
+
+    def test_repeated_questions_written_once(self, db, tmp_path):
+        question = MultipleChoiceMoleculeToTargetGenerator(db, seed=1).next()
+        stats = export([question] * 5, tmp_path / "deck.zip")
+        assert (stats.notes, stats.duplicates) == (1, 4)
+
+    def test_processes_give_the_same_files(self, db, tmp_path):
+        names = []
+        for processes in (1, 2):
+            path = tmp_path / f"deck{processes}.zip"
+            generator = MultipleChoiceNameToMoleculeGenerator(db, seed=2)
+            export(generator.stream(40), path, processes=processes)
+            names.append(read_csv(path))
+        assert names[0] == names[1]
+
+    def test_unknown_format(self, db, tmp_path):
+        with pytest.raises(ValueError):
+            export([], tmp_path / "deck.txt")
+        assert not (tmp_path / "deck.txt").exists()
+
+    def test_failure_leaves_no_file(self, db, tmp_path):
+        def questions():
+            yield from MultipleChoiceMoleculeToTargetGenerator(db, seed=1).stream(3)
+            raise RuntimeError("generator failed")
+
+        with pytest.raises(RuntimeError):
+            export(questions(), tmp_path / "deck.apkg")
+        assert not (tmp_path / "deck.apkg").exists()
+
+
+class TestCLI:
+    def test_generator_choices(self):
+        (option,) = [param for param in cli.export_cmd.params if param.name == "generator_name"]
+        assert list(option.type.choices) == list(GENERATORS)
+
+    def test_bad_extension_is_reported_on_out(self, tmp_path):
+        result = CliRunner().invoke(cli.cli, ["export", str(tmp_path / "deck.txt"), "--count", "1"])
+        assert result.exit_code == 2
+        assert "Invalid value for OUT" in result.output
+
+    def test_other_errors_are_not_blamed_on_out(self, tmp_path, monkeypatch):
+        def fail(*args, **kwargs):
+            raise ValueError("rendering failed")
+
+        monkeypatch.setattr(export_module, "export", fail)
+        result = CliRunner().invoke(cli.cli, ["export", str(tmp_path / "deck.apkg"), "--count", "1"])
+        assert isinstance(result.exception, ValueError)
+        assert "OUT" not in result.output
+
+
+def _images(field):
+    return [part.split('"')[0] for part in field.split('<img src="')[1:]]
@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.flashcards.core import AndFilter, FilterBase, FlashCardGeneratorBase, cached_mask
+from chemcards.flashcards.filters import (
+    ActionTypeFilter,
+    ATCFilter,
+    HeavyAtomFilter,
+    MissingTargetFilter,
+    TargetContainsFilter,
+    TargetFilter,
+)
+
+MOLECULES = [
+    MoleculeEntry(
+        name="acetazolamide",
+        smiles="CC(=O)Nc1nnc(S(N)(=O)=O)s1",
+        target="Carbonic anhydrase 4",
+        action_type="INHIBITOR",
+        atc_classifications=["S01EC01"],
+    ),
+    MoleculeEntry(
+        name="imatinib",
+        smiles="Cc1ccc(NC(=O)c2ccc(CN3CCN(C)CC3)cc2)cc1Nc1nccc(-c2cccnc2)n1",
+        target="Tyrosine-protein kinase ABL",
+        action_type="INHIBITOR",
+        atc_classifications=["L01EA01"],
+    ),
+    MoleculeEntry(
+        name="morphine",
+        smiles="CN1CCC23c4c5ccc(O)c4OC2C(O)C=CC3C1C5",
+        target="Mu opioid receptor",
+        action_type="AGONIST",
+        atc_classifications=["N02AA01"],
+    ),
+    MoleculeEntry(name="ethanol", smiles="CCO"),
+]
+
+
+class CountingFilter(FilterBase):
+    def __init__(self, inner: FilterBase):
+        self.inner = inner
+        self.calls = 0
+
+    @property
+    def signature(self):
+        return ("counting", self.inner.signature)
+
+    def mask(self, table):
+        self.calls += 1
+        return self.inner.mask(table)
+
+
+class RowsFilter(FilterBase):
+    def __init__(self, rows):
+        self.rows = np.asarray(rows)
+
+    def mask(self, table):
+        mask = np.zeros(len(table), dtype=bool)
+        mask[self.rows] = True
+        return mask
+
+
+class NameStartsWithFilter(FilterBase):
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def apply(self, molecule_db):
+        return molecule_db.take([m.name.startswith(self.prefix) for m in molecule_db.molecules])
+
+
+def names(db):
+    return [m.name for m in db.molecules]
+
+
+@pytest.fixture
+def db():
+    return MoleculeDB(molecules=MOLECULES)
+
+
+class TestFilterExpressions:
+    def test_and_or_not(self, db):
+        inhibitor = ActionTypeFilter("INHIBITOR")
+        kinase = TargetContainsFilter("kinase")
+        assert names((inhibitor & kinase)(db)) == ["imatinib"]
+        assert names((kinase | ATCFilter("N"))(db)) == ["imatinib", "morphine"]
+        assert names((~inhibitor)(db)) == ["morphine", "ethanol"]
+        assert names((inhibitor & ~kinase)(db)) == ["acetazolamide"]
+
+    def test_matches_sequential_filters(self, db):
+        filters = [MissingTargetFilter(), ActionTypeFilter("INHIBITOR"), HeavyAtomFilter(5, 30)]
+        expected = db
+        for f in filters:
+            expected = f(expected)
+        assert names(FlashCardGeneratorBase.apply_filters(db, filters)) == names(expected)
+
+    def test_masks_memoized_by_signature(self, db):
+        counting = CountingFilter(TargetFilter("Mu opioid receptor"))
+        for _ in range(3):
+            assert names(counting(db)) == ["morphine"]
+        assert counting.calls == 1
+        # Operands of ``&`` are evaluated once, whatever expression they appear in
+        (counting & MissingTargetFilter())(db)
+        (MissingTargetFilter() & counting)(db)
+        assert counting.calls == 1
+
+    def test_signature(self):
+        assert TargetFilter("a", "b").signature == TargetFilter("a", "b").signature
+        assert TargetFilter("a").signature != ActionTypeFilter("a").signature
+        assert HeavyAtomFilter(5).signature != HeavyAtomFilter(maximum=5).signature
+        a, b = TargetFilter("a"), ATCFilter("L")
+        assert (a & b).signature == (b & a).signature
+        assert (a & b).signature != (a | b).signature
+        assert ((a & b) & a).filters == (a, b, a)
+
+    def test_unhashable_state_is_not_memoized(self, db):
+        assert RowsFilter([0]).signature is None
+        assert (RowsFilter([0]) & MissingTargetFilter()).signature is None
+        assert (~RowsFilter([0])).signature is None
+        # Each array is freed before the next is made, so ids are reused
+        for row, molecule in enumerate(MOLECULES):
+            assert names(RowsFilter([row])(db)) == [molecule.name]
+
+    def test_cached_masks_are_read_only(self, db):
+        mask = cached_mask(MissingTargetFilter(), db.table)
+        with pytest.raises(ValueError):
+            mask[0] = False
+
+    def test_memoized_per_snapshot(self, db):
+        f = MissingTargetFilter()
+        assert len(f(db)) == 3
+        smaller = db.take([2, 3])
+        assert names(f(smaller)) == ["morphine"]
+
+    def test_filters_without_mask(self, db):
+        expression = ActionTypeFilter("INHIBITOR") & NameStartsWithFilter("i")
+        assert expression.mask(db.table) is None
+        assert names(expression(db)) == ["imatinib"]
+        with pytest.raises(NotImplementedError):
+            (~NameStartsWithFilter("i"))(db)
+
+    def test_empty_selection(self, db):
+        empty = TargetFilter("nothing") & MissingTargetFilter()
+        assert len(empty(db)) == 0
+        assert AndFilter().mask(db.table).all()
+
+    def test_to_sql(self):
+        clause, params = (TargetFilter("a") & ~ActionTypeFilter("b", "c")).to_sql()
+        assert clause == "(target IN (?)) AND (NOT (action_type IN (?, ?)))"
+        assert params == ("a", "b", "c")
+        assert (TargetFilter("a") | NameStartsWithFilter("x")).to_sql() is None
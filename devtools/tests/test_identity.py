@@ -0,0 +1,94 @@
+import json
+
+import rdkit
+
+from chemcards.database import identity
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.database.identity import StructureIndex, index_path, structure_keys
+from chemcards.database.table import MoleculeTable
+
+
+class TestStructureKeys:
+    def test_salt_and_charge_forms_share_parent(self):
+        aspirin = structure_keys("CC(=O)Oc1ccccc1C(=O)O")
+        sodium_salt = structure_keys("CC(=O)Oc1ccccc1C(=O)[O-].[Na+]")
+        assert aspirin == sodium_salt
+        assert aspirin.canonical_smiles == "CC(=O)Oc1ccccc1C(=O)O"
+        assert aspirin.skeleton == aspirin.inchikey.split("-")[0]
+
+    def test_unknown_counterion_is_kept(self):
+        # Picking the largest fragment would make these both "citrate"
+        citrate = "OC(=O)CC(O)(CC(=O)O)C(=O)O"
+        lithium = structure_keys(f"[Li+].[Li+].[Li+].{citrate}")
+        piperazine = structure_keys(f"C1CNCCN1.{citrate}")
+        assert lithium.inchikey != piperazine.inchikey
+
+    def test_stereoisomers_share_skeleton(self):
+        r = structure_keys("C[C@H](N)C(=O)O")
+        s = structure_keys("C[C@@H](N)C(=O)O")
+        assert r.inchikey != s.inchikey
+        assert r.skeleton == s.skeleton
+
+    def test_scaffolds(self):
+        keys = structure_keys("O=C1CCCN1Cc1ccccc1.Cl")
+        assert keys.scaffold == "O=C1CCCN1Cc1ccccc1"
+        assert keys.framework == "C1CCC(CC2CCCC2)CC1"
+        assert structure_keys("CCO").scaffold == ""
+
+    def test_unparseable(self):
+        assert structure_keys("not a smiles") is None
+
+
+class TestStructureIndex:
+    def test_identities_fall_back_to_name(self):
+        table = MoleculeTable.from_records(
+            [{"name": "a", "smiles": "CCO"}, {"name": "b", "smiles": "unknown"}]
+        )
+        keys = StructureIndex().identities(table)
+        assert keys == [structure_keys("CCO").inchikey, "name:b"]
+
+    def test_persisted_next_to_database(self, tmp_path):
+        database = tmp_path / "molecule_database.json"
+        index = StructureIndex()
+        index.keys("CCO")
+        index.save(database)
+
+        data = json.loads(index_path(database).read_text())
+        assert list(data["structures"]) == ["CCO"]
+
+        reloaded = StructureIndex()
+        reloaded.load(database)
+        assert "CCO" in reloaded
+        assert reloaded.keys("CCO") == index.keys("CCO")
+
+    def test_entries_missing_keys_are_recomputed(self, tmp_path):
+        database = tmp_path / "molecule_database.json"
+        index_path(database).write_text(
+            json.dumps({"rdkit": rdkit.__version__, "structures": {"CCO": ["CCO", "X", "Y"]}})
+        )
+        index = StructureIndex()
+        index.load(database)
+        assert "CCO" not in index
+        assert index.keys("CCO") == structure_keys("CCO")
+
+    def test_group_by_skeleton(self):
+        table = MoleculeTable.from_records(
+            [
+                {"name": "L-alanine", "smiles": "C[C@H](N)C(=O)O"},
+                {"name": "ethanol", "smiles": "CCO"},
+                {"name": "D-alanine", "smiles": "C[C@@H](N)C(=O)O"},
+            ]
+        )
+        assert sorted(identity.group_by(table).values()) == [[0, 2], [1]]
+
+
+def test_snapshot_written_with_index(tmp_path):
+    path = tmp_path / "molecule_database.json"
+    MoleculeDB(
+        molecules=[
+            MoleculeEntry(name="ethanol", smiles="CCO"),
+            MoleculeEntry(name="ethanol sodium", smiles="CC[O-].[Na+]"),
+        ]
+    ).save(path)
+    assert [m.name for m in MoleculeDB.load(path).molecules] == ["ethanol sodium"]
+    assert set(json.loads(index_path(path).read_text())["structures"]) == {"CC[O-].[Na+]"}
@@ -0,0 +1,110 @@
+import pytest
+
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.database.indexes import MoleculeIndexes, atc_level
+from chemcards.flashcards.filters import ATCFilter, TargetContainsFilter, TargetFilter
+from chemcards.flashcards.multiplechoice import (
+    MultipleChoiceMoleculeToTargetGenerator,
+    MultipleChoiceScaffoldFamilyGenerator,
+)
+
+
+@pytest.fixture
+def db():
+    return MoleculeDB(
+        molecules=[
+            MoleculeEntry(name="aspirin", smiles="CC(=O)Oc1ccccc1C(=O)O", target="PTGS1",
+                          atc_classifications=["N02BA01", "B01AC06"]),
+            MoleculeEntry(name="caffeine", smiles="Cn1cnc2c1c(=O)n(C)c(=O)n2C"),
+            MoleculeEntry(name="ibuprofen", smiles="CC(C)Cc1ccc(C(C)C(=O)O)cc1", target="PTGS1",
+                          atc_classifications=["M01AE01", "M02AA13"]),
+            MoleculeEntry(name="imatinib", smiles="C", target="BCR-ABL kinase",
+                          atc_classifications=["L01EA01"]),
+        ]
+    )
+
+
+class TestIndexes:
+    def test_field_index(self, db):
+        assert db.indexes.target.rows("PTGS1").tolist() == [0, 2]
+        assert db.indexes.target.rows("missing").tolist() == []
+        assert db.indexes.target.counts_by_value() == {
+            "unknown": 1, "PTGS1": 2, "BCR-ABL kinase": 1
+        }
+
+    def test_atc_index_covers_every_level(self, db):
+        atc = db.indexes.atc
+        assert atc.rows("M").tolist() == [2]  # once, although both codes are under M
+        assert atc.rows("N02B").tolist() == [0]
+        assert atc.rows("L01EA01").tolist() == [3]
+        assert sorted(atc.level(1)) == ["B", "L", "M", "N"]
+        assert atc.rows_any(["B01", "L"]).tolist() == [0, 3]
+
+    def test_atc_level(self):
+        assert [atc_level(code) for code in ["L", "L01", "L01E", "L01EA", "L01EA01", "L0"]] == [
+            1, 2, 3, 4, 5, None
+        ]
+
+    def test_cached_per_snapshot(self, db):
+        assert db.indexes is MoleculeIndexes.of(db.table)
+        index = db.indexes.target
+        assert db.indexes.target is index
+        assert not db.take([0, 1]).indexes.built("target")
+
+
+class TestIndexedFilters:
+    def test_filters_match_scans(self, db):
+        assert [m.name for m in TargetFilter("PTGS1")(db).molecules] == ["aspirin", "ibuprofen"]
+        assert [m.name for m in TargetContainsFilter("KINASE")(db).molecules] == ["imatinib"]
+        assert [m.name for m in ATCFilter("M01", "N")(db).molecules] == ["aspirin", "ibuprofen"]
+        # Not a whole ATC level: falls back to a scan
+        assert [m.name for m in ATCFilter("L0")(db).molecules] == ["imatinib"]
+
+    def test_target_choices_are_distinct(self, drug_db):
+        generator = MultipleChoiceMoleculeToTargetGenerator(drug_db(20, targets=5))
+        for _ in range(20):
+            card = generator.next()
+            assert len(set(card.choices)) == 4
+            assert card.answer == card.answer_molecule.target
+
+
+class TestScaffoldIndex:
+    @pytest.fixture
+    def db(self):
+        return MoleculeDB(
+            molecules=[
+                MoleculeEntry(name="aspirin", smiles="CC(=O)Oc1ccccc1C(=O)O"),
+                MoleculeEntry(name="ethanol", smiles="CCO"),
+                MoleculeEntry(
+                    name="ibuprofen sodium", smiles="CC(C)Cc1ccc(C(C)C(=O)[O-])cc1.[Na+]"
+                ),
+                MoleculeEntry(name="cyclohexanol", smiles="OC1CCCCC1"),
+                MoleculeEntry(name="pyridine", smiles="c1ccncc1"),
+                MoleculeEntry(name="biphenyl", smiles="c1ccc(-c2ccccc2)cc1"),
+            ]
+        )
+
+    def test_scaffold_families(self, db):
+        scaffold = db.indexes.scaffold
+        assert scaffold.of_row(0) == "c1ccccc1"
+        assert scaffold.of_row(1) is None  # no rings
+        assert scaffold.family(0).tolist() == [0, 2]  # counterions are not part of it
+        assert scaffold.family(1).tolist() == []
+        assert scaffold.counts_by_value()["c1ccccc1"] == 2
+
+    def test_generic_frameworks(self, db):
+        framework = db.indexes.framework
+        assert framework.of_row(0) == "C1CCCCC1"
+        assert framework.family(0).tolist() == [0, 2, 3, 4]
+
+    def test_family_generator_prefers_near_misses(self, db):
+        generator = MultipleChoiceScaffoldFamilyGenerator(db)
+        assert sorted(generator.answers.tolist()) == [0, 2]
+        for _ in range(10):
+            card = generator.next()
+            names = {molecule.name for molecule in card.choices}
+            assert len(names) == 4
+            assert {"aspirin", "ibuprofen sodium"} <= names
+            assert card.answer.name in {"aspirin", "ibuprofen sodium"}
+            # The rest come from the same generic framework before random molecules
+            assert len(names & {"cyclohexanol", "pyridine"}) == 2
@@ -0,0 +1,111 @@
+import json
+import shutil
+
+import pytest
+
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.database.journal import MoleculeJournal, journal_path
+from chemcards.database.resources import MOLECULE_DATABASE
+
+
+@pytest.fixture
+def database_json(tmp_path):
+    path = tmp_path / "molecule_database.json"
+    shutil.copy(MOLECULE_DATABASE, path)
+    return path
+
+
+# Distinct structures for test molecules (molecules are deduplicated by structure)
+SMILES = {
+    "new drug": "C[Si](C)(C)C",
+    "first": "C[Ge](C)(C)C",
+    "second": "C[Sn](C)(C)C",
+    "a": "C[Si](C)(C)CC",
+    "b": "C[Ge](C)(C)CC",
+}
+
+
+def new_db(*names, last_updated="2030-01-01"):
+    return MoleculeDB(
+        molecules=[MoleculeEntry(name=name, smiles=SMILES.get(name, "CCO")) for name in names],
+        last_updated=last_updated,
+    )
+
+
+class TestJournaledSave:
+    def test_save_appends_only_new_molecules(self, database_json):
+        snapshot = database_json.read_bytes()
+        existing = MoleculeDB.load(database_json).molecules[0]
+
+        db = new_db("new drug")
+        db.molecules = [existing.model_copy(update={"name": "renamed"}), *db.molecules]
+        assert db.save(database_json)
+
+        assert database_json.read_bytes() == snapshot
+        (transaction,) = MoleculeJournal(database_json).transactions()
+        assert [m["name"] for m in transaction["molecules"]] == ["new drug"]
+
+        loaded = MoleculeDB.load(database_json)
+        assert loaded.last_updated == "2030-01-01"
+        assert loaded.molecules[-1].name == "new drug"
+        # Existing molecules (by structure) are not overwritten by a save
+        assert loaded.molecules[0] == existing
+        assert "renamed" not in loaded.table.column("name")
+
+    def test_repeated_save_is_idempotent(self, database_json):
+        assert new_db("new drug").save(database_json)
+        journal = journal_path(database_json).read_bytes()
+        assert not new_db("new drug").save(database_json)
+        # Nothing new: nothing is written
+        assert journal_path(database_json).read_bytes() == journal
+        names = MoleculeDB.load(database_json).table.column("name")
+        assert names.count("new drug") == 1
+
+        # A newer release date alone is still recorded
+        assert not new_db("new drug", last_updated="2031-01-01").save(database_json)
+        assert MoleculeDB.load(database_json).last_updated == "2031-01-01"
+
+    def test_first_save_writes_snapshot(self, tmp_path):
+        path = tmp_path / "molecule_database.json"
+        assert new_db("a", "b", "a").save(path)
+        assert not journal_path(path).exists()
+        assert [m["name"] for m in json.loads(path.read_text())["molecules"]] == ["a", "b"]
+
+    def test_torn_transaction_is_ignored_and_repaired(self, database_json):
+        new_db("first").save(database_json)
+        with open(journal_path(database_json), "ab") as f:
+            f.write(b'{"last_updated": null, "molecules": [{"name": "torn"')
+
+        assert "torn" not in MoleculeDB.load(database_json).table.column("name")
+        new_db("second").save(database_json)
+        names = MoleculeDB.load(database_json).table.column("name")
+        assert {"first", "second"} <= set(names)
+        assert "torn" not in names
+
+    def test_compaction(self, database_json):
+        new_db("new drug").save(database_json)
+        expected = list(MoleculeDB.load(database_json).table.records())
+
+        MoleculeDB.compact(database_json)
+
+        assert not journal_path(database_json).exists()
+        assert list(MoleculeDB.load(database_json).table.records()) == expected
+        assert json.loads(database_json.read_text())["last_updated"] == "2030-01-01"
+
+    def test_large_journal_triggers_compaction(self, database_json, monkeypatch):
+        from chemcards.database import journal
+
+        monkeypatch.setattr(journal, "COMPACTION_MIN_BYTES", 0)
+        monkeypatch.setattr(journal, "COMPACTION_RATIO", 0.0)
+        new_db("new drug").save(database_json)
+        assert not journal_path(database_json).exists()
+        assert json.loads(database_json.read_text())["molecules"][-1]["name"] == "new drug"
+
+    def test_save_dedups_by_structure(self, database_json):
+        existing = MoleculeDB.load(database_json).molecules[0]
+        MoleculeDB(
+            molecules=[MoleculeEntry(name=existing.name, smiles="C[Pb](C)(C)C")]
+        ).save(database_json)
+        names = MoleculeDB.load(database_json).table.column("name")
+        # Same name, different structure: both are kept
+        assert names.count(existing.name) == 2
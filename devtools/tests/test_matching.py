@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+from rdkit import Chem
+
+from chemcards.database.cheminformatics import (
+    FUNCTIONAL_GROUP_MATCHER,
+    FUNCTIONAL_GROUPS,
+    FunctionalGroup,
+)
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.flashcards.multiplechoice import (
+    MultipleChoiceMostSpecificFunctionalGroupGenerator,
+)
+from chemcards.database.matching import (
+    FunctionalGroupHierarchy,
+    FunctionalGroupMatcher,
+    annotate,
+    compile_smarts,
+    match_bonds,
+)
+
+ASPIRIN = "CC(=O)Oc1ccccc1C(=O)O"
+
+
+class TestFunctionalGroupMatcher:
+    def test_patterns_are_compiled_once(self):
+        assert compile_smarts("C(=O)O") is compile_smarts("C(=O)O")
+        matcher = FunctionalGroupMatcher([{"smarts": "C(=O)O"}])
+        assert matcher.patterns[0] is compile_smarts("C(=O)O")
+
+    def test_match_returns_all_atom_mappings(self):
+        carbonyl = {"name": "carbonyl", "smarts": "[CX3]=[OX1]"}
+        amine = {"name": "amine", "smarts": "[NX3]"}
+        matcher = FunctionalGroupMatcher([amine, carbonyl, {"smarts": "not smarts ("}])
+        (match,) = matcher.match(Chem.MolFromSmiles(ASPIRIN))
+        assert match.index == 1
+        assert match.group is carbonyl
+        assert len(match.atoms) == 2
+        assert matcher.matching(Chem.MolFromSmiles(ASPIRIN)) == [1]
+
+    def test_match_bonds(self):
+        mol = Chem.MolFromSmiles("CC=O")
+        pattern = compile_smarts("C=O")
+        assert match_bonds(mol, pattern, mol.GetSubstructMatch(pattern)) == (1,)
+
+    def test_agrees_with_per_group_matching(self):
+        for smiles in [ASPIRIN, "Cn1cnc2c1c(=O)n(C)c(=O)n2C", "c1ccsc1CCN"]:
+            mol = Chem.MolFromSmiles(smiles)
+            expected = [
+                i
+                for i, fg in enumerate(FUNCTIONAL_GROUPS)
+                if mol.HasSubstructMatch(Chem.MolFromSmarts(fg.smarts))
+            ]
+            assert FUNCTIONAL_GROUP_MATCHER.matching(mol) == expected
+            molecule = MoleculeEntry(name="x", smiles=smiles)
+            assert [fg.match(molecule) for fg in FUNCTIONAL_GROUPS] == [
+                i in expected for i in range(len(FUNCTIONAL_GROUPS))
+            ]
+
+
+def test_functional_group_match_atoms():
+    fg = FunctionalGroup(name="thiophene", smarts="c1ccc[sX2]1")
+    assert sorted(fg.match_atoms(Chem.MolFromSmiles("c1ccsc1C"))) == [0, 1, 2, 3, 4]
+    assert fg.match_atoms(Chem.MolFromSmiles("CCO")) == ()
+
+
+def test_parallel_annotation_is_deterministic():
+    smiles = [ASPIRIN, "not a smiles", "Cn1cnc2c1c(=O)n(C)c(=O)n2C", "c1ccsc1CCN"] * 5
+    serial = annotate(smiles, FUNCTIONAL_GROUPS)
+    parallel = annotate(smiles, FUNCTIONAL_GROUPS, processes=2, chunk_size=3)
+    assert (serial.bits == parallel.bits).all()
+    assert (serial.parsed == parallel.parsed).all()
+    assert not serial.parsed[1] and not serial.bits[1].any()
+    expected = FUNCTIONAL_GROUP_MATCHER.matching(Chem.MolFromSmiles(ASPIRIN))
+    assert serial.groups(0).tolist() == expected
+
+
+class TestFunctionalGroupHierarchy:
+    GROUPS = [
+        {"name": "ethyl", "smarts": "[CH2X4][CH3X4]", "parents": ["methyl"]},
+        {"name": "methyl", "smarts": "[CH3X4]"},
+        {"name": "propyl", "smarts": "[CH2X4][CH2X4][CH3X4]", "parents": ["ethyl", "other"]},
+        {"name": "carbonyl", "smarts": "[CX3]=[OX1]"},
+    ]
+
+    def test_dag(self):
+        hierarchy = FunctionalGroupHierarchy(self.GROUPS)
+        assert hierarchy.parents == [(1,), (), (0,), ()]  # unknown parents are ignored
+        assert hierarchy.descendants(1) == [0, 2]
+        assert hierarchy.ancestors(2) == [0, 1]
+        assert hierarchy.order.index(1) < hierarchy.order.index(0) < hierarchy.order.index(2)
+
+    def test_cycles_are_rejected(self):
+        with pytest.raises(ValueError):
+            FunctionalGroupHierarchy(
+                [{"name": "a", "smarts": "C", "parents": ["b"]},
+                 {"name": "b", "smarts": "C", "parents": ["a"]}]
+            )
+
+    def test_descendants_of_absent_parent_are_pruned(self):
+        matcher = FunctionalGroupMatcher(self.GROUPS)
+        assert matcher.matching(Chem.MolFromSmiles("O=C1CCC1")) == [3]
+        assert (matcher.matched, matcher.pruned) == (2, 2)
+        assert matcher.matching(Chem.MolFromSmiles("CCCC=O")) == [0, 1, 2, 3]
+        assert [m.index for m in matcher.match(Chem.MolFromSmiles("CCO"))] == [0, 1]
+        # A parent outside ``indices`` is not tested and cannot prune
+        assert matcher.matching(Chem.MolFromSmiles("CCC"), indices=[0, 2]) == [0]
+
+    def test_declared_parents_hold_on_shipped_database(self):
+        smiles = MoleculeDB.load().table.column("smiles")
+        flat = [{"name": fg.name, "smarts": fg.smarts} for fg in FUNCTIONAL_GROUPS]
+        unpruned = annotate(smiles, flat)
+        pruned = annotate(smiles, FUNCTIONAL_GROUPS)
+        assert unpruned.pruned == 0 and pruned.pruned > 0
+        assert np.array_equal(pruned.bits, unpruned.bits)
+
+
+def test_most_specific_group_distractors():
+    db = MoleculeDB(
+        molecules=[
+            MoleculeEntry(name="ethyl acetate", smiles="CCOC(C)=O"),
+            MoleculeEntry(name="diethyl ether", smiles="CCOCC"),
+            MoleculeEntry(name="pyridine", smiles="c1ccncc1"),
+        ]
+    )
+    generator = MultipleChoiceMostSpecificFunctionalGroupGenerator(db)
+    for _ in range(20):
+        card = generator.next()
+        present = {fg.name for fg in card.answer_molecule.functional_groups}
+        assert len(set(card.choices)) == 4
+        assert card.answer in {"ester", "ethyl"}
+        parent = {"ester": "ether", "ethyl": "methyl"}[card.answer]
+        assert parent in card.choices
+        # Every other present choice is an ancestor of the answer
+        assert set(card.choices) & present == {card.answer, parent}
@@ -0,0 +1,73 @@
+from rdkit import Chem
+
+from chemcards.database.core import MoleculeEntry
+from chemcards.database.molcache import MolCache, default_cache
+
+ASPIRIN = "CC(=O)Oc1ccccc1C(=O)O"
+
+
+class TestMolCache:
+    def test_lru_hits_and_misses(self):
+        cache = MolCache(path=None)
+        first = cache.get(ASPIRIN)
+        second = cache.get(ASPIRIN)
+        assert Chem.MolToSmiles(first) == Chem.MolToSmiles(second)
+        assert first is not second
+        assert cache.get(ASPIRIN, copy=False) is cache.get(ASPIRIN, copy=False)
+        stats = cache.stats()
+        assert (stats.misses, stats.hits, stats.size) == (1, 3, 1)
+
+    def test_invalid_smiles(self):
+        cache = MolCache(path=None)
+        assert cache.get("not a smiles") is None
+        assert cache.get("not a smiles") is None
+        assert cache.stats().misses == 1
+
+    def test_lru_eviction(self):
+        cache = MolCache(path=None, maxsize=2)
+        for smiles in ["C", "CC", "CCC", "C"]:
+            cache.get(smiles)
+        assert cache.stats().misses == 4
+
+    def test_disk_layer_is_shared(self, tmp_path):
+        path = tmp_path / "molecules.sqlite"
+        writer = MolCache(path, stamp="v1")
+        writer.get(ASPIRIN)
+        writer.close()
+
+        reader = MolCache(path, stamp="v1")
+        mol = reader.get(ASPIRIN)
+        assert Chem.MolToSmiles(mol) == Chem.MolToSmiles(Chem.MolFromSmiles(ASPIRIN))
+        assert reader.stats().disk_hits == 1
+        assert reader.stats().misses == 0
+
+    def test_stamp_change_invalidates_disk_layer(self, tmp_path):
+        path = tmp_path / "molecules.sqlite"
+        writer = MolCache(path, stamp="v1")
+        writer.get(ASPIRIN)
+        writer.close()
+
+        reader = MolCache(path, stamp="v2")
+        reader.get(ASPIRIN)
+        assert reader.stats().disk_hits == 0
+        assert reader.stats().misses == 1
+
+    def test_invalidate(self, tmp_path):
+        cache = MolCache(tmp_path / "molecules.sqlite", stamp="v1")
+        cache.get(ASPIRIN)
+        cache.flush()
+        cache.invalidate("v2")
+        cache.reset_stats()
+        cache.get(ASPIRIN)
+        assert cache.stats().misses == 1
+
+
+def test_to_rdkit_uses_default_cache():
+    cache = default_cache()
+    molecule = MoleculeEntry(name="aspirin", smiles=ASPIRIN)
+    before = cache.stats()
+    molecule.to_rdkit()
+    molecule.to_rdkit()
+    after = cache.stats()
+    assert after.hits + after.disk_hits + after.misses == before.hits + before.disk_hits + before.misses + 2
+    assert after.hits >= before.hits + 1
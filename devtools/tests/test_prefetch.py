@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from chemcards.flashcards.core import FlashCardGeneratorBase
+from chemcards.flashcards.multiplechoice import (
+    MultipleChoiceMoleculeToFunctionalGroupNameGenerator,
+    MultipleChoiceMoleculeToNameGenerator,
+    MultipleChoiceMoleculeToTargetGenerator,
+)
+from chemcards.flashcards.prefetch import PrefetchQueue
+from chemcards.flashcards.scheduling import Deck, ReviewStore
+
+
+@pytest.fixture
+def db(drug_db):
+    return drug_db(30, targets=9)
+
+
+def wait_until_full(prefetch):
+    deadline = time.monotonic() + 5
+    while prefetch.depth < prefetch.capacity and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class Failing(FlashCardGeneratorBase):
+    name = "failing"
+
+    def __init__(self):
+        super().__init__(None)
+
+    def next(self):
+        raise ValueError("no questions")
+
+
+class TestNextBatch:
+    def test_molecule_questions(self, db):
+        generator = MultipleChoiceMoleculeToTargetGenerator(db)
+        questions = generator.next_batch(500)
+        assert len(questions) == 500
+        for question in questions:
+            assert len(set(question.choices)) == 4
+            assert question.answer == question.answer_molecule.target
+            assert question.display is question.answer_molecule
+
+    def test_functional_group_questions(self):
+        questions = MultipleChoiceMoleculeToFunctionalGroupNameGenerator(None).next_batch(50)
+        assert all(question.answer == question.display.name for question in questions)
+
+    def test_deck_leases_cards(self, db):
+        deck = Deck(MultipleChoiceMoleculeToTargetGenerator(db), ReviewStore(None))
+        first = deck.next_batch(20)
+        second = deck.next_batch(20)
+        keys = [question.card_key for question in first + second]
+        assert len(keys) == len(set(keys)) == 30
+
+        deck.review(True, keys[0])
+        deck.release(keys[1:5])
+        assert {question.card_key for question in deck.next_batch(20)} == {*keys[:5]}
+
+
+class TestPrefetchQueue:
+    def test_hits_once_filled(self, db):
+        prepared = []
+        prefetch = PrefetchQueue(
+            MultipleChoiceMoleculeToTargetGenerator(db), depth=4, prepare=prepared.append
+        )
+        try:
+            wait_until_full(prefetch)
+            assert prefetch.stats.depth == 4
+            question, _ = prefetch.get()
+            assert question.answer == question.answer_molecule.target
+            assert prefetch.next() is not None
+            stats = prefetch.stats
+            assert (stats.hits, stats.misses, stats.hit_rate) == (2, 0, 1.0)
+            assert question in prepared
+        finally:
+            prefetch.close()
+
+    def test_close_releases_deck_cards(self, db):
+        deck = Deck(MultipleChoiceMoleculeToTargetGenerator(db), ReviewStore(None))
+        prefetch = PrefetchQueue(deck, depth=5)
+        wait_until_full(prefetch)
+        question = prefetch.next()
+        prefetch.close()
+        # Only the card that was asked is still leased
+        assert len(deck.next_batch(100)) == 29
+        assert question.card_key not in {q.card_key for q in deck.next_batch(100)}
+
+    def test_small_deck_waits_for_reviews(self, drug_db):
+        db = drug_db(2)
+        deck = Deck(MultipleChoiceMoleculeToNameGenerator(db), ReviewStore(None))
+        prefetch = PrefetchQueue(deck, depth=8)
+        try:
+            first, second = prefetch.next(), prefetch.next()
+            assert first.card_key != second.card_key
+            deck.review(True, first.card_key)
+            assert prefetch.next().card_key == first.card_key
+        finally:
+            prefetch.close()
+
+    def test_answers_through_the_queue(self, db):
+        # As the quiz windows do: questions are leased with next_batch, never
+        # asked with Deck.next(), so reviews name their card
+        deck = Deck(MultipleChoiceMoleculeToTargetGenerator(db), ReviewStore(None))
+        prefetch = PrefetchQueue(deck, depth=4)
+        try:
+            asked = []
+            for i in range(10):
+                question, _ = prefetch.get()
+                asked.append(question.card_key)
+                state = deck.review(i % 2 == 0, key=question.card_key)
+                assert deck.states[deck.keys.index(question.card_key)] == state
+            assert len(set(asked)) == 10
+            assert deck.current is None
+            with pytest.raises(ValueError, match="No card to review"):
+                deck.review(True)
+        finally:
+            prefetch.close()
+
+    def test_errors_reach_the_caller(self):
+        prefetch = PrefetchQueue(Failing())
+        with pytest.raises(ValueError, match="no questions"):
+            prefetch.get()
+        prefetch.close()
@@ -0,0 +1,116 @@
+import random
+from collections import Counter
+
+import pytest
+
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.flashcards.multiplechoice import (
+    MultipleChoiceMoleculeToFunctionalGroupNameGenerator,
+    MultipleChoiceMoleculeToMechanismGenerator,
+    MultipleChoiceMoleculeToNameGenerator,
+    MultipleChoiceMoleculeToTargetGenerator,
+    MultipleChoiceNameToMoleculeGenerator,
+)
+from chemcards.flashcards.sampling import DistinctSampler
+
+
+@pytest.fixture
+def db(drug_db):
+    # Most molecules share a target: naive sampling repeats answers constantly
+    return drug_db(
+        100,
+        target=lambda i: "COX" if i % 10 else f"target {i}",
+        mechanism_of_action=lambda i: f"mechanism {i % 7}",
+        extra=[MoleculeEntry(name="no target", smiles="CC")],
+    )
+
+
+class TestDistinctSampler:
+    def test_choices_are_distinct(self):
+        sampler = DistinctSampler.from_values(["a"] * 50 + ["b", "c", "d", "e", "f"])
+        rng = random.Random(0)
+        for _ in range(1000):
+            items, values, correct = sampler.sample(4, rng)
+            assert len(set(values)) == 4
+            assert len(set(items)) == 4
+            assert all(
+                value == ("a" if item < 50 else "abcdef"[item - 49])
+                for item, value in zip(items, values)
+            )
+            assert 0 <= correct < 4
+
+    def test_answers_are_uniform_over_items(self):
+        sampler = DistinctSampler.from_values(["a"] * 3 + ["b"])
+        rng = random.Random(1)
+        answers = Counter(
+            values[correct] for values, correct in (sampler.sample(2, rng)[1:] for _ in range(4000))
+        )
+        assert 2700 < answers["a"] < 3300
+
+    def test_fewer_values_than_choices(self):
+        sampler = DistinctSampler.from_values(["a", "a", "b"])
+        items, values, correct = sampler.sample(4, random.Random(2))
+        assert sorted(values) == ["a", "b"]
+
+    def test_unknown_is_never_drawn(self):
+        sampler = DistinctSampler.from_values(["unknown"] * 10 + ["a", "b", "c", "d"])
+        rng = random.Random(3)
+        for _ in range(200):
+            assert "unknown" not in sampler.sample(4, rng).values
+        with pytest.raises(ValueError):
+            DistinctSampler.from_values(["unknown"]).sample()
+
+    def test_million_questions(self):
+        values = [f"target {i % 40}" for i in range(200)] + ["COX"] * 800
+        sampler = DistinctSampler.from_values(values)
+        rng = random.Random(4)
+        for _ in range(1_000_000):
+            items, drawn, correct = sampler.sample(4, rng)
+            if len(set(drawn)) != 4 or values[items[correct]] != drawn[correct]:
+                pytest.fail(f"Bad question: {items} {drawn} {correct}")
+
+
+class TestGenerators:
+    @pytest.mark.parametrize(
+        "generator, field",
+        [
+            (MultipleChoiceMoleculeToTargetGenerator, "target"),
+            (MultipleChoiceMoleculeToMechanismGenerator, "mechanism_of_action"),
+            (MultipleChoiceMoleculeToNameGenerator, "name"),
+        ],
+    )
+    def test_molecule_to_text(self, db, generator, field):
+        generator = generator(db)
+        for _ in range(200):
+            card = generator.next()
+            assert len(set(card.choices)) == 4
+            assert card.answer == getattr(card.answer_molecule, field) != "unknown"
+
+    def test_card_skips_rows_without_a_value(self, db):
+        molecules = [
+            MoleculeEntry(name="a", smiles="N"),
+            MoleculeEntry(name="a", smiles="O", target="T1"),
+        ]
+        generator = MultipleChoiceMoleculeToTargetGenerator(
+            MoleculeDB(molecules=[*molecules, *db.molecules])
+        )
+        assert "a" in generator.card_keys()
+        card = generator.card("a")
+        assert card.answer == "T1"
+        assert card.answer_molecule.smiles == "O"
+        with pytest.raises(KeyError):
+            generator.card("no target")
+
+    def test_name_to_molecule(self, db):
+        generator = MultipleChoiceNameToMoleculeGenerator(db)
+        for _ in range(200):
+            card = generator.next()
+            assert len({molecule.name for molecule in card.choices}) == 4
+            assert card.answer is card.answer_molecule
+
+    def test_functional_group_names(self):
+        generator = MultipleChoiceMoleculeToFunctionalGroupNameGenerator(molecule_db=None)
+        for _ in range(200):
+            card = generator.next()
+            assert len(set(card.choices)) == 4
+            assert card.answer == card.display.name
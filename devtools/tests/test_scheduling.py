@@ -0,0 +1,170 @@
+import random
+
+import pytest
+
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.flashcards.core import FlashCardGeneratorBase
+from chemcards.flashcards.multiplechoice import (
+    MultipleChoiceMoleculeToFunctionalGroupNameGenerator,
+    MultipleChoiceMoleculeToTargetGenerator,
+    MultipleChoiceScaffoldFamilyGenerator,
+)
+from chemcards.flashcards.scheduling import (
+    DAY,
+    INITIAL_EASE,
+    MINIMUM_EASE,
+    NEW_CARD,
+    RELEARN_SECONDS,
+    Deck,
+    Rating,
+    ReviewStore,
+    sm2,
+)
+
+
+class Cards(FlashCardGeneratorBase):
+    name = "cards"
+
+    def __init__(self, n, seed=None):
+        super().__init__(None, seed=seed)
+        self.n = n
+
+    def next(self):
+        raise NotImplementedError
+
+    def card_keys(self):
+        return [f"card {i}" for i in range(self.n)]
+
+    def card(self, key):
+        return key
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReviewStore(tmp_path / "reviews.sqlite")
+    yield store
+    store.close()
+
+
+class TestSM2:
+    def test_intervals_grow(self):
+        state = NEW_CARD
+        intervals = []
+        for _ in range(4):
+            state = sm2(state, Rating.GOOD, 0.0)
+            intervals.append(state.interval)
+        assert intervals == [1.0, 6.0, 15.0, 37.5]
+        assert state.ease == INITIAL_EASE
+        assert state.due == 37.5 * DAY
+
+    def test_lapse(self):
+        state = sm2(sm2(NEW_CARD, Rating.GOOD, 0.0), Rating.AGAIN, 100.0)
+        assert (state.reps, state.lapses, state.due) == (0, 1, 100.0 + RELEARN_SECONDS)
+        assert state.ease < INITIAL_EASE
+        for _ in range(10):
+            state = sm2(state, Rating.AGAIN, 0.0)
+        assert state.ease == MINIMUM_EASE
+
+    def test_easy_and_hard(self):
+        assert sm2(NEW_CARD, Rating.EASY, 0.0).ease > INITIAL_EASE
+        assert sm2(NEW_CARD, Rating.HARD, 0.0).ease < INITIAL_EASE
+
+
+class TestDeck:
+    def test_reviewed_cards_move_back(self, store):
+        deck = Deck(Cards(5), store, now=0.0, rng=random.Random(0))
+        seen = []
+        for _ in range(5):
+            seen.append(deck.next())
+            deck.review(True, now=1.0)
+        assert sorted(seen) == deck.keys
+        assert deck.due(now=1.0) == 0
+        # Nothing due: the earliest card comes next
+        assert deck.next() in seen
+
+    def test_failed_card_comes_back_first(self, store):
+        deck = Deck(Cards(100), store, now=0.0)
+        for _ in range(100):
+            deck.next()
+            deck.review(Rating.GOOD, now=0.0)
+        failed = deck.next()
+        deck.review(False, now=0.0)
+        assert deck.next_key() == failed
+        assert deck.due(now=RELEARN_SECONDS) == 1
+
+    def test_state_persists(self, store):
+        deck = Deck(Cards(3), store, now=0.0)
+        key = deck.next()
+        state = deck.review(Rating.EASY, now=10.0)
+        store.flush()
+
+        reopened = Deck(Cards(3), store, now=20.0)
+        assert reopened.states[reopened.keys.index(key)] == state
+        assert reopened.next_key() != key
+        assert store.reviews("cards") == [(key, 10.0, Rating.EASY, state.interval)]
+
+    def test_replace_overrides_the_last_review(self, store):
+        deck = Deck(Cards(3), store, now=0.0)
+        key = deck.next()
+        deck.review(True, key, now=0.0)
+        deck.review(False, key, now=DAY)
+        # The wrong answer was right after all
+        state = deck.review(True, key, now=DAY, replace=True)
+        assert state == sm2(sm2(NEW_CARD, Rating.GOOD, 0.0), Rating.GOOD, DAY)
+        assert deck.next_key() != key
+        store.flush()
+        assert Deck(Cards(3), store).states[deck.keys.index(key)] == state
+        assert [rating for _, _, rating, _ in store.reviews("cards")] == [
+            Rating.GOOD, Rating.AGAIN, Rating.GOOD,
+        ]
+
+    def test_reviews_are_batched(self, tmp_path):
+        store = ReviewStore(tmp_path / "reviews.sqlite", flush_interval=60.0)
+        deck = Deck(Cards(1000), store, now=0.0)
+        for _ in range(1000):
+            deck.next()
+            deck.review(True, now=0.0)
+        store.close()
+        assert store.batches < 10
+        assert len(ReviewStore(tmp_path / "reviews.sqlite").reviews("cards")) == 1000
+
+    def test_new_cards_follow_the_source_seed(self):
+        def order(seed):
+            return Deck(Cards(20, seed), ReviewStore(None), now=0).next_batch(20)
+
+        state = random.getstate()
+        assert order(1) == order(1) != order(2)
+        assert random.getstate() == state
+
+    def test_heap_stays_bounded(self, store):
+        deck = Deck(Cards(10), store, now=0.0)
+        for i in range(1000):
+            deck.next()
+            deck.review(False, now=float(i))
+        assert len(deck._heap) <= 2 * len(deck) + 64
+
+    def test_unpersisted(self):
+        deck = Deck(Cards(2), ReviewStore(None), now=0.0)
+        deck.next()
+        deck.review(True)
+        assert deck.store.reviews("cards") == []
+
+
+class TestGeneratorSources:
+    def test_molecule_cards(self, store, drug_db):
+        db = drug_db(6, targets=6, extra=[MoleculeEntry(name="no target", smiles="C")])
+        deck = Deck(MultipleChoiceMoleculeToTargetGenerator(db), store)
+        assert sorted(deck.keys) == [f"drug {i}" for i in range(6)]
+        card = deck.next()
+        assert card.answer_molecule.name == deck.current
+        assert len(set(card.choices)) == 4
+
+    def test_functional_group_cards(self, store):
+        deck = Deck(MultipleChoiceMoleculeToFunctionalGroupNameGenerator(None), store)
+        card = deck.next()
+        assert card.answer == deck.current
+
+    def test_unschedulable_generator(self, store):
+        db = MoleculeDB(molecules=[MoleculeEntry(name="a", smiles="c1ccccc1")])
+        with pytest.raises(NotImplementedError):
+            Deck(MultipleChoiceScaffoldFamilyGenerator(db), store)
@@ -0,0 +1,59 @@
+import numpy as np
+
+from chemcards.database.cheminformatics import FUNCTIONAL_GROUPS
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.database.molcache import get_mol
+from chemcards.database.screening import WORDS, FingerprintScreen, pattern_fingerprint
+
+SMILES = [
+    "CC(=O)Oc1ccccc1C(=O)O",
+    "Cn1cnc2c1c(=O)n(C)c(=O)n2C",
+    "CC(C)Cc1ccc(C(C)C(=O)O)cc1",
+    "CCN(CC)CC",
+    "not a smiles",
+    "ClCCl",
+]
+
+
+class TestFingerprintScreen:
+    def test_fingerprint_is_packed(self):
+        fp = pattern_fingerprint(get_mol("CCO"))
+        assert fp.dtype == np.uint64 and fp.shape == (WORDS,)
+        assert fp.any()
+
+    def test_search_is_exact(self):
+        screen = FingerprintScreen.from_smiles(SMILES)
+        for group in FUNCTIONAL_GROUPS:
+            pattern = group.to_rdkit()
+            expected = [
+                row
+                for row, smiles in enumerate(SMILES)
+                if (mol := get_mol(smiles)) is not None and mol.HasSubstructMatch(pattern)
+            ]
+            assert screen.search(group.smarts).tolist() == expected, group.name
+        # Most pairs never reach a full match
+        assert screen.screened > screen.verified
+
+    def test_search_within_rows(self):
+        screen = FingerprintScreen.from_smiles(SMILES)
+        assert screen.search("C(=O)[OH]").tolist() == [0, 2]
+        assert screen.search("C(=O)[OH]", rows=np.array([2, 3])).tolist() == [2]
+        assert screen.search("C(=O)[OH]", limit=1).tolist() == [0]
+        assert screen.search("not smarts(").tolist() == []
+
+    def test_persisted_per_table(self, tmp_path):
+        db = MoleculeDB(
+            molecules=[MoleculeEntry(name=f"m{i}", smiles=s) for i, s in enumerate(SMILES)]
+        )
+        screen = FingerprintScreen.of(db.table, cache_dir=tmp_path)
+        assert FingerprintScreen.of(db.table, cache_dir=tmp_path) is screen
+        assert len(list(tmp_path.glob("pattern_fp_*.npy"))) == 1
+
+        # A fresh table with the same molecules reads the fingerprints back
+        loaded = FingerprintScreen.of(db.take(range(len(SMILES))).table, cache_dir=tmp_path)
+        assert loaded is not screen
+        assert np.array_equal(loaded.fingerprints, screen.fingerprints)
+
+        # Another database replaces the stale file
+        FingerprintScreen.of(db.take([0, 1]).table, cache_dir=tmp_path)
+        assert len(list(tmp_path.glob("pattern_fp_*.npy"))) == 1
@@ -0,0 +1,79 @@
+from itertools import islice
+
+import numpy as np
+import pytest
+
+from chemcards.flashcards.multiplechoice import (
+    MultipleChoiceMoleculeToFunctionalGroupNameGenerator,
+    MultipleChoiceMoleculeToTargetGenerator,
+    MultipleChoiceScaffoldFamilyGenerator,
+)
+
+SMILES = ["c1ccccc1C", "c1ccccc1CC", "c1ccccc1O", "C1CCCCC1N", "C1CCCCC1CO", "CCO", "CCCN"]
+
+
+@pytest.fixture(scope="module")
+def db(drug_db):
+    return drug_db(60, targets=6, smiles=SMILES)
+
+
+GENERATORS = [
+    MultipleChoiceMoleculeToTargetGenerator,
+    MultipleChoiceMoleculeToFunctionalGroupNameGenerator,
+    MultipleChoiceScaffoldFamilyGenerator,
+]
+
+
+def dumped(questions):
+    return [question.model_dump_json() for question in questions]
+
+
+@pytest.mark.parametrize("generator_type", GENERATORS, ids=lambda t: t.__name__)
+class TestSeeding:
+    def test_reproducible(self, db, generator_type):
+        first = dumped(generator_type(db, seed=7).stream(100))
+        assert first == dumped(generator_type(db, seed=7).stream(100))
+        assert first != dumped(generator_type(db, seed=8).stream(100))
+
+    def test_reseed(self, db, generator_type):
+        generator = generator_type(db, seed=7)
+        first = dumped(islice(generator, 30))
+        generator.seed(7)
+        assert dumped(islice(generator, 30)) == first
+
+    def test_shards_are_independent(self, db, generator_type):
+        generator = generator_type(db, seed=7)
+        shards = [dumped(shard.stream(50)) for shard in generator.shards(3)]
+        assert len({tuple(shard) for shard in shards}) == 3
+        # Derived from the seed alone
+        assert dumped(generator_type(db, seed=7).shard(2).stream(50)) == shards[2]
+
+
+class TestStreams:
+    def test_stream_length(self, db):
+        generator = MultipleChoiceMoleculeToTargetGenerator(db, seed=1)
+        assert len(list(generator.stream(150, batch_size=64))) == 150
+        assert len(list(islice(iter(generator), 10))) == 10
+
+    def test_shard_seeds_match_spawn(self, db):
+        generator = MultipleChoiceMoleculeToTargetGenerator(db, seed=1)
+        children = np.random.SeedSequence(1).spawn(3)
+        for index, child in enumerate(children):
+            assert np.array_equal(
+                generator.shard(index).seed_sequence.generate_state(4), child.generate_state(4)
+            )
+        # Shards of shards stay distinct
+        nested = generator.shard(0).shard(1).seed_sequence.spawn_key
+        assert nested == (0, 1)
+
+    @pytest.mark.parametrize("shards", [1, 4])
+    def test_deck_shards_partition_the_cards(self, db, shards):
+        generator = MultipleChoiceMoleculeToTargetGenerator(db, seed=3)
+        asked = [
+            question.answer_molecule.name
+            for shard in range(shards)
+            for question in generator.deck(shard, shards)
+        ]
+        assert sorted(asked) == sorted(generator.card_keys())
+        again = MultipleChoiceMoleculeToTargetGenerator(db, seed=3)
+        assert dumped(again.deck(1 % shards, shards)) == dumped(generator.deck(1 % shards, shards))
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from rdkit import Chem, DataStructs
+from rdkit.Chem import rdFingerprintGenerator
+
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.database import similarity
+from chemcards.database.similarity import SimilarityIndex
+
+SMILES = [
+    "CC(=O)Oc1ccccc1C(=O)O",
+    "CC(C)Cc1ccc(C(C)C(=O)O)cc1",
+    "Cn1cnc2c1c(=O)n(C)c(=O)n2C",
+    "OC(=O)c1ccccc1O",
+    "not a smiles",
+    "CC(C)Cc1ccc(C(C)C(=O)[O-])cc1",
+    "CCO",
+]
+
+
+def reference(query: str) -> np.ndarray:
+    generator = rdFingerprintGenerator.GetMorganGenerator(radius=2, fpSize=2048)
+    fp = generator.GetFingerprint(Chem.MolFromSmiles(query))
+    return np.array([
+        DataStructs.TanimotoSimilarity(fp, generator.GetFingerprint(mol))
+        if (mol := Chem.MolFromSmiles(smiles)) is not None
+        else 0.0
+        for smiles in SMILES
+    ])
+
+
+class TestSimilarityIndex:
+    def test_tanimoto_matches_rdkit(self):
+        index = SimilarityIndex.from_smiles(SMILES)
+        for query in ["CC(=O)Oc1ccccc1C(=O)O", "c1ccccc1"]:
+            fp = similarity.morgan_fingerprint(Chem.MolFromSmiles(query))
+            assert np.allclose(index.tanimoto(fp), reference(query), atol=1e-6)
+
+    def test_popcount_without_bitwise_count(self, monkeypatch):
+        fps = np.random.default_rng(0).integers(0, 2**63, size=(3, 4, 32), dtype=np.uint64)
+        expected = similarity._popcount(fps)
+        # NumPy < 2.0
+        monkeypatch.delattr(np, "bitwise_count", raising=False)
+        assert np.array_equal(similarity._popcount(fps), expected)
+        assert np.array_equal(similarity._popcount(fps[:, 1]), expected[:, 1])
+
+    def test_search_is_ordered(self):
+        index = SimilarityIndex.from_smiles(SMILES)
+        neighbours = index.search("CC(C)Cc1ccc(C(C)C(=O)O)cc1", k=3)
+        assert neighbours.rows[0] == 1 and neighbours.scores[0] == pytest.approx(1.0)
+        assert neighbours.rows[1] == 5
+        assert np.all(np.diff(neighbours.scores) <= 0)
+        with pytest.raises(ValueError):
+            index.search("not a smiles")
+
+    def test_blocked_batch_agrees_with_single_queries(self, monkeypatch):
+        index = SimilarityIndex.from_smiles(SMILES * 10)
+        # Force many row and query blocks
+        monkeypatch.setattr(similarity, "BLOCK_PAIRS", 8)
+        monkeypatch.setattr(similarity, "QUERY_BLOCK", 4)
+        batch = index.search_many(index.fingerprints, k=5, threads=3)
+        for i, query in enumerate(index.fingerprints):
+            single = index.search(query, k=5)
+            assert np.array_equal(batch.scores[i], single.scores)
+            assert np.array_equal(batch.rows[i], single.rows)
+
+    def test_all_neighbours_exclude_self(self):
+        index = SimilarityIndex.from_smiles(SMILES)
+        neighbours = index.all_neighbours(k=10, threads=2)
+        assert neighbours.rows.shape == (len(SMILES), len(SMILES) - 1)
+        for i, rows in enumerate(neighbours.rows):
+            assert i not in rows
+
+    def test_persisted_per_table(self, tmp_path):
+        db = MoleculeDB(
+            molecules=[MoleculeEntry(name=f"m{i}", smiles=s) for i, s in enumerate(SMILES)]
+        )
+        index = SimilarityIndex.of(db.table, cache_dir=tmp_path)
+        assert SimilarityIndex.of(db.table, cache_dir=tmp_path) is index
+        loaded = SimilarityIndex.of(db.take(range(len(SMILES))).table, cache_dir=tmp_path)
+        assert isinstance(loaded.fingerprints, np.memmap)
+        assert np.array_equal(loaded.fingerprints, index.fingerprints)
@@ -0,0 +1,145 @@
+import shutil
+
+import pytest
+
+from chemcards.database.core import MoleculeDB
+from chemcards.database.resources import MOLECULE_DATABASE
+from chemcards.database.sqlite import SQLiteMoleculeStore, sqlite_path
+from chemcards.flashcards.core import FilterBase
+from chemcards.flashcards.filters import (
+    ATCFilter,
+    ActionTypeFilter,
+    MechanismFilter,
+    MissingTargetFilter,
+    TargetChemblIdFilter,
+    TargetContainsFilter,
+    TargetFilter,
+)
+
+
+@pytest.fixture(scope="module")
+def db():
+    return MoleculeDB.load()
+
+
+@pytest.fixture(scope="module")
+def store(db, tmp_path_factory):
+    return SQLiteMoleculeStore.from_moleculedb(db, tmp_path_factory.mktemp("sqlite") / "db.sqlite")
+
+
+class NameStartsWithFilter(FilterBase):
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def apply(self, molecule_db):
+        return MoleculeDB(molecules=[m for m in molecule_db.molecules if m.name.startswith(self.prefix)])
+
+
+FILTERS = [
+    MissingTargetFilter(),
+    TargetFilter("Carbonic anhydrase 4"),
+    TargetContainsFilter("kinase"),
+    TargetChemblIdFilter("CHEMBL3729", "CHEMBL261"),
+    ActionTypeFilter("INHIBITOR"),
+    MechanismFilter("Carbonic anhydrase IV inhibitor"),
+    ATCFilter("L01"),
+    ATCFilter("N", "S01EC05"),
+    ActionTypeFilter("INHIBITOR") & ~ATCFilter("L"),
+    TargetContainsFilter("kinase") | MechanismFilter("Carbonic anhydrase IV inhibitor"),
+]
+
+
+class TestSQLiteMoleculeStore:
+    def test_roundtrip(self, db, store):
+        loaded = store.load()
+        assert loaded.last_updated == db.last_updated
+        assert list(loaded.table.records()) == list(db.table.records())
+
+    @pytest.mark.parametrize("filter", FILTERS, ids=lambda f: type(f).__name__)
+    def test_sql_matches_python(self, db, store, filter):
+        assert list(store.query([filter]).table.records()) == list(filter(db).table.records())
+
+    def test_stacked_filters_with_python_fallback(self, db, store):
+        filters = [ActionTypeFilter("INHIBITOR"), ATCFilter("L"), NameStartsWithFilter("A")]
+        expected = db
+        for f in filters:
+            expected = f(expected)
+        result = store.query(filters)
+        assert len(result) > 0
+        assert [m.name for m in result.molecules] == [m.name for m in expected.molecules]
+
+    @pytest.mark.parametrize(
+        "filter",
+        [
+            TargetContainsFilter("_"),
+            TargetContainsFilter("%"),
+            TargetContainsFilter("ÉTAT"),
+            TargetContainsFilter("ångström"),
+            TargetContainsFilter("KINASE"),
+            ATCFilter(""),
+            ATCFilter(),
+            ATCFilter("", "L01"),
+        ],
+        ids=lambda f: f"{type(f).__name__}{vars(f)}",
+    )
+    def test_sql_matches_python_edge_cases(self, tmp_path, filter):
+        db = MoleculeDB(
+            molecules=[
+                {"name": "a", "smiles": "C", "target": "Kinase_1", "atc_classifications": ["L01EA01"]},
+                {"name": "b", "smiles": "C", "target": "100% État", "atc_classifications": []},
+                {"name": "c", "smiles": "C", "target": "Ångström receptor"},
+                {"name": "d", "smiles": "C", "target": "état kinase", "atc_classifications": ["N02"]},
+            ]
+        )
+        store = SQLiteMoleculeStore.from_moleculedb(db, tmp_path / "db.sqlite")
+        expected = [m.name for m in filter(db).molecules]
+        assert [m.name for m in store.query([filter]).molecules] == expected
+        store.close()
+
+    @pytest.mark.parametrize(
+        "filter, index",
+        [
+            (TargetFilter("x"), "molecules_target"),
+            (TargetChemblIdFilter("x"), "molecules_target_chembl_id"),
+            (ActionTypeFilter("x"), "molecules_action_type"),
+            (MechanismFilter("x"), "molecules_mechanism_of_action"),
+            (ATCFilter("L01"), "atc_classifications_code"),
+        ],
+    )
+    def test_queries_use_indexes(self, store, filter, index):
+        assert any(index in step for step in store.explain([filter]))
+
+    def test_open_rebuilds_when_json_changes(self, tmp_path):
+        path = tmp_path / "molecule_database.json"
+        shutil.copy(MOLECULE_DATABASE, path)
+        store = SQLiteMoleculeStore.open(path)
+        assert sqlite_path(path).exists()
+        assert len(store.load()) == len(MoleculeDB.load(path))
+        store.close()
+
+        path.write_text('{"molecules": [{"name": "ethanol", "smiles": "CCO"}]}')
+        store = SQLiteMoleculeStore.open(path)
+        assert [m.name for m in store.load().molecules] == ["ethanol"]
+        store.close()
+
+    def test_open_rebuilds_after_save(self, tmp_path):
+        path = tmp_path / "molecule_database.json"
+        MoleculeDB(molecules=[{"name": "ethanol", "smiles": "CCO"}]).save(path)
+        store = SQLiteMoleculeStore.open(path)
+        assert [m.name for m in store.load().molecules] == ["ethanol"]
+        store.close()
+
+        # Journaled: the snapshot itself is unchanged
+        MoleculeDB(molecules=[{"name": "benzene", "smiles": "c1ccccc1"}]).save(path)
+        store = SQLiteMoleculeStore.open(path)
+        assert [m.name for m in store.load().molecules] == ["ethanol", "benzene"]
+        store.close()
+
+    def test_open_journal_only(self, tmp_path):
+        path = tmp_path / "molecule_database.json"
+        MoleculeDB(molecules=[{"name": "ethanol", "smiles": "CCO"}]).save(path)
+        MoleculeDB(molecules=[{"name": "benzene", "smiles": "c1ccccc1"}]).save(path)
+        path.unlink()
+        store = SQLiteMoleculeStore.open(path)
+        assert [m.name for m in store.load().molecules] == ["benzene"]
+        store.close()
@@ -0,0 +1,61 @@
+import json
+import random
+
+import pytest
+
+from chemcards.database.services.chembl import ChemblDB, iter_download_molecules
+from chemcards.database.services.streaming import iter_json_array, write_json_array
+
+
+def chembl_entry(i, smiles="CCO"):
+    return {
+        "pref_name": f"DRUG {i}",
+        "molecule_chembl_id": f"CHEMBL{i}",
+        "molecule_structures": {"canonical_smiles": smiles} if smiles else None,
+        "usan_stem_definition": None,
+        "atc_classifications": ["N02BA01"] if i % 2 else [],
+    }
+
+
+class TestJSONStreaming:
+    @pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+    def test_roundtrip(self, tmp_path, chunk_size):
+        items = [{"id": i, "text": "x" * i, "values": [1.5, -2e3, None, True]} for i in range(50)]
+        items += [12345, "tail", [], {}]
+        path = tmp_path / "items.json"
+        assert write_json_array(path, iter(items)) == len(items)
+        assert list(iter_json_array(path, chunk_size)) == items
+        path.write_text(json.dumps(items, indent=2))
+        assert list(iter_json_array(path, chunk_size)) == items
+
+    @pytest.mark.parametrize("chunk_size", range(1, 8))
+    def test_numbers_split_across_chunks(self, tmp_path, chunk_size):
+        rng = random.Random(chunk_size)
+        items = [12.5, -0.25, 1e-07, 3, -17, 6.02e23, 0.0, 12345678.875, True, None]
+        items += [rng.uniform(-1e3, 1e3) * 10 ** rng.randint(-30, 30) for _ in range(200)]
+        path = tmp_path / "numbers.json"
+        path.write_text(json.dumps(items))
+        assert list(iter_json_array(path, chunk_size)) == items
+        path.write_text(json.dumps(items, separators=(",", ":")) + "\n")
+        assert list(iter_json_array(path, chunk_size)) == items
+
+    def test_empty_and_malformed(self, tmp_path):
+        path = tmp_path / "items.json"
+        path.write_text(" [ ] ")
+        assert list(iter_json_array(path)) == []
+        path.write_text('{"not": "an array"}')
+        with pytest.raises(ValueError):
+            list(iter_json_array(path))
+        path.write_text("[1, 2")
+        with pytest.raises(ValueError):
+            list(iter_json_array(path))
+
+
+def test_chembl_db_from_streamed_download(tmp_path):
+    path = tmp_path / "chembl_approved_drugs.json"
+    write_json_array(path, [chembl_entry(1), chembl_entry(2, smiles=None), chembl_entry(3, "CCN")])
+
+    assert [m.name for m in iter_download_molecules(path)] == ["DRUG 1", "DRUG 3"]
+    db = ChemblDB.from_download(path)
+    assert db.table.column("molecule_chembl_id") == ["CHEMBL1", "CHEMBL3"]
+    assert db.molecules[0].atc_classifications == ["N02BA01"]
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from chemcards import cli
+from chemcards.database import search, substructure
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.database.molcache import get_mol
+
+
+@pytest.fixture
+def db():
+    return MoleculeDB(
+        molecules=[
+            MoleculeEntry(name="aspirin", smiles="CC(=O)Oc1ccccc1C(=O)O"),
+            MoleculeEntry(name="caffeine", smiles="Cn1cnc2c1c(=O)n(C)c(=O)n2C"),
+            MoleculeEntry(name="ibuprofen", smiles="CC(C)Cc1ccc(C(C)C(=O)O)cc1"),
+            MoleculeEntry(name="broken", smiles="not a smiles"),
+            MoleculeEntry(name="ethanol", smiles="CCO"),
+            MoleculeEntry(name="salicylic acid", smiles="OC(=O)c1ccccc1O"),
+        ]
+    )
+
+
+class TestSearch:
+    def test_hits_match_a_full_scan(self, db):
+        for query in ["C(=O)[OH]", "c1ccccc1", "[OX2H]", "CCO", "n"]:
+            pattern = substructure.query_mol(query)
+            expected = [
+                row
+                for row, molecule in enumerate(db.molecules)
+                if (mol := get_mol(molecule.smiles)) is not None and mol.HasSubstructMatch(pattern)
+            ]
+            assert [hit.row for hit in search(query, db)] == expected, query
+
+    def test_highlights(self, db):
+        (hit,) = search("C(=O)[OH]", db, limit=1)
+        assert hit.molecule.name == "aspirin"
+        assert hit.atoms == (10, 11, 12)
+        mol = get_mol(hit.molecule.smiles)
+        assert hit.bonds == tuple(
+            sorted(mol.GetBondBetweenAtoms(10, i).GetIdx() for i in (11, 12))
+        )
+
+    def test_limit_and_offset(self, db):
+        names = [hit.molecule.name for hit in search("C(=O)[OH]", db)]
+        assert names == ["aspirin", "ibuprofen", "salicylic acid"]
+        assert [hit.molecule.name for hit in search("C(=O)[OH]", db, offset=1, limit=1)] == [
+            "ibuprofen"
+        ]
+        assert list(search("C(=O)[OH]", db, limit=0)) == []
+
+    def test_invalid_query(self, db):
+        with pytest.raises(ValueError):
+            list(search("xx(", db))
+
+    def test_timeout(self, db, monkeypatch):
+        match = substructure._match
+
+        def slow_match(*args):
+            time.sleep(0.05)
+            return match(*args)
+
+        monkeypatch.setattr(substructure, "_match", slow_match)
+        hits = search("[#6]", db, timeout=0.01)
+        with pytest.raises(substructure.SearchTimeout):
+            list(hits)
+
+    def test_timeout_stops_a_match_that_never_returns(self, db, monkeypatch):
+        def endless_match(*args):
+            time.sleep(3600)
+
+        # The default single process still matches in a worker that can be stopped
+        monkeypatch.setattr(substructure, "_match", endless_match)
+        start = time.monotonic()
+        with pytest.raises(substructure.SearchTimeout):
+            list(search("[#6]", db, timeout=0.2))
+        assert time.monotonic() - start < 30
+
+    def test_syntax(self, db):
+        # Hydrogen counts are constraints in SMARTS only
+        assert [hit.molecule.name for hit in search("[CH4]", db)] == []
+        assert "ethanol" in [hit.molecule.name for hit in search("[CH4]", db, syntax="smiles")]
+        with pytest.raises(ValueError):
+            substructure.query_mol("[CX3](=O)[OX2H1]", "smiles")
+        with pytest.raises(ValueError):
+            substructure.query_mol("CCO", "inchi")
+
+    def test_parallel_agrees(self, db, monkeypatch):
+        monkeypatch.setattr(substructure, "CHUNK_SIZE", 2)
+        serial = [(hit.row, hit.atoms, hit.bonds) for hit in search("[#6]~[#8]", db)]
+        parallel = [
+            (hit.row, hit.atoms, hit.bonds) for hit in search("[#6]~[#8]", db, processes=2)
+        ]
+        assert parallel == serial
+
+
+def test_cli_search():
+    result = CliRunner().invoke(cli.cli, ["search", "C(=O)[OH]", "--limit", "2"])
+    assert result.exit_code == 0, result.output
+    assert len(result.output.splitlines()) == 2
+    result = CliRunner().invoke(cli.cli, ["search", "xx("])
+    assert result.exit_code == 2
+    result = CliRunner().invoke(cli.cli, ["search", "[CX3](=O)[OX2H1]", "--smiles"])
+    assert result.exit_code == 2
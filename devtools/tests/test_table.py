@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+import pytest
+
+from chemcards.database.core import MoleculeDB, MoleculeEntry
+from chemcards.database.resources import MOLECULE_DATABASE
+from chemcards.database.table import MoleculeTable, StringPool, UNKNOWN, last_unique
+from chemcards.flashcards.filters import MissingTargetFilter
+
+
+@pytest.fixture
+def molecules():
+    return [
+        MoleculeEntry(name="aspirin", smiles="CC(=O)Oc1ccccc1C(=O)O", target="PTGS1",
+                      atc_classifications=["N02BA01", "B01AC06"]),
+        MoleculeEntry(name="caffeine", smiles="Cn1cnc2c1c(=O)n(C)c(=O)n2C"),
+        MoleculeEntry(name="ibuprofen", smiles="CC(C)Cc1ccc(C(C)C(=O)O)cc1", target="PTGS1",
+                      atc_classifications=["M01AE01"]),
+    ]
+
+
+class TestStringPool:
+    def test_unknown_is_code_zero(self):
+        pool = StringPool(["a", "b", "a"])
+        assert pool[0] == UNKNOWN
+        assert len(pool) == 3
+        assert pool.code("b") == 2
+
+
+class TestMoleculeTable:
+    def test_roundtrip(self, molecules):
+        table = MoleculeTable.from_records(molecules)
+        assert len(table) == 3
+        assert [r["name"] for r in table.records()] == ["aspirin", "caffeine", "ibuprofen"]
+        assert table.record(-1)["atc_classifications"] == ["M01AE01"]
+        assert table.codes("target")[0] == table.codes("target")[2]
+
+    def test_unknown_mask(self, molecules):
+        table = MoleculeTable.from_records(molecules)
+        assert table.unknown_mask("target").tolist() == [False, True, False]
+
+    def test_take_keeps_ragged_atc(self, molecules):
+        table = MoleculeTable.from_records(molecules).take(np.array([2, 0]))
+        assert [r["atc_classifications"] for r in table.records()] == [
+            ["M01AE01"], ["N02BA01", "B01AC06"]
+        ]
+
+    def test_concat_recodes_other_pool(self, molecules):
+        left = MoleculeTable.from_records(molecules[:1])
+        right = MoleculeTable.from_records(molecules[1:])
+        merged = left.concat(right)
+        assert [r["name"] for r in merged.records()] == ["aspirin", "caffeine", "ibuprofen"]
+        assert merged.record(2)["target"] == "PTGS1"
+
+    def test_last_unique_keeps_last_in_first_seen_order(self):
+        assert last_unique(["a", "b", "a", "c"]).tolist() == [2, 1, 3]
+
+
+class TestColumnarMoleculeDB:
+    def test_update_merges_by_structure(self, molecules):
+        db = MoleculeDB(molecules=molecules)
+        other = MoleculeDB(
+            molecules=[
+                MoleculeEntry(name="aspirin sodium", smiles="CC(=O)Oc1ccccc1C(=O)[O-].[Na+]"),
+                MoleculeEntry(name="caffeine", smiles="N"),
+            ]
+        )
+        merged = db.update(other)
+        # The salt replaces its parent in place; a different structure sharing a name is kept
+        assert [m.name for m in merged.molecules] == [
+            "aspirin sodium", "caffeine", "ibuprofen", "caffeine"
+        ]
+
+    def test_missing_target_filter(self, molecules):
+        db = MissingTargetFilter()(MoleculeDB(molecules=molecules))
+        assert [m.name for m in db.molecules] == ["aspirin", "ibuprofen"]
+
+    def test_molecules_setter(self, molecules):
+        db = MoleculeDB(molecules=molecules)
+        db.molecules = list(db.molecules)[:1]
+        assert len(db.molecules) == 1
+
+    def test_json_roundtrip_of_shipped_database(self):
+        raw = json.loads(MOLECULE_DATABASE.read_text())
+        db = MoleculeDB.model_validate(raw)
+        assert len(db.molecules) == len(raw["molecules"])
+        assert json.loads(db.model_dump_json()) == raw
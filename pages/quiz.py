@@ -8,6 +8,8 @@ from chemcards.flashcards.multiplechoice import (
     MultipleChoiceNameToMoleculeGenerator,
     MultipleChoiceMoleculeToFunctionalGroupNameGenerator,
 )
+from chemcards.flashcards.prefetch import PrefetchQueue
+from chemcards.flashcards.scheduling import Deck
 from utils import load_db, load_filtered_db, render_smiles, render_smarts
 
 
@@ -24,7 +26,9 @@ def init_state() -> None:
         "mode": "menu",
         "generator": None,
         "quiz_name": "",
+        "prefetch": None,
         "current_question": None,
+        "current_images": None,
         "score": 0,
         "total": 0,
         "answered": False,
@@ -47,9 +51,16 @@ def show_menu() -> None:
         if st.button(quiz_name, use_container_width=True):
             db = filtered_db if apply_filters else raw_db
             generator = GeneratorClass(molecule_db=db)
+            try:
+                # Quizzes over a fixed set of cards are spaced-repetition decks
+                generator = Deck(generator)
+            except NotImplementedError:
+                pass
             st.session_state.generator = generator
             st.session_state.quiz_name = quiz_name
-            st.session_state.current_question = generator.next()
+            # Questions and their images are prepared ahead on a worker thread
+            st.session_state.prefetch = PrefetchQueue(generator, prepare=prepare_images)
+            next_question()
             st.session_state.score = 0
             st.session_state.total = 0
             st.session_state.answered = False
@@ -58,8 +69,41 @@ def show_menu() -> None:
             st.rerun()
 
 
+def prepare_images(q) -> list:
+    """The PNG images of ``q``'s molecule choices, or of its display; runs on the prefetch thread."""
+    if q.choices and isinstance(q.choices[0], MoleculeEntry):
+        return [render_smiles(choice.smiles, size=250) for choice in q.choices]
+    if q.display is None:
+        return []
+    if isinstance(q.display, FunctionalGroup):
+        return [render_smarts(q.display.smarts)]
+    return [render_smiles(q.display.smiles)]
+
+
+def next_question() -> None:
+    q, images = st.session_state.prefetch.get()
+    st.session_state.current_question = q
+    # None if preparing failed on the worker; try again here
+    st.session_state.current_images = images if images is not None else prepare_images(q)
+
+
+def release_unanswered() -> None:
+    """Put the card of an unanswered question back in its place in the deck."""
+    q = st.session_state.current_question
+    if q is not None and not st.session_state.answered and isinstance(st.session_state.generator, Deck):
+        st.session_state.generator.release([q.card_key])
+
+
+def end_quiz() -> None:
+    if st.session_state.prefetch is not None:
+        st.session_state.prefetch.close()
+        st.session_state.prefetch = None
+    release_unanswered()
+
+
 def show_quiz() -> None:
     q = st.session_state.current_question
+    images = st.session_state.current_images
 
     col_title, col_score, col_end = st.columns([4, 1, 1])
     with col_title:
@@ -68,6 +112,7 @@ def show_quiz() -> None:
         st.metric("Score", f"{st.session_state.score}/{st.session_state.total}")
     with col_end:
         if st.button("End Quiz"):
+            end_quiz()
             st.session_state.mode = "result"
             st.rerun()
 
@@ -83,9 +128,8 @@ def show_quiz() -> None:
         top_cols = st.columns(2)
         bot_cols = st.columns(2)
         grid = [top_cols[0], top_cols[1], bot_cols[0], bot_cols[1]]
-        for mol_entry, col, label in zip(q.choices, grid, labels):
+        for img, col, label in zip(images, grid, labels):
             with col:
-                img = render_smiles(mol_entry.smiles, size=250)
                 if img:
                     st.image(img, caption=label)
 
@@ -99,15 +143,11 @@ def show_quiz() -> None:
         selected_idx = labels.index(radio_value) if radio_value else None
 
     else:
-        if q.display is not None:
-            if isinstance(q.display, FunctionalGroup):
-                img = render_smarts(q.display.smarts)
-            else:
-                img = render_smiles(q.display.smiles)
-            if img:
-                col_img, _ = st.columns([1, 2])
-                with col_img:
-                    st.image(img)
+        img = images[0] if images else None
+        if img:
+            col_img, _ = st.columns([1, 2])
+            with col_img:
+                st.image(img)
 
         st.subheader(q.question)
         radio_value = st.radio(
@@ -128,6 +168,8 @@ def show_quiz() -> None:
             st.session_state.correct_last = selected_idx == q.answer_index
             if st.session_state.correct_last:
                 st.session_state.score += 1
+            if isinstance(st.session_state.generator, Deck):
+                st.session_state.generator.review(st.session_state.correct_last, key=q.card_key)
             st.rerun()
     else:
         if st.session_state.correct_last:
@@ -152,7 +194,7 @@ def show_quiz() -> None:
                     )
 
         if st.button("Next Question", type="primary"):
-            st.session_state.current_question = st.session_state.generator.next()
+            next_question()
             st.session_state.answered = False
             st.session_state.correct_last = None
             st.rerun()
@@ -176,6 +218,7 @@ def show_result() -> None:
         st.session_state.mode = "menu"
         st.session_state.generator = None
         st.session_state.current_question = None
+        st.session_state.current_images = None
         st.session_state.score = 0
         st.session_state.total = 0
         st.session_state.answered = False
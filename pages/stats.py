@@ -3,6 +3,7 @@ import plotly.express as px
 import pandas as pd
 from collections import Counter
 
+from chemcards.database.table import UNKNOWN
 from utils import load_db
 
 ATC_L1 = {
@@ -25,23 +26,22 @@ ATC_L1 = {
 
 @st.cache_data
 def compute_stats() -> dict:
+    # Counts are the sizes of the inverted indexes' row groups: no scan of the molecules
     db = load_db()
-    mols = db.molecules
-    targets = Counter(m.target for m in mols if m.target != "unknown")
-    mechanisms = Counter(m.mechanism_of_action for m in mols if m.mechanism_of_action != "unknown")
-    action_types = Counter(m.action_type for m in mols if m.action_type != "unknown")
-
-    drug_classes: Counter = Counter()
-    for m in mols:
-        seen: set = set()
-        for code in m.atc_classifications:
-            label = ATC_L1.get(code[0]) if code else None
-            if label and label not in seen:
-                drug_classes[label] += 1
-                seen.add(label)
+    indexes = db.indexes
+    targets, mechanisms, action_types = (
+        Counter({value: n for value, n in index.counts_by_value().items() if value != UNKNOWN})
+        for index in (indexes.target, indexes.mechanism_of_action, indexes.action_type)
+    )
+
+    # A molecule is counted once per level-1 ATC group
+    atc = indexes.atc.counts_by_value()
+    drug_classes = Counter(
+        {ATC_L1[code]: atc[code] for code in indexes.atc.level(1) if code in ATC_L1}
+    )
 
     return {
-        "total": len(mols),
+        "total": len(db),
         "n_targets": len(targets),
         "n_action_types": len(action_types),
         "n_mechanisms": len(mechanisms),
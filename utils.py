@@ -1,8 +1,10 @@
 import streamlit as st
-from rdkit.Chem import MolFromSmiles, MolFromSmarts
+from rdkit.Chem import MolFromSmarts
 from rdkit.Chem.Draw import rdMolDraw2D
 
 from chemcards.database.core import MoleculeDB
+from chemcards.database.molcache import get_mol
+from chemcards.flashcards.core import FlashCardGeneratorBase
 from chemcards.flashcards.filters import FILTERS
 
 
@@ -13,10 +15,8 @@ def load_db() -> MoleculeDB:
 
 @st.cache_resource
 def load_filtered_db() -> MoleculeDB:
-    db = load_db()
-    for f in FILTERS:
-        db = f(db)
-    return db
+    # One composed row selection rather than an intermediate database per filter
+    return FlashCardGeneratorBase.apply_filters(load_db(), FILTERS)
 
 
 def _draw_mol(mol, size: int) -> bytes | None:
@@ -29,7 +29,7 @@ def _draw_mol(mol, size: int) -> bytes | None:
 
 
 def render_smiles(smiles: str, size: int = 300) -> bytes | None:
-    return _draw_mol(MolFromSmiles(smiles), size)
+    return _draw_mol(get_mol(smiles), size)
 
 
 def render_smarts(smarts: str, size: int = 300) -> bytes | None: